@@ -2,8 +2,6 @@
 
 import os
 import sys
-import base64
-import tempfile
 from pathlib import Path
 
 # 프로젝트 루트 추가
@@ -18,15 +16,28 @@ if env_file.exists():
             os.environ[key.strip()] = value.strip()
 
 import re
+import time
 import uuid
+import logging
 from typing import Optional, List
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
-import json
 
-from src.agent import KoreanFoodAgent
+from src.agent import KoreanFoodAgent, get_checkpointer, get_shared_agent
+from src.config import settings
+from src.formatters import is_direct_return
+from src.image_store import get_image_store
+from src.metrics import get_metrics
+from src.services.http import close_http_client
+from api.scheduler import AdmissionRejected, TurnScheduler, classify_turn
+from api.sessions import SessionStore
+from api.streaming import (
+    TICK, ClientDisconnected, MediaTagParser, TextCoalescer, iterate_with_timeout, sse_frame,
+)
+from api.uploads import parse_chat_upload
 
 app = FastAPI(title="Korean Food Agent API", version="1.0.0")
 
@@ -39,16 +50,68 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 세션별 에이전트 관리
-agents: dict[str, KoreanFoodAgent] = {}
+
+def _create_agent(session_id: str) -> KoreanFoodAgent:
+    # 그래프는 공유되므로 세션 생성은 thread_id 할당뿐
+    provider = os.getenv("MODEL_PROVIDER", "vllm")
+    return KoreanFoodAgent(provider=provider, thread_id=session_id)
+
+
+# 세션별 에이전트 관리 (LRU + 유휴 TTL + 메모리 상한)
+agents: SessionStore[KoreanFoodAgent] = SessionStore(
+    factory=_create_agent,
+    max_size=settings.session_max_size,
+    idle_ttl=settings.session_idle_ttl,
+    max_memory_bytes=int(settings.session_max_memory_mb * 1024 * 1024),
+    sizeof=lambda agent: agent.memory_usage(),
+    # 메모리에서만 내림 (durable 체크포인트는 DELETE /session, /session/clear에서만 삭제)
+    on_evict=lambda session_id, agent: agent.release(),
+    # 턴이 실행 중인(또는 대기 중인) 세션은 제거하지 않음
+    pinned=lambda session_id: scheduler.is_active(session_id),
+)
+
+
+logger = logging.getLogger("uvicorn.error")
+metrics = get_metrics()
+metrics.describe("chat_stream_runs_total", "SSE 스트림 실행 결과 (completed/cancelled/error)")
+metrics.describe("chat_stream_duration_seconds", "SSE 스트림 실행 시간")
+
+# 동시 실행 제한 + 세션별 FIFO 직렬화
+scheduler = TurnScheduler(
+    text_concurrency=settings.scheduler_text_concurrency,
+    text_queue=settings.scheduler_text_queue,
+    heavy_concurrency=settings.scheduler_heavy_concurrency,
+    heavy_queue=settings.scheduler_heavy_queue,
+    session_queue=settings.scheduler_session_queue,
+    queue_timeout=settings.scheduler_queue_timeout,
+)
+
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 
 def get_or_create_agent(session_id: str) -> KoreanFoodAgent:
     """세션 ID로 에이전트 가져오거나 생성"""
-    if session_id not in agents:
-        provider = os.getenv("MODEL_PROVIDER", "vllm")
-        agents[session_id] = KoreanFoodAgent(provider=provider)
-    return agents[session_id]
+    return agents.get_or_create(session_id)
+
+
+@app.on_event("startup")
+async def startup():
+    # 첫 요청 전에 공유 그래프를 미리 컴파일
+    get_shared_agent(os.getenv("MODEL_PROVIDER", "vllm"))
+    agents.start_reaper(settings.session_reap_interval)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await agents.stop_reaper()
+    await close_http_client()
 
 
 class ImageData(BaseModel):
@@ -60,28 +123,19 @@ class ChatRequest(BaseModel):
     message: str
     session_id: Optional[str] = None
     images: Optional[List[ImageData]] = None  # base64 이미지 리스트
+    # SSE 텍스트 병합 창 (None이면 서버 설정값, 둘 다 0이면 토큰마다 전송)
+    stream_flush_ms: Optional[float] = None
+    stream_flush_chars: Optional[int] = None
 
 
-def save_base64_image(image_data: ImageData) -> str:
-    """base64 이미지를 임시 파일로 저장하고 경로 반환"""
-    # MIME 타입에서 확장자 추출
-    ext_map = {
-        "image/jpeg": ".jpg",
-        "image/png": ".png",
-        "image/gif": ".gif",
-        "image/webp": ".webp",
-    }
-    ext = ext_map.get(image_data.mime_type, ".jpg")
-
-    # 임시 파일 생성
-    temp_file = tempfile.NamedTemporaryFile(suffix=ext, delete=False)
+def store_images(message: str, images: Optional[List[ImageData]]) -> str:
+    """base64 이미지를 이미지 저장소에 넣고, image:// 참조를 메시지 앞에 붙여 반환"""
+    if not images:
+        return message
 
-    # base64 디코딩 후 파일 저장
-    image_bytes = base64.b64decode(image_data.data)
-    temp_file.write(image_bytes)
-    temp_file.close()
-
-    return temp_file.name
+    store = get_image_store()
+    refs = [store.put_base64(img.data, img.mime_type) for img in images]
+    return f"{' '.join(refs)} {message}"
 
 
 class ChatResponse(BaseModel):
@@ -91,26 +145,30 @@ class ChatResponse(BaseModel):
     images: list[str] = []
 
 
+# MAP 태그 (좌표 형식 또는 URL 형식 모두 지원), IMAGE 태그
+MAP_TAG_RE = re.compile(r'\[MAP:([^\]]+)\]')
+IMAGE_TAG_RE = re.compile(r'\[IMAGE:(https?://[^\]]+)\]')
+SEARCH_IMAGE_LABEL_RE = re.compile(r'\[검색 결과 이미지\]\s*')
+PLAN_RE = re.compile(r'Plan:.*?(?=\n\n|\Z)', re.DOTALL)
+
+
 def extract_media_tags(text: str) -> tuple[str, Optional[str], list[str]]:
     """[MAP:...], [IMAGE:url] 태그 추출"""
     map_url = None
-    images = []
 
-    # MAP 태그 추출 (좌표 형식 또는 URL 형식 모두 지원)
-    map_pattern = r'\[MAP:([^\]]+)\]'
-    map_match = re.search(map_pattern, text)
+    # MAP 태그 추출
+    map_match = MAP_TAG_RE.search(text)
     if map_match:
         map_url = map_match.group(1)
-        text = re.sub(map_pattern, '', text)
+        text = MAP_TAG_RE.sub('', text)
 
     # IMAGE 태그 추출
-    img_pattern = r'\[IMAGE:(https?://[^\]]+)\]'
-    images = re.findall(img_pattern, text)
-    text = re.sub(img_pattern, '', text)
-    text = re.sub(r'\[검색 결과 이미지\]\s*', '', text)
+    images = IMAGE_TAG_RE.findall(text)
+    text = IMAGE_TAG_RE.sub('', text)
+    text = SEARCH_IMAGE_LABEL_RE.sub('', text)
 
     # Plan: 내부 추론 제거
-    text = re.sub(r'Plan:.*?(?=\n\n|\Z)', '', text, flags=re.DOTALL)
+    text = PLAN_RE.sub('', text)
     text = text.strip()
 
     return text, map_url, images
@@ -125,73 +183,117 @@ async def root():
 async def chat(request: ChatRequest):
     """동기 채팅 API"""
     session_id = request.session_id or str(uuid.uuid4())
-    agent = get_or_create_agent(session_id)
-
-    try:
-        # 이미지가 있으면 임시 파일로 저장하고 경로를 메시지에 추가
-        message = request.message
-        temp_files = []
-
-        if request.images:
-            for img in request.images:
-                temp_path = save_base64_image(img)
-                temp_files.append(temp_path)
-
-            # 이미지 경로를 메시지 앞에 추가
-            image_paths = " ".join(temp_files)
-            message = f"{image_paths} {message}"
-
-        response = agent.chat(message)
-        text, map_url, images = extract_media_tags(response)
-
-        # 임시 파일 정리
-        for temp_path in temp_files:
-            try:
-                os.unlink(temp_path)
-            except:
-                pass
-
-        return ChatResponse(
-            response=text,
-            session_id=session_id,
-            map_url=map_url,
-            images=images
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    lane = classify_turn(request.message, has_images=bool(request.images))
 
+    async with scheduler.slot(session_id, lane):
+        agent = get_or_create_agent(session_id)
+        try:
+            # 이미지가 있으면 저장소에 넣고 참조를 메시지에 추가
+            message = store_images(request.message, request.images)
 
-@app.post("/chat/stream")
-async def chat_stream(request: ChatRequest):
-    """스트리밍 채팅 API"""
-    session_id = request.session_id or str(uuid.uuid4())
-    agent = get_or_create_agent(session_id)
+            response = await agent.achat(message)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
 
-    # 이미지가 있으면 임시 파일로 저장
-    message = request.message
-    temp_files = []
+    text, map_url, images = extract_media_tags(response)
 
-    if request.images:
-        for img in request.images:
-            temp_path = save_base64_image(img)
-            temp_files.append(temp_path)
+    return ChatResponse(
+        response=text,
+        session_id=session_id,
+        map_url=map_url,
+        images=images
+    )
 
-        # 이미지 경로를 메시지 앞에 추가
-        image_paths = " ".join(temp_files)
-        message = f"{image_paths} {message}"
 
-    def generate():
+async def stream_chat(
+    http_request: Request,
+    session_id: str,
+    message: str,
+    flush_ms: Optional[float] = None,
+    flush_chars: Optional[int] = None,
+    lane: Optional[str] = None,
+) -> StreamingResponse:
+    """에이전트 응답을 SSE로 스트리밍
+
+    텍스트의 [MAP:...], [IMAGE:url] 태그는 MediaTagParser로 증분 파싱해서 태그가 닫히는 즉시
+    map / image 이벤트로 보내고 text 이벤트에서는 제거합니다. done 이벤트에는 최종 결과를 담습니다.
+
+    스트림을 시작하기 전에 스케줄러 승인을 받고(거절 시 429/503), 스트림이 끝나면 반환합니다.
+    클라이언트 연결이 끊기면 실행 중인 그래프(LLM 호출, 도구 I/O)를 취소합니다.
+
+    Args:
+        http_request: 연결 끊김 감지용 요청 객체
+        flush_ms / flush_chars: 텍스트 델타 병합 창 (None이면 설정값, 둘 다 0이면 병합 안 함)
+        lane: 스케줄러 레인 (None이면 메시지로 판단)
+    """
+    admission = await scheduler.admit(session_id, lane or classify_turn(message))
+    try:
+        agent = get_or_create_agent(session_id)
+        coalescer = TextCoalescer(
+            flush_ms=settings.sse_flush_ms if flush_ms is None else flush_ms,
+            flush_chars=settings.sse_flush_chars if flush_chars is None else flush_chars,
+        )
+    except BaseException:
+        # 스트림을 만들기 전에 실패하면 레인 슬롯과 세션 잠금을 바로 반환
+        admission.release()
+        raise
+
+    async def generate():
+        started_at = time.monotonic()
+        outcome = "cancelled"  # 정상 종료/에러가 아니면 연결 끊김으로 인한 중단
+        events = iterate_with_timeout(
+            agent.astream(message),
+            coalescer.timeout,
+            should_stop=http_request.is_disconnected,
+            poll_interval=settings.sse_disconnect_poll,
+        )
         try:
             current_tool = None
-            final_text = ""
             tool_map_url = None
             tool_images = []
             text_started = False
+            tags = MediaTagParser()
+            map_url = None
+            images = []
+
+            def render_text(txt: str) -> list:
+                """답변 텍스트 → SSE 프레임 (태그는 map / image 이벤트로 분리)"""
+                nonlocal text_started, map_url
+                if not text_started:
+                    txt = txt.lstrip('\n')
+                    if txt:
+                        text_started = True
+                frames = []
+                for kind, value in tags.feed(txt):
+                    if kind == "text":
+                        frame = coalescer.push(value)
+                        if frame:
+                            frames.append(frame)
+                        continue
+                    frame = coalescer.flush()
+                    if frame:
+                        frames.append(frame)
+                    if kind == "map":
+                        # 도구 결과에서 이미 보낸 지도는 다시 보내지 않음
+                        if value != (map_url or tool_map_url):
+                            frames.append(sse_frame({'type': 'map', 'map_url': value}))
+                        map_url = value
+                    elif value not in images:
+                        images.append(value)
+                        frames.append(sse_frame({'type': 'image', 'url': value}))
+                return frames
 
             # 세션 ID 전송
-            yield f"data: {json.dumps({'type': 'session', 'session_id': session_id})}\n\n"
+            yield sse_frame({'type': 'session', 'session_id': session_id})
+
+            async for item in events:
+                # 병합 창 만료 → 모아둔 텍스트 전송
+                if item is TICK:
+                    frame = coalescer.flush()
+                    if frame:
+                        yield frame
+                    continue
 
-            for item in agent.stream(message):
                 # 여러 stream_mode 사용 시 (mode, chunk) 튜플 형식
                 if isinstance(item, tuple) and len(item) == 2:
                     mode, chunk = item
@@ -202,7 +304,10 @@ async def chat_stream(request: ChatRequest):
                             tool_name = chunk.get("tool", "")
                             status_msg = chunk.get("status", "")
                             if tool_name and status_msg:
-                                yield f"data: {json.dumps({'type': 'tool_progress', 'tool': tool_name, 'status': status_msg})}\n\n"
+                                frame = coalescer.flush()
+                                if frame:
+                                    yield frame
+                                yield sse_frame({'type': 'tool_progress', 'tool': tool_name, 'status': status_msg})
                         continue
 
                     # Messages 모드일 때만 아래 로직 실행
@@ -222,59 +327,80 @@ async def chat_stream(request: ChatRequest):
                         tool_args = tc.get("args", "")
                         if tool_name and tool_name != current_tool:
                             current_tool = tool_name
-                            import logging
-                            logging.getLogger("uvicorn.error").warning(f"[TOOL_CALL] {tool_name} args={tool_args}")
-                            yield f"data: {json.dumps({'type': 'tool', 'tool': tool_name, 'status': 'start'})}\n\n"
+                            logger.warning(f"[TOOL_CALL] {tool_name} args={tool_args}")
+                            frame = coalescer.flush()
+                            if frame:
+                                yield frame
+                            yield sse_frame({'type': 'tool', 'tool': tool_name, 'status': 'start'})
 
                 # 도구 완료 - 도구 결과에서 MAP 태그 직접 추출
                 elif hasattr(chunk, 'type') and chunk.type == "tool":
                     if current_tool:
-                        yield f"data: {json.dumps({'type': 'tool', 'tool': current_tool, 'status': 'done'})}\n\n"
+                        frame = coalescer.flush()
+                        if frame:
+                            yield frame
+                        yield sse_frame({'type': 'tool', 'tool': current_tool, 'status': 'done'})
                         # 도구 결과에서 MAP/IMAGE 태그 추출
                         tool_content = chunk.content if isinstance(chunk.content, str) else str(chunk.content)
-                        map_match = re.search(r'\[MAP:([^\]]+)\]', tool_content)
+                        map_match = MAP_TAG_RE.search(tool_content)
                         if map_match and not tool_map_url:
                             tool_map_url = map_match.group(1)
-                        img_matches = re.findall(r'\[IMAGE:(https?://[^\]]+)\]', tool_content)
-                        if img_matches:
-                            tool_images.extend(img_matches)
+                            # 응답 텍스트를 기다리지 않고 지도를 먼저 표시
+                            if not map_url:
+                                yield sse_frame({'type': 'map', 'map_url': tool_map_url})
+                        tool_images.extend(IMAGE_TAG_RE.findall(tool_content))
                     current_tool = None
+                    # 직접 응답 도구: 포맷된 결과가 곧 답변 (LLM 재작성 없음)
+                    if is_direct_return(chunk) and isinstance(chunk.content, str):
+                        for frame in render_text(chunk.content):
+                            yield frame
 
                 # AI 응답 텍스트
                 elif hasattr(chunk, 'content') and chunk.content:
                     if not (hasattr(chunk, 'tool_calls') and chunk.tool_calls):
                         if isinstance(chunk.content, str):
-                            txt = chunk.content
-                            if not text_started:
-                                txt = txt.lstrip('\n')
-                                if txt:
-                                    text_started = True
-                            if txt:
-                                final_text += txt
-                                yield f"data: {json.dumps({'type': 'text', 'content': txt})}\n\n"
+                            texts = [chunk.content]
                         elif isinstance(chunk.content, list):
-                            for item_content in chunk.content:
-                                if isinstance(item_content, dict) and item_content.get('type') == 'text':
-                                    txt = item_content.get('text', '')
-                                    if not text_started:
-                                        txt = txt.lstrip('\n')
-                                        if txt:
-                                            text_started = True
-                                    if txt:
-                                        final_text += txt
-                                        yield f"data: {json.dumps({'type': 'text', 'content': txt})}\n\n"
-
-            # 최종 미디어 태그 추출 결과
-            text, map_url, images = extract_media_tags(final_text)
+                            texts = [
+                                c.get('text', '') for c in chunk.content
+                                if isinstance(c, dict) and c.get('type') == 'text'
+                            ]
+                        else:
+                            texts = []
+                        for txt in texts:
+                            for frame in render_text(txt):
+                                yield frame
+
+            for _, value in tags.finish():
+                coalescer.push(value)
+            frame = coalescer.flush()
+            if frame:
+                yield frame
+
             # Qwen3가 태그를 안 넣었으면 도구 결과에서 추출한 것 사용
             if not map_url and tool_map_url:
                 map_url = tool_map_url
             if not images and tool_images:
                 images = tool_images
-            yield f"data: {json.dumps({'type': 'done', 'map_url': map_url, 'images': images})}\n\n"
+            yield sse_frame({'type': 'done', 'map_url': map_url, 'images': images})
+            outcome = "completed"
 
+        except ClientDisconnected:
+            logger.info(f"[STREAM] 클라이언트 연결 끊김, 실행 취소 (session={session_id})")
         except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+            outcome = "error"
+            frame = coalescer.flush()
+            if frame:
+                yield frame
+            yield sse_frame({'type': 'error', 'message': str(e)})
+        finally:
+            # 연결이 끊겨 제너레이터가 닫히거나 취소된 경우에도 그래프 실행을 정리
+            await events.aclose()
+            admission.release()
+            metrics.inc("chat_stream_runs_total", outcome=outcome, lane=admission.lane.name)
+            metrics.observe(
+                "chat_stream_duration_seconds", time.monotonic() - started_at, outcome=outcome
+            )
 
     return StreamingResponse(
         generate(),
@@ -282,25 +408,109 @@ async def chat_stream(request: ChatRequest):
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
-        }
+        },
+        # 스트림이 시작되기 전에 연결이 끊겨도 승인이 반환되도록
+        background=BackgroundTask(admission.release),
     )
 
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request):
+    """스트리밍 채팅 API"""
+    session_id = request.session_id or str(uuid.uuid4())
+
+    # 이미지가 있으면 저장소에 넣고 참조를 메시지에 추가
+    message = store_images(request.message, request.images)
+    lane = classify_turn(request.message, has_images=bool(request.images))
+
+    return await stream_chat(
+        http_request, session_id, message, request.stream_flush_ms, request.stream_flush_chars, lane
+    )
+
+
+@app.post("/chat/stream/upload")
+async def chat_stream_upload(request: Request):
+    """스트리밍 채팅 API (multipart/form-data)
+
+    이미지 파일을 base64 없이 그대로 받아 청크 단위로 이미지 저장소에 저장합니다.
+    필드: message, session_id(선택), images(파일, 여러 개 가능),
+          stream_flush_ms / stream_flush_chars(선택)
+    """
+    upload = await parse_chat_upload(request)
+    session_id = upload.session_id or str(uuid.uuid4())
+
+    message = upload.message
+    if upload.image_refs:
+        message = f"{' '.join(upload.image_refs)} {message}"
+
+    try:
+        flush_ms = float(upload.fields["stream_flush_ms"]) if upload.fields.get("stream_flush_ms") else None
+        flush_chars = int(upload.fields["stream_flush_chars"]) if upload.fields.get("stream_flush_chars") else None
+    except ValueError:
+        raise HTTPException(status_code=422, detail="stream_flush_ms / stream_flush_chars는 숫자여야 합니다.")
+
+    lane = classify_turn(upload.message, has_images=bool(upload.image_refs))
+    return await stream_chat(request, session_id, message, flush_ms, flush_chars, lane)
+
+
+def _delete_checkpoints(session_id: str):
+    """메모리에서 내려간 세션도 durable 체크포인터에는 히스토리가 남아 있으므로 직접 삭제"""
+    delete_thread = getattr(get_checkpointer(), "delete_thread", None)
+    if delete_thread is not None:
+        delete_thread(session_id)
+
+
 @app.post("/session/clear")
 async def clear_session(session_id: str):
     """세션 초기화"""
-    if session_id in agents:
-        agents[session_id].clear_history()
+    agent = agents.get(session_id)
+    if agent is not None:
+        await agent.stop_summary()
+        agent.clear_history()
+    else:
+        _delete_checkpoints(session_id)
     return {"status": "ok", "session_id": session_id}
 
 
 @app.delete("/session/{session_id}")
 async def delete_session(session_id: str):
-    """세션 삭제"""
-    if session_id in agents:
-        del agents[session_id]
+    """세션 삭제 (체크포인트도 함께 삭제)"""
+    agent = agents.get(session_id)
+    if agent is not None:
+        # 요약의 state 쓰기가 삭제 뒤에 thread를 되살리지 않도록 먼저 끝냄
+        await agent.stop_summary()
+        agents.pop(session_id)
+        agent.delete_history()
+    else:
+        _delete_checkpoints(session_id)
     return {"status": "ok"}
 
 
+@app.get("/sessions/stats")
+async def session_stats():
+    """세션 수와 세션별 대략적인 메모리 사용량"""
+    await agents.ameasure()
+    return agents.stats()
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus 텍스트 포맷 메트릭"""
+    return PlainTextResponse(
+        metrics.render_prometheus({
+            "sessions_active": len(agents),
+            "image_store_bytes": get_image_store().total_bytes,
+        }),
+        media_type="text/plain; version=0.0.4",
+    )
+
+
+@app.get("/scheduler/stats")
+async def scheduler_stats():
+    """레인별 실행/대기/거절 수"""
+    return scheduler.stats()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,221 @@
+"""요청 스케줄러 - 전역 동시 실행 제한, 대기열 상한, 세션별 FIFO 직렬화
+
+- 세션별 잠금: 같은 session_id의 요청은 도착 순서대로 하나씩 실행되어
+  같은 체크포인트 스레드를 동시에 갱신하지 않습니다.
+- 레인(lane): 가벼운 텍스트 턴(text)과 Playwright/이미지 분석이 들어가는 무거운 턴(heavy)을
+  따로 제한해서, 무거운 요청이 몰려도 텍스트 응답 지연이 함께 늘어나지 않습니다.
+- 대기열이 가득 차거나 대기 시간이 초과되면 Retry-After와 함께 429/503으로 거절합니다.
+"""
+
+import re
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Optional
+
+logger = logging.getLogger("uvicorn.error")
+
+TEXT_LANE = "text"
+HEAVY_LANE = "heavy"
+
+# Playwright 크롤링(메뉴/후기)이나 이미지 분석으로 이어지는 요청
+HEAVY_KEYWORDS_RE = re.compile(r'맛집|식당|가게|메뉴|후기|리뷰|평점|평가')
+
+
+def classify_turn(message: str, has_images: bool = False) -> str:
+    """요청이 어느 레인에서 실행될지 결정"""
+    if has_images or HEAVY_KEYWORDS_RE.search(message):
+        return HEAVY_LANE
+    return TEXT_LANE
+
+
+class AdmissionRejected(Exception):
+    """스케줄러가 요청을 받지 않음 (대기열 초과/대기 시간 초과)"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class Lane:
+    """동시 실행 수와 대기열 길이가 제한된 실행 레인"""
+
+    def __init__(self, name: str, concurrency: int, max_queue: int, default_duration: float):
+        self.name = name
+        self.concurrency = max(concurrency, 1)
+        self.max_queue = max(max_queue, 0)
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self.running = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.completed = 0
+        # 턴 실행 시간 지수이동평균 (Retry-After 추정용)
+        self.avg_duration = default_duration
+
+    def retry_after(self) -> int:
+        """지금 대기열 끝에 서면 실행까지 걸릴 대략적인 시간(초)"""
+        rounds = (self.waiting + self.running) / self.concurrency
+        return max(int(rounds * self.avg_duration + 0.5), 1)
+
+    async def acquire(self, timeout: float):
+        if self.waiting >= self.max_queue and self.running >= self.concurrency:
+            self.rejected += 1
+            raise AdmissionRejected(
+                503, f"서버가 혼잡합니다 ({self.name} 대기열 초과)", self.retry_after()
+            )
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=timeout or None)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise AdmissionRejected(
+                503, f"서버가 혼잡합니다 ({self.name} 대기 시간 초과)", self.retry_after()
+            )
+        finally:
+            self.waiting -= 1
+        self.running += 1
+
+    def release(self, duration: float):
+        self.running -= 1
+        self.completed += 1
+        self.avg_duration = 0.8 * self.avg_duration + 0.2 * duration
+        self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_duration": round(self.avg_duration, 2),
+        }
+
+
+@dataclass
+class _SessionSlot:
+    """세션별 FIFO 잠금 (asyncio.Lock은 대기 순서대로 깨움)"""
+    lock: asyncio.Lock
+    pending: int = 0  # 실행 중 + 대기 중인 요청 수
+
+
+class Admission:
+    """승인된 요청 하나. release()는 여러 번 호출해도 한 번만 반영됩니다."""
+
+    def __init__(self, scheduler: "TurnScheduler", session_id: str, lane: Lane):
+        self._scheduler = scheduler
+        self.session_id = session_id
+        self.lane = lane
+        self.started_at = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        self.lane.release(time.monotonic() - self.started_at)
+        self._scheduler._release_session(self.session_id)
+
+
+class TurnScheduler:
+    """세션별 직렬화 + 레인별 동시 실행 제한"""
+
+    def __init__(
+        self,
+        text_concurrency: int = 8,
+        text_queue: int = 32,
+        heavy_concurrency: int = 2,
+        heavy_queue: int = 8,
+        session_queue: int = 2,
+        queue_timeout: float = 30,
+    ):
+        """
+        Args:
+            text_concurrency / text_queue: 텍스트 레인 동시 실행 수 / 대기열 길이
+            heavy_concurrency / heavy_queue: 무거운 레인 동시 실행 수 / 대기열 길이
+            session_queue: 한 세션에서 실행 중인 요청 뒤에 기다릴 수 있는 요청 수
+            queue_timeout: 대기 최대 시간(초) (0이면 무제한)
+        """
+        self.lanes = {
+            TEXT_LANE: Lane(TEXT_LANE, text_concurrency, text_queue, default_duration=5),
+            HEAVY_LANE: Lane(HEAVY_LANE, heavy_concurrency, heavy_queue, default_duration=20),
+        }
+        self.session_queue = max(session_queue, 0)
+        self.queue_timeout = queue_timeout
+        self._sessions: Dict[str, _SessionSlot] = {}
+
+    async def admit(self, session_id: str, lane: str = TEXT_LANE) -> Admission:
+        """
+        세션 잠금과 레인 슬롯을 차례로 얻습니다. 세션 잠금을 먼저 얻으므로
+        같은 세션에서 밀린 요청은 레인 슬롯을 차지하지 않습니다.
+
+        Raises:
+            AdmissionRejected: 세션 대기열 초과(429), 레인 혼잡(503)
+        """
+        target = self.lanes[lane]
+        slot = self._sessions.get(session_id)
+        if slot is None:
+            slot = self._sessions[session_id] = _SessionSlot(lock=asyncio.Lock())
+
+        if slot.pending > self.session_queue:
+            raise AdmissionRejected(
+                429, "이전 요청이 아직 처리 중입니다", target.retry_after()
+            )
+
+        slot.pending += 1
+        deadline = time.monotonic() + self.queue_timeout if self.queue_timeout else None
+        try:
+            try:
+                await asyncio.wait_for(slot.lock.acquire(), timeout=self.queue_timeout or None)
+            except asyncio.TimeoutError:
+                raise AdmissionRejected(
+                    429, "이전 요청이 아직 처리 중입니다", target.retry_after()
+                )
+            try:
+                remaining = max(deadline - time.monotonic(), 0.01) if deadline else 0
+                await target.acquire(remaining)
+            except BaseException:
+                slot.lock.release()
+                raise
+        except BaseException:
+            self._release_pending(session_id, slot)
+            raise
+
+        return Admission(self, session_id, target)
+
+    @asynccontextmanager
+    async def slot(self, session_id: str, lane: str = TEXT_LANE) -> AsyncIterator[Admission]:
+        """admit() + release()를 묶은 컨텍스트 매니저"""
+        admission = await self.admit(session_id, lane)
+        try:
+            yield admission
+        finally:
+            admission.release()
+
+    def is_active(self, session_id: str) -> bool:
+        """세션에 실행 중이거나 대기 중인 요청이 있는지"""
+        return session_id in self._sessions
+
+    def _release_session(self, session_id: str):
+        slot = self._sessions.get(session_id)
+        if slot is None:
+            return
+        slot.lock.release()
+        self._release_pending(session_id, slot)
+
+    def _release_pending(self, session_id: str, slot: _SessionSlot):
+        slot.pending -= 1
+        if slot.pending <= 0:
+            self._sessions.pop(session_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "lanes": {name: lane.stats() for name, lane in self.lanes.items()},
+            "active_sessions": len(self._sessions),
+        }
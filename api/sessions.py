@@ -0,0 +1,209 @@
+"""세션 저장소 - 최대 크기 LRU + 유휴 TTL + 백그라운드 정리"""
+
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Generic, List, Optional, TypeVar
+
+logger = logging.getLogger("uvicorn.error")
+
+T = TypeVar("T")
+
+
+@dataclass
+class SessionEntry(Generic[T]):
+    """세션 하나의 값과 접근 기록"""
+    value: T
+    created_at: float = field(default_factory=time.monotonic)
+    last_access: float = field(default_factory=time.monotonic)
+    approx_bytes: int = 0  # 마지막 측정한 메모리 사용량
+
+
+class SessionStore(Generic[T]):
+    """세션 ID → 값 저장소
+
+    - max_size를 넘으면 가장 오래 사용하지 않은 세션부터 제거 (LRU)
+    - idle_ttl초 동안 접근이 없으면 reap()에서 제거
+    - max_memory_bytes를 넘으면 reap()에서 LRU 순으로 제거
+    - pinned(session_id)가 True인 세션(실행 중인 턴이 있는 세션)은 어떤 이유로도 제거하지 않음
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str], T],
+        max_size: int = 500,
+        idle_ttl: float = 3600,
+        max_memory_bytes: int = 0,
+        sizeof: Optional[Callable[[T], int]] = None,
+        on_evict: Optional[Callable[[str, T], None]] = None,
+        pinned: Optional[Callable[[str], bool]] = None,
+    ):
+        """
+        Args:
+            factory: 세션 ID로 새 값을 만드는 함수
+            max_size: 최대 세션 수 (0이면 제한 없음)
+            idle_ttl: 유휴 만료 시간(초) (0이면 만료 없음)
+            max_memory_bytes: 전체 세션 메모리 상한 (0이면 제한 없음)
+            sizeof: 값의 대략적인 메모리 사용량(bytes)을 반환하는 함수
+            on_evict: 세션이 제거될 때 호출되는 콜백
+            pinned: 지금 제거하면 안 되는 세션인지 판단하는 함수 (max_size는 잠시 넘을 수 있음)
+        """
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self.max_memory_bytes = max_memory_bytes
+        self.sizeof = sizeof
+        self.on_evict = on_evict
+        self.pinned = pinned
+        self._entries: "OrderedDict[str, SessionEntry[T]]" = OrderedDict()
+        self._reaper: Optional[asyncio.Task] = None
+        self.evictions: Dict[str, int] = {"lru": 0, "ttl": 0, "memory": 0, "manual": 0}
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, session_id: str) -> Optional[T]:
+        """세션 값 조회 (접근 시각 갱신, 없으면 None)"""
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return None
+        entry.last_access = time.monotonic()
+        self._entries.move_to_end(session_id)
+        return entry.value
+
+    def get_or_create(self, session_id: str) -> T:
+        """세션 값 조회, 없으면 factory로 생성"""
+        value = self.get(session_id)
+        if value is not None:
+            return value
+
+        value = self.factory(session_id)
+        self._entries[session_id] = SessionEntry(value=value)
+        if self.max_size:
+            overflow = len(self._entries) - self.max_size
+            # 실행 중인 세션은 건너뛰고 오래된 순으로 제거 (모두 실행 중이면 다음 기회로 미룸)
+            for sid in self._evictable():
+                if overflow <= 0:
+                    break
+                if sid != session_id:
+                    self._evict(sid, "lru")
+                    overflow -= 1
+        return value
+
+    def pop(self, session_id: str) -> Optional[T]:
+        """세션 제거 후 값 반환"""
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return None
+        self._evict(session_id, "manual")
+        return entry.value
+
+    def _evictable(self) -> List[str]:
+        """제거해도 되는 세션 ID (오래 사용하지 않은 순)"""
+        return [sid for sid in self._entries if not (self.pinned and self.pinned(sid))]
+
+    def _evict(self, session_id: str, reason: str):
+        entry = self._entries.pop(session_id)
+        self.evictions[reason] += 1
+        if self.on_evict:
+            try:
+                self.on_evict(session_id, entry.value)
+            except Exception as e:
+                logger.warning(f"[SESSION] evict 콜백 실패 ({session_id}): {e}")
+
+    async def ameasure(self):
+        """모든 세션의 메모리 사용량을 다시 측정합니다.
+
+        세션별 측정(SQLite 조회, 객체 그래프 순회)은 스레드에서 실행해 이벤트 루프를 막지 않습니다.
+        """
+        await asyncio.to_thread(self._measure, list(self._entries.values()))
+
+    def _measure(self, entries: List[SessionEntry[T]]):
+        if not self.sizeof:
+            return
+        for entry in entries:
+            try:
+                entry.approx_bytes = self.sizeof(entry.value)
+            except Exception:
+                entry.approx_bytes = 0
+
+    def total_bytes(self) -> int:
+        return sum(entry.approx_bytes for entry in self._entries.values())
+
+    async def reap(self) -> int:
+        """만료된 세션과 메모리 상한 초과분을 정리하고 제거한 개수를 반환합니다."""
+        removed = 0
+
+        if self.idle_ttl:
+            deadline = time.monotonic() - self.idle_ttl
+            expired = [sid for sid in self._evictable() if self._entries[sid].last_access < deadline]
+            for sid in expired:
+                self._evict(sid, "ttl")
+            removed += len(expired)
+
+        await self.ameasure()
+        if self.max_memory_bytes:
+            total = self.total_bytes()
+            # 방금 사용한 세션 하나는 남겨둠
+            newest_id = next(reversed(self._entries), None)
+            for sid in self._evictable():
+                if total <= self.max_memory_bytes:
+                    break
+                if sid == newest_id:
+                    continue
+                total -= self._entries[sid].approx_bytes
+                self._evict(sid, "memory")
+                removed += 1
+
+        return removed
+
+    async def _reap_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                removed = await self.reap()
+                if removed:
+                    logger.info(f"[SESSION] {removed}개 세션 정리 (남은 세션: {len(self)})")
+            except Exception as e:
+                logger.warning(f"[SESSION] 세션 정리 실패: {e}")
+
+    def start_reaper(self, interval: float):
+        """백그라운드 정리 태스크 시작 (실행 중인 이벤트 루프 필요)"""
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_loop(interval))
+
+    async def stop_reaper(self):
+        """백그라운드 정리 태스크 종료"""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            try:
+                await self._reaper
+            except asyncio.CancelledError:
+                pass
+            self._reaper = None
+
+    def stats(self) -> Dict[str, Any]:
+        """세션 수, 메모리 사용량, 세션별 상세 정보"""
+        now = time.monotonic()
+        return {
+            "count": len(self._entries),
+            "max_size": self.max_size,
+            "idle_ttl": self.idle_ttl,
+            "approx_total_bytes": self.total_bytes(),
+            "max_memory_bytes": self.max_memory_bytes,
+            "evictions": dict(self.evictions),
+            "sessions": [
+                {
+                    "session_id": sid,
+                    "approx_bytes": e.approx_bytes,
+                    "idle_seconds": round(now - e.last_access, 1),
+                    "age_seconds": round(now - e.created_at, 1),
+                }
+                for sid, e in reversed(self._entries.items())
+            ],
+        }
@@ -0,0 +1,212 @@
+"""SSE 스트리밍 유틸리티 - 프레임 인코딩, 텍스트 병합(coalescing)"""
+
+import json
+import time
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+try:
+    import orjson
+
+    def _dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def sse_frame(event: Dict[str, Any]) -> bytes:
+    """이벤트 dict를 SSE 프레임(bytes)으로 인코딩"""
+    return b"data: " + _dumps(event) + b"\n\n"
+
+
+class TextCoalescer:
+    """LLM 텍스트 델타를 모아서 크기/시간 창 단위로 한 프레임으로 내보냅니다.
+
+    - flush_chars자 이상 모이거나 첫 델타 이후 flush_ms가 지나면 flush
+    - flush_ms와 flush_chars가 모두 0이면 델타마다 바로 flush (병합 안 함)
+    """
+
+    def __init__(self, flush_ms: float = 20, flush_chars: int = 64):
+        self.flush_s = max(flush_ms, 0) / 1000
+        self.flush_chars = max(flush_chars, 0)
+        self._pending: List[str] = []
+        self._pending_size = 0
+        self._first_at = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.flush_s > 0 or self.flush_chars > 0
+
+    def push(self, text: str) -> Optional[bytes]:
+        """텍스트 델타 추가. flush 조건을 만족하면 프레임 반환."""
+        if not text:
+            return None
+        if not self._pending:
+            self._first_at = time.monotonic()
+        self._pending.append(text)
+        self._pending_size += len(text)
+
+        if (
+            not self.enabled
+            or (self.flush_chars and self._pending_size >= self.flush_chars)
+            or (self.flush_s and time.monotonic() - self._first_at >= self.flush_s)
+        ):
+            return self.flush()
+        return None
+
+    def flush(self) -> Optional[bytes]:
+        """모아둔 텍스트를 프레임으로 반환 (없으면 None)"""
+        if not self._pending:
+            return None
+        frame = sse_frame({"type": "text", "content": "".join(self._pending)})
+        self._pending.clear()
+        self._pending_size = 0
+        return frame
+
+    def timeout(self) -> Optional[float]:
+        """다음 시간 기준 flush까지 남은 초 (대기 중인 텍스트가 없으면 None)"""
+        if not self._pending or not self.flush_s:
+            return None
+        return max(self.flush_s - (time.monotonic() - self._first_at), 0.0)
+
+
+class MediaTagParser:
+    """스트리밍 텍스트에서 [MAP:...], [IMAGE:url] 태그를 증분 파싱합니다.
+
+    청크를 받는 즉시 일반 텍스트는 내보내고, 태그일 수 있는 부분(`[MAP` 등)만 보류합니다.
+    태그가 닫히면 ("map", 값) / ("image", url) 이벤트를 내보내고 텍스트에서는 제거합니다.
+    """
+
+    MAP_OPEN = "[MAP:"
+    IMAGE_OPEN = "[IMAGE:"
+    DROP_TAGS = ("[검색 결과 이미지]",)
+    MAX_TAG_LENGTH = 4096  # 이보다 길게 닫히지 않으면 태그가 아닌 것으로 보고 텍스트로 내보냄
+
+    def __init__(self):
+        self._held = ""
+        self._openers = (self.MAP_OPEN, self.IMAGE_OPEN) + self.DROP_TAGS
+
+    def feed(self, text: str) -> List[tuple]:
+        """
+        청크를 추가하고 확정된 이벤트 목록을 반환합니다.
+
+        Returns:
+            [("text", str) | ("map", str) | ("image", str), ...]
+        """
+        buf = self._held + text
+        self._held = ""
+        events: List[tuple] = []
+        out_start = 0
+        i = buf.find("[")
+
+        while i != -1:
+            rest = buf[i:]
+            opener = next((o for o in self._openers if rest.startswith(o)), None)
+
+            if opener is None:
+                # 아직 짧아서 태그 시작인지 판단할 수 없으면 보류
+                if any(o.startswith(rest) for o in self._openers):
+                    break
+                i = buf.find("[", i + 1)
+                continue
+
+            if opener in self.DROP_TAGS:
+                self._emit_text(events, buf[out_start:i])
+                out_start = i + len(opener)
+                i = buf.find("[", out_start)
+                continue
+
+            close = buf.find("]", i + len(opener))
+            if close == -1:
+                if len(rest) > self.MAX_TAG_LENGTH:
+                    i = buf.find("[", i + 1)
+                    continue
+                break
+
+            value = buf[i + len(opener):close].strip()
+            if opener == self.IMAGE_OPEN and not value.startswith(("http://", "https://")):
+                i = buf.find("[", i + 1)
+                continue
+
+            self._emit_text(events, buf[out_start:i])
+            events.append(("map" if opener == self.MAP_OPEN else "image", value))
+            out_start = close + 1
+            i = buf.find("[", out_start)
+        else:
+            i = len(buf)
+
+        self._emit_text(events, buf[out_start:i])
+        self._held = buf[i:]
+        return events
+
+    def finish(self) -> List[tuple]:
+        """스트림 종료 시 보류 중인 텍스트를 그대로 내보냅니다."""
+        events: List[tuple] = []
+        self._emit_text(events, self._held)
+        self._held = ""
+        return events
+
+    @staticmethod
+    def _emit_text(events: List[tuple], text: str):
+        if text:
+            events.append(("text", text))
+
+
+# iterate_with_timeout이 타임아웃 시 내보내는 값
+TICK = object()
+
+
+class ClientDisconnected(Exception):
+    """SSE 클라이언트 연결이 끊겨 스트림을 중단함"""
+
+
+async def iterate_with_timeout(
+    source: AsyncIterator[Any],
+    timeout: Callable[[], Optional[float]],
+    should_stop: Optional[Callable[[], Awaitable[bool]]] = None,
+    poll_interval: float = 0.5,
+) -> AsyncIterator[Any]:
+    """
+    source의 항목을 그대로 내보내되, timeout()초 동안 항목이 없으면 TICK을 내보냅니다.
+
+    다음 항목을 기다리는 태스크는 타임아웃 시에도 취소하지 않고 계속 기다리므로
+    source 쪽 진행(LLM 스트림, 도구 실행)에는 영향을 주지 않습니다.
+
+    should_stop이 주어지면 항목을 기다리는 동안 poll_interval초마다 확인해서 True면
+    대기 중인 태스크를 취소하고 source를 닫은 뒤 ClientDisconnected를 발생시킵니다.
+    """
+    iterator = source.__aiter__()
+    pending: Optional[asyncio.Future] = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            wait = timeout()
+            if should_stop is not None:
+                wait = poll_interval if wait is None else min(wait, poll_interval)
+            done, _ = await asyncio.wait({pending}, timeout=wait)
+            if not done:
+                if should_stop is not None and await should_stop():
+                    raise ClientDisconnected()
+                remaining = timeout()
+                if remaining is not None and remaining <= 0:
+                    yield TICK
+                continue
+            task, pending = pending, None
+            try:
+                item = task.result()
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        # 진행 중인 LLM 호출/도구 실행까지 취소하고 source를 닫음
+        if pending is not None:
+            pending.cancel()
+            try:
+                await pending
+            except (asyncio.CancelledError, Exception):
+                pass
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
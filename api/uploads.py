@@ -0,0 +1,144 @@
+"""multipart/form-data 채팅 요청 파서 - 파일 파트를 청크 단위로 이미지 저장소에 저장"""
+
+import io
+import hashlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException, Request
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from src.config import settings
+from src.image_store import get_image_store
+
+
+@dataclass
+class ChatUpload:
+    """파싱된 multipart 채팅 요청"""
+    message: str = ""
+    session_id: Optional[str] = None
+    image_refs: List[str] = field(default_factory=list)
+    fields: Dict[str, str] = field(default_factory=dict)
+
+
+class _PartState:
+    """현재 파싱 중인 파트"""
+
+    def __init__(self):
+        self.headers: Dict[bytes, bytes] = {}
+        self.header_field = bytearray()
+        self.header_value = bytearray()
+        self.name = ""
+        self.filename: Optional[str] = None
+        self.mime_type = "image/jpeg"
+        # BytesIO.getvalue()는 내부 bytes를 복사 없이 넘겨줌 (bytearray → bytes 변환은 복사)
+        self.buffer = io.BytesIO()
+        self.hasher = hashlib.sha256()
+
+
+async def parse_chat_upload(request: Request) -> ChatUpload:
+    """
+    multipart 요청 본문을 스트리밍으로 파싱합니다.
+
+    파일 파트는 도착하는 청크를 그대로 버퍼에 쌓으면서 sha256을 갱신하므로
+    base64 JSON 대비 최대 메모리가 원본 파일 크기 수준으로 유지됩니다.
+    크기 제한을 넘으면 본문을 끝까지 읽지 않고 413을 반환합니다.
+
+    Form fields:
+        message: 사용자 메시지
+        session_id: 세션 ID (선택)
+        images: 이미지 파일 (여러 개 가능)
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="multipart/form-data 요청이 필요합니다.")
+
+    max_image_bytes = int(settings.upload_max_image_mb * 1024 * 1024)
+    max_images = settings.upload_max_images
+    max_body = max_images * max_image_bytes + 64 * 1024
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_body:
+        raise HTTPException(status_code=413, detail="업로드 크기 제한을 초과했습니다.")
+
+    store = get_image_store()
+    upload = ChatUpload()
+    part = _PartState()
+
+    def on_part_begin():
+        nonlocal part
+        part = _PartState()
+
+    def on_header_field(data: bytes, start: int, end: int):
+        part.header_field += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int):
+        part.header_value += data[start:end]
+
+    def on_header_end():
+        part.headers[bytes(part.header_field).lower()] = bytes(part.header_value)
+        part.header_field.clear()
+        part.header_value.clear()
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(part.headers.get(b"content-disposition", b""))
+        part.name = disposition.get(b"name", b"").decode("utf-8", "replace")
+        filename = disposition.get(b"filename")
+        part.filename = filename.decode("utf-8", "replace") if filename is not None else None
+        if part.filename is not None:
+            if len(upload.image_refs) >= max_images:
+                raise HTTPException(status_code=413, detail=f"이미지는 최대 {max_images}장까지 업로드할 수 있습니다.")
+            mime = part.headers.get(b"content-type", b"").decode("latin-1").split(";")[0].strip()
+            if mime and not mime.startswith("image/"):
+                raise HTTPException(status_code=415, detail=f"이미지 파일만 업로드할 수 있습니다: {mime}")
+            part.mime_type = mime or "image/jpeg"
+
+    def on_part_data(data: bytes, start: int, end: int):
+        chunk = memoryview(data)[start:end]
+        size = part.buffer.tell()
+        if part.filename is not None:
+            if size + len(chunk) > max_image_bytes:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"이미지 한 장의 최대 크기는 {settings.upload_max_image_mb:g}MB입니다.",
+                )
+            part.hasher.update(chunk)
+        elif size + len(chunk) > 64 * 1024:
+            raise HTTPException(status_code=413, detail=f"폼 필드가 너무 큽니다: {part.name}")
+        part.buffer.write(chunk)
+
+    def on_part_end():
+        data = part.buffer.getvalue()
+        part.buffer.close()
+        if part.filename is not None:
+            if data:
+                key = part.hasher.hexdigest()[:16]
+                upload.image_refs.append(store.put(data, part.mime_type, key=key))
+        else:
+            upload.fields[part.name] = data.decode("utf-8", "replace")
+
+    parser = MultipartParser(
+        boundary,
+        {
+            "on_part_begin": on_part_begin,
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+            "on_part_data": on_part_data,
+            "on_part_end": on_part_end,
+        },
+    )
+
+    async for chunk in request.stream():
+        if chunk:
+            parser.write(chunk)
+    parser.finalize()
+
+    upload.message = upload.fields.get("message", "")
+    upload.session_id = upload.fields.get("session_id") or None
+    return upload
@@ -77,6 +77,32 @@ export default function ChatPage() {
       let mapUrl: string | undefined;
       let aiImages: string[] = [];
 
+      // 스트리밍 중인 AI 메시지를 현재 내용/지도/이미지로 갱신
+      const updateStreaming = () => {
+        const streaming = {
+          content: filterContent(aiContent),
+          mapUrl,
+          images: aiImages,
+        };
+        setMessages((prev) => {
+          const existing = prev.find((m) => m.id === 'ai-streaming');
+          if (existing) {
+            return prev.map((m) =>
+              m.id === 'ai-streaming' ? { ...m, ...streaming } : m
+            );
+          }
+          return [
+            ...prev,
+            {
+              id: 'ai-streaming',
+              role: 'assistant' as const,
+              ...streaming,
+              timestamp: new Date(),
+            },
+          ];
+        });
+      };
+
       for await (const event of streamChatMessage(message, images)) {
         switch (event.type) {
           case 'tool':
@@ -99,24 +125,22 @@ export default function ChatPage() {
           case 'text':
             if (event.content) {
               aiContent += event.content;
-              setMessages((prev) => {
-                const existing = prev.find((m) => m.id === 'ai-streaming');
-                if (existing) {
-                  return prev.map((m) =>
-                    m.id === 'ai-streaming' ? { ...m, content: filterContent(aiContent) } : m
-                  );
-                } else {
-                  return [
-                    ...prev,
-                    {
-                      id: 'ai-streaming',
-                      role: 'assistant' as const,
-                      content: filterContent(aiContent),
-                      timestamp: new Date(),
-                    },
-                  ];
-                }
-              });
+              updateStreaming();
+            }
+            break;
+
+          // 태그가 닫히는 즉시 지도/이미지를 먼저 표시 (최종값은 done 이벤트 기준)
+          case 'map':
+            if (event.map_url) {
+              mapUrl = event.map_url;
+              updateStreaming();
+            }
+            break;
+
+          case 'image':
+            if (event.url && !aiImages.includes(event.url)) {
+              aiImages = [...aiImages, event.url];
+              updateStreaming();
             }
             break;
 
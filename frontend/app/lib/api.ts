@@ -39,59 +39,54 @@ export async function sendChatMessage(message: string): Promise<ChatResponse> {
 }
 
 export interface StreamEvent {
-  type: 'session' | 'tool' | 'tool_progress' | 'text' | 'done' | 'error';
+  type: 'session' | 'tool' | 'tool_progress' | 'text' | 'map' | 'image' | 'done' | 'error';
   session_id?: string;
   tool?: string;
   status?: string;
   content?: string;
   map_url?: string;
   images?: string[];
+  url?: string;  // image 이벤트
   message?: string;
 }
 
-// File을 base64로 변환하는 유틸리티 함수
-async function fileToBase64(file: File): Promise<{ data: string; mime_type: string }> {
-  return new Promise((resolve, reject) => {
-    const reader = new FileReader();
-    reader.onload = () => {
-      const result = reader.result as string;
-      // data:image/jpeg;base64,xxxxx 형식에서 base64 부분만 추출
-      const base64 = result.split(',')[1];
-      resolve({
-        data: base64,
-        mime_type: file.type || 'image/jpeg',
-      });
-    };
-    reader.onerror = reject;
-    reader.readAsDataURL(file);
-  });
-}
-
 export async function* streamChatMessage(
   message: string,
   images?: File[]
 ): AsyncGenerator<StreamEvent, void, unknown> {
-  const url = `${API_BASE_URL}/chat/stream`;
+  // 이미지가 있으면 multipart로 파일을 그대로 전송 (base64 변환 없음)
+  const hasImages = !!images && images.length > 0;
+  const url = hasImages
+    ? `${API_BASE_URL}/chat/stream/upload`
+    : `${API_BASE_URL}/chat/stream`;
   console.log('[API] Fetching:', url, 'with images:', images?.length || 0);
 
-  // 이미지를 base64로 변환
-  let imageData: { data: string; mime_type: string }[] = [];
-  if (images && images.length > 0) {
-    imageData = await Promise.all(images.map(fileToBase64));
+  let body: BodyInit;
+  const headers: Record<string, string> = {};
+  if (hasImages) {
+    const form = new FormData();
+    form.append('message', message);
+    if (currentSessionId) {
+      form.append('session_id', currentSessionId);
+    }
+    for (const image of images!) {
+      form.append('images', image, image.name);
+    }
+    body = form;
+  } else {
+    headers['Content-Type'] = 'application/json';
+    body = JSON.stringify({
+      message,
+      session_id: currentSessionId,
+    });
   }
 
   let response: Response;
   try {
     response = await fetch(url, {
       method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify({
-        message,
-        session_id: currentSessionId,
-        images: imageData.length > 0 ? imageData : undefined,
-      }),
+      headers,
+      body,
     });
   } catch (err) {
     console.error('[API] Fetch error:', err);
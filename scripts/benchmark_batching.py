@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""
+로컬 모델 배치 스케줄러 벤치마크 (CPU + 작은 모델)
+- 동시 요청 N개를 배치 없이(max_batch_size=1) vs 배치로(max_batch_size=N) 처리했을 때 처리량 비교
+
+사용법:
+    python scripts/benchmark_batching.py
+    python scripts/benchmark_batching.py --model hf-internal-testing/tiny-random-LlamaForCausalLM --concurrency 8 --tokens 64
+    python scripts/benchmark_batching.py --int8 --threads 4   # CPU 모드 (동적 int8 양자화)
+"""
+
+import sys
+import time
+import argparse
+import threading
+from pathlib import Path
+from typing import List
+
+import torch
+
+# 프로젝트 루트 추가
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.local_llm import BatchScheduler, GenerationRequest, quantize_for_cpu
+
+
+PROMPTS = [
+    "김치찌개 레시피 알려줘",
+    "강남역 맛집 추천해줘",
+    "비빔밥 칼로리는?",
+    "된장찌개 끓이는 법",
+    "홍대 근처 파스타 식당",
+    "불고기 양념 비율",
+    "아메리카노 열량",
+    "떡볶이 맛집",
+]
+
+
+def run(model, tokenizer, concurrency: int, max_batch_size: int, max_new_tokens: int) -> dict:
+    """동시 요청 concurrency개를 보내고 전체 시간/생성 토큰 수 측정"""
+    scheduler = BatchScheduler(model, tokenizer, max_batch_size=max_batch_size, batch_window=0.02)
+    requests: List[GenerationRequest] = []
+    for i in range(concurrency):
+        inputs = tokenizer(PROMPTS[i % len(PROMPTS)], return_tensors="pt")
+        inputs.pop("token_type_ids", None)
+        requests.append(GenerationRequest(inputs=inputs, max_new_tokens=max_new_tokens, temperature=0.0))
+
+    started_at = time.monotonic()
+    threads = [threading.Thread(target=scheduler.submit, args=(r,)) for r in requests]
+    for t in threads:
+        t.start()
+    for r in requests:
+        r.future.result()
+    elapsed = time.monotonic() - started_at
+    scheduler.close()
+
+    tokens = sum(len(r.token_ids) for r in requests)
+    return {"elapsed": elapsed, "tokens": tokens, "tokens_per_sec": tokens / elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BatchScheduler 처리량 벤치마크")
+    parser.add_argument("--model", default="hf-internal-testing/tiny-random-LlamaForCausalLM", help="HF 모델 (CPU에서 돌릴 작은 모델)")
+    parser.add_argument("--concurrency", type=int, default=8, help="동시 요청 수")
+    parser.add_argument("--tokens", type=int, default=64, help="요청당 max_new_tokens")
+    parser.add_argument("--int8", action="store_true", help="Linear 레이어 동적 int8 양자화 (LOCAL_CPU_INT8)")
+    parser.add_argument("--threads", type=int, default=0, help="torch 스레드 수 (0 = 기본값)")
+    args = parser.parse_args()
+
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    torch.manual_seed(0)
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+
+    started_at = time.monotonic()
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    model = AutoModelForCausalLM.from_pretrained(args.model, torch_dtype=torch.float32).eval()
+    if args.int8:
+        model = quantize_for_cpu(model)
+    load_time = time.monotonic() - started_at
+
+    # 워밍업
+    run(model, tokenizer, 1, 1, 4)
+
+    print("=" * 60)
+    print(f"BatchScheduler Benchmark ({args.model}, CPU{' int8' if args.int8 else ''}, "
+          f"{torch.get_num_threads()} threads)")
+    print(f"모델 로드: {load_time:.1f}s")
+    print(f"동시 요청 {args.concurrency}개 x 최대 {args.tokens} 토큰")
+    print("=" * 60)
+
+    results = {}
+    for label, batch_size in (("순차 (batch=1)", 1), (f"배치 (batch={args.concurrency})", args.concurrency)):
+        result = run(model, tokenizer, args.concurrency, batch_size, args.tokens)
+        results[label] = result
+        print(f"{label:<20} {result['elapsed']*1000:>8.0f}ms  {result['tokens']:>5} tokens  "
+              f"{result['tokens_per_sec']:>8.1f} tok/s")
+
+    sequential, batched = results.values()
+    print("-" * 60)
+    print(f"처리량 향상: x{batched['tokens_per_sec'] / sequential['tokens_per_sec']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,8 @@ echo "최대 컨텍스트: $MAX_MODEL_LEN"
 echo ""
 
 # vLLM 서버 실행
+# --enable-prefix-caching: 시스템 프롬프트 + 도구 스키마(고정 프리픽스)의 KV 캐시를 요청 간 재사용
+# --enable-prompt-tokens-details: 응답 usage에 캐시된 입력 토큰 수 포함 (에이전트 로그/메트릭의 캐시 적중률)
 vllm serve $MODEL \
     --port $PORT \
     --host 0.0.0.0 \
@@ -20,7 +22,9 @@ vllm serve $MODEL \
     --gpu-memory-utilization $GPU_MEMORY_UTILIZATION \
     --trust-remote-code \
     --dtype auto \
+    --enable-prefix-caching \
+    --enable-prompt-tokens-details \
     --api-key "local-vllm-key"
 
 # 백그라운드 실행 원할 시:
-# nohup vllm serve $MODEL --port $PORT --host 0.0.0.0 --max-model-len $MAX_MODEL_LEN --gpu-memory-utilization $GPU_MEMORY_UTILIZATION --trust-remote-code --dtype auto > /tmp/vllm.log 2>&1 &
+# nohup vllm serve $MODEL --port $PORT --host 0.0.0.0 --max-model-len $MAX_MODEL_LEN --gpu-memory-utilization $GPU_MEMORY_UTILIZATION --trust-remote-code --dtype auto --enable-prefix-caching --enable-prompt-tokens-details > /tmp/vllm.log 2>&1 &
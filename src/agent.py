@@ -2,20 +2,44 @@
 
 import os
 import re
+import sys
+import time
 import uuid
+import asyncio
+import logging
 import base64
-from pathlib import Path
-from typing import Optional, List, Dict, Any
+import threading
+from typing import Optional, List, Dict, Any, AsyncIterator, Iterator, Sequence, Tuple
 from langchain_core.language_models import BaseChatModel
-from langchain_core.messages import HumanMessage
-from langchain_core.messages.utils import trim_messages, count_tokens_approximately
+from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
 from langchain_openai import ChatOpenAI
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langgraph.prebuilt import create_react_agent
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.base import BaseCheckpointSaver
 
 from .config import settings, ModelProvider
+from .checkpoint import create_checkpointer
+from .compaction import IMAGE_REFS_KEY, HistoryCompactor, apply_replacements, get_tool_result_store
+from .context import ContextTrimmer, get_token_counter
+from .formatters import is_direct_return, wrap_direct
+from .intent import IntentRouter, SpeculativePrefetcher
+from .hedging import HedgedChatModel, get_hedge_budget, get_latency_tracker
+from .routing import EscalatingChatModel, ModelRouter, RouteDecision
+from .prompt_cache import PromptCacheCallback, StablePrefix, build_prefix, register_prefix
+from .summary import RollingSummarizer, SummaryState, summary_message
+from .metrics import get_metrics
+from .image_store import (
+    IMAGE_REF_PATTERN,
+    IMAGE_REF_PREFIX,
+    get_image_store,
+    get_mime_type,
+    is_image_ref,
+    load_image,
+    load_image_for_llm,
+)
 from .tools import ALL_TOOLS
+from .tools.concurrency import ToolConcurrencyLimiter
 
 
 # 시스템 프롬프트
@@ -25,6 +49,7 @@ SYSTEM_PROMPT = """한국 음식 전문가 AI입니다. 반드시 도구를 호
 - 영양정보 → get_nutrition_info
 - 이미지 분석 → search_food_by_image
 - 후기 → get_restaurant_reviews
+여러 식당을 비교할 때는 식당마다 get_restaurant_reviews를 한 번씩, 한 번의 응답에서 함께 호출하세요 (동시에 실행됩니다).
 도구 결과 기반으로 사용자 질문에 자세하고 친절하게 답변하세요.
 사용자가 명시적으로 요청한 정보에 해당하는 도구만 호출하세요. 도구 결과에서 파생된 추가 검색은 하지 마세요.
 반드시 한국어로만 답변하세요. 중국어/영어 사용 금지.
@@ -43,6 +68,9 @@ def get_llm(provider: Optional[str] = None, model_name: Optional[str] = None) ->
     """
     설정에 따라 LLM 모델을 가져옵니다.
 
+    LLM_HEDGING이면 API 모델(openai, gemini)은 HedgedChatModel로 감싸서, 첫 토큰이 p95 마감 시간 안에
+    오지 않으면 같은 제공자(또는 HEDGE_PROVIDER)로 두 번째 요청을 보냅니다.
+
     Args:
         provider: 모델 제공자 (openai, gemini, local). None이면 설정 파일 사용.
         model_name: 모델 이름. None이면 설정 파일 사용.
@@ -52,13 +80,43 @@ def get_llm(provider: Optional[str] = None, model_name: Optional[str] = None) ->
     """
     if provider is None:
         provider = settings.model_provider.value
+    provider = getattr(provider, "value", provider)
+
+    llm = _create_llm(provider, model_name)
+    if not settings.llm_hedging or provider not in (ModelProvider.OPENAI.value, ModelProvider.GEMINI.value):
+        return llm
 
+    if settings.hedge_provider and settings.hedge_provider != provider:
+        backup, backup_name = _create_llm(settings.hedge_provider), settings.hedge_provider
+    else:
+        backup, backup_name = _create_llm(provider, model_name), f"{provider}-backup"
+    name = f"{provider}/{model_name or 'default'}"
+    tracker_options = dict(
+        quantile=settings.hedge_quantile,
+        initial=settings.hedge_initial_delay,
+        floor=settings.hedge_min_delay,
+        ceiling=settings.hedge_max_delay,
+    )
+    return HedgedChatModel(
+        primary=llm,
+        backup=backup,
+        primary_name=provider,
+        backup_name=backup_name,
+        stream_tracker=get_latency_tracker(f"{name}:stream", **tracker_options),
+        invoke_tracker=get_latency_tracker(f"{name}:invoke", **tracker_options),
+        budget=get_hedge_budget(name, ratio=settings.hedge_max_ratio),
+    )
+
+
+def _create_llm(provider: str, model_name: Optional[str] = None) -> BaseChatModel:
+    """제공자별 LangChain 채팅 모델 생성"""
     if provider == "openai" or provider == ModelProvider.OPENAI:
         return ChatOpenAI(
             model=model_name or settings.openai_model,
             api_key=settings.openai_api_key,
             temperature=0.7,
             streaming=True,  # 🔥 실시간 스트리밍 활성화
+            stream_usage=True,  # 캐시된 입력 토큰 수 집계 (prompt_cache.PromptCacheCallback)
         )
     elif provider == "gemini" or provider == ModelProvider.GEMINI:
         return ChatGoogleGenerativeAI(
@@ -72,7 +130,14 @@ def get_llm(provider: Optional[str] = None, model_name: Optional[str] = None) ->
         return get_local_glm(
             model_path=model_name or settings.local_model_path,
             temperature=0.7,
-            max_new_tokens=2048
+            max_new_tokens=2048,
+            max_batch_size=settings.local_max_batch_size,
+            batch_window=settings.local_batch_window_ms / 1000,
+            prefix_cache_mb=settings.local_prefix_cache_mb,
+            device=settings.local_device,
+            cpu_model_path=settings.local_cpu_model_path or None,
+            cpu_threads=settings.local_cpu_threads,
+            cpu_int8=settings.local_cpu_int8,
         )
     elif provider == "vllm" or provider == ModelProvider.VLLM:
         return ChatOpenAI(
@@ -81,43 +146,92 @@ def get_llm(provider: Optional[str] = None, model_name: Optional[str] = None) ->
             api_key="not-needed",
             temperature=0.3,
             streaming=True,
+            stream_usage=True,
         )
     else:
         raise ValueError(f"지원하지 않는 모델 제공자: {provider}")
 
 
-def _pre_model_trim(state):
-    """vLLM용: 오래된 메시지를 토큰 기반으로 제거합니다.
-    최신 메시지 우선 보존, tool call/result 쌍 자동 유지."""
-    trimmed = trim_messages(
-        state["messages"],
-        strategy="last",
-        token_counter=count_tokens_approximately,
-        max_tokens=4096,
-        start_on="human",
-        end_on=("human", "tool"),
-    )
-    # 디버그: LLM에 전달되는 메시지 로깅
-    import logging
-    logger = logging.getLogger("uvicorn.error")
-    for msg in trimmed:
-        role = getattr(msg, 'type', 'unknown')
-        if role == 'ai' and hasattr(msg, 'tool_calls') and msg.tool_calls:
-            for tc in msg.tool_calls:
-                logger.warning(f"[PRE_MODEL] ai tool_call: {tc['name']}({tc.get('args',{})})")
-        elif role == 'tool':
-            content_preview = str(msg.content)[:100] if msg.content else ''
-            logger.warning(f"[PRE_MODEL] tool result ({msg.name}): {content_preview}...")
-        elif role == 'human':
-            content_preview = str(msg.content)[:100] if msg.content else ''
-            logger.warning(f"[PRE_MODEL] human: {content_preview}")
-    return {"llm_input_messages": trimmed}
+# 제공자별 기본 컨텍스트 예산 (CONTEXT_MAX_TOKENS로 덮어씀)
+# vLLM/로컬은 서버 max-model-len, API 모델은 비용 기준 상한
+DEFAULT_CONTEXT_TOKENS = {
+    ModelProvider.VLLM.value: 8192,
+    ModelProvider.LOCAL.value: 8192,
+    ModelProvider.OPENAI.value: 32768,
+    ModelProvider.GEMINI.value: 32768,
+}
+
+# 도구 동시 실행 제한 (모든 그래프가 공유)
+_tool_limiter = ToolConcurrencyLimiter(
+    max_parallel=settings.tool_max_parallel,
+    per_tool=settings.tool_concurrency,
+)
+
+# 의도가 확실한 요청은 첫 LLM 호출과 동시에 도구를 선실행
+_intent_router = IntentRouter()
+_prefetcher = SpeculativePrefetcher(_tool_limiter.wrap_all(ALL_TOOLS))
+
+# 턴별 모델 계층 선택 (MODEL_ROUTING)
+_model_router = ModelRouter(
+    _intent_router,
+    small_provider=settings.routing_small_provider,
+    large_provider=settings.routing_large_provider,
+)
+
+
+def _build_pre_model_hook(
+    trimmer: ContextTrimmer,
+    compactor: Optional[HistoryCompactor],
+    prefix: StablePrefix,
+):
+    """히스토리 압축 → 토큰 트리밍 → 시스템 프롬프트(+대화 요약) 순서로 실행하는 pre_model_hook
+
+    압축한 ToolMessage는 같은 id로 state에 다시 써서 체크포인트에도 요약본만 남기고,
+    트리밍은 LLM 입력(llm_input_messages)에만 적용합니다.
+    시스템 메시지는 모든 호출에서 바이트 단위로 같게 두고(프리픽스 캐시), 롤링 요약(state["summary"])은
+    그 다음 메시지로 넣습니다.
+    """
+    metrics = get_metrics()
+    system = SystemMessage(content=prefix.system_prompt)
+
+    def pre_model_hook(state, config: RunnableConfig):
+        messages = state["messages"]
+        thread_id = (config or {}).get("configurable", {}).get("thread_id")
+        update = {}
+
+        # 이번 턴의 첫 LLM 응답이 이미 나왔는데 남은 선실행 결과는 쓰이지 않은 것
+        if _prefetcher.has_pending(thread_id) and not isinstance(messages[-1], HumanMessage):
+            _prefetcher.discard(thread_id)
+
+        if compactor is not None:
+            replacements = compactor.compact(messages)
+            if replacements:
+                replaced_ids = {r.id for r in replacements}
+                saved = sum(len(str(m.content)) for m in messages if m.id in replaced_ids)
+                saved -= sum(len(str(r.content)) for r in replacements)
+                metrics.inc("history_compacted_messages_total", len(replacements))
+                metrics.inc("history_compacted_chars_total", max(saved, 0))
+                messages = apply_replacements(messages, replacements)
+                update["messages"] = replacements
+                # 같은 id의 내용이 바뀌었으므로 누적 합을 다시 계산
+                trimmer.forget(thread_id)
+
+        summary = summary_message(state.get("summary"))
+        if summary is None:
+            update["llm_input_messages"] = [system] + trimmer.trim(messages, thread_id)
+        else:
+            trimmed = trimmer.trim(messages, thread_id, extra_tokens=trimmer.count_message(summary))
+            update["llm_input_messages"] = [system, summary] + trimmed
+        return update
+
+    return pre_model_hook
 
 
 def create_food_agent(
     provider: Optional[str] = None,
     model_name: Optional[str] = None,
-    checkpointer: Optional[MemorySaver] = None
+    checkpointer: Optional[BaseCheckpointSaver] = None,
+    direct_return: Sequence[str] = (),
 ):
     """
     한국 음식 에이전트를 생성합니다.
@@ -126,70 +240,207 @@ def create_food_agent(
         provider: 모델 제공자 (openai, gemini)
         model_name: 사용할 모델 이름
         checkpointer: 메모리 체크포인터 (대화 히스토리 자동 관리)
+        direct_return: 직접 응답 도구 이름. 이 도구의 결과는 포매터(src/formatters.py)로
+            렌더링해서 최종 답변으로 반환하고, LLM의 두 번째 생성 없이 턴을 끝냅니다.
 
     Returns:
         LangGraph 에이전트
     """
+    agent, _ = _build_agent(provider, model_name, checkpointer, direct_return)
+    return agent
+
+
+def _build_agent(
+    provider: Optional[str],
+    model_name: Optional[str],
+    checkpointer: Optional[BaseCheckpointSaver],
+    direct_return: Sequence[str] = (),
+) -> tuple:
+    """에이전트 그래프와 (설정 시) 롤링 요약기를 함께 만듭니다."""
     llm = get_llm(provider, model_name)
 
-    p = provider or settings.model_provider.value
-    use_trim = p in ("vllm", ModelProvider.VLLM)
+    p = ModelProvider(provider or settings.model_provider.value).value
+    if settings.model_routing and p == settings.routing_small_provider != settings.routing_large_provider:
+        # 작은 모델이 잘못된 도구 호출을 내면 큰 모델로 같은 입력을 다시 보냄
+        llm = EscalatingChatModel(
+            primary=llm,
+            fallback=get_llm(settings.routing_large_provider),
+            primary_name=p,
+            fallback_name=settings.routing_large_provider,
+        )
+    tools = [wrap_direct(t) if t.name in direct_return else t for t in _prefetcher.wrap_all()]
+
+    # 시스템 프롬프트 + 도구 스키마는 모든 세션/그래프에서 같은 프리픽스 (제공자 쪽 캐시 재사용)
+    prefix = build_prefix(SYSTEM_PROMPT, tools)
+    register_prefix(p, model_name, prefix)
+    # get_llm이 반환한 모델(로컬 싱글톤 등)은 그래프끼리 공유하므로 콜백은 이 그래프 전용 복사본에 붙임
+    # (with_config 바인딩은 create_react_agent가 bind_tools를 다시 부를 때 config가 빠짐)
+    llm = llm.model_copy(update={"callbacks": [PromptCacheCallback(p, prefix.version)]})
+
+    # 모델 토크나이저 기준으로 히스토리를 컨텍스트 길이에 맞게 자름 (모든 제공자)
+    trimmer = ContextTrimmer(
+        count_text=get_token_counter(p, model_name),
+        max_tokens=settings.context_max_tokens or DEFAULT_CONTEXT_TOKENS[p],
+        reserve_output=settings.context_reserve_output,
+        system_prompt=prefix.system_prompt,
+        tools=tools,
+    )
+    # 이미 응답이 끝난 턴의 긴 도구 결과는 요약본으로, 이미지 파트는 참조 + 캡션으로 교체
+    compactor = HistoryCompactor(
+        store=get_tool_result_store(),
+        min_chars=settings.compact_min_chars,
+        digest_chars=settings.compact_digest_chars,
+        tool_results=settings.compact_tool_results,
+    )
 
+    # 시스템 프롬프트는 pre_model_hook에서 대화 요약과 함께 붙임
     agent = create_react_agent(
         model=llm,
-        tools=ALL_TOOLS,
-        prompt=SYSTEM_PROMPT,
+        tools=tools,
+        state_schema=SummaryState,
         checkpointer=checkpointer,
-        pre_model_hook=_pre_model_trim if use_trim else None,
+        pre_model_hook=_build_pre_model_hook(trimmer, compactor, prefix),
     )
 
+    summarizer = None
+    if settings.summary_enabled:
+        summarizer = RollingSummarizer(
+            llm=llm,
+            count_message=trimmer.count_message,
+            trigger_tokens=settings.summary_trigger_tokens or trimmer.budget // 2,
+            keep_turns=settings.summary_keep_turns,
+            max_chars=settings.summary_max_chars,
+        )
+
+    return agent, summarizer
+
+
+# 프로세스 전역 그래프 풀: 모든 세션이 (provider, model, 직접 응답 도구)별 그래프 하나와
+# 체크포인터 하나를 공유하고, 세션은 thread_id로만 구분합니다.
+_graph_pool: Dict[tuple, Any] = {}
+_summarizer_pool: Dict[tuple, Optional[RollingSummarizer]] = {}
+_graph_pool_lock = threading.Lock()
+# 로컬 모델 그래프 키 → 바인딩한 모델의 레지스트리 키 (model_path, dtype, device_map)
+_local_model_keys: Dict[tuple, Tuple[str, str, str]] = {}
+_checkpointer: Optional[BaseCheckpointSaver] = None
+
+
+def get_checkpointer() -> BaseCheckpointSaver:
+    """공유 체크포인터 싱글톤 반환"""
+    global _checkpointer
+    with _graph_pool_lock:
+        if _checkpointer is None:
+            _checkpointer = create_checkpointer()
+        return _checkpointer
+
+
+def get_shared_agent(
+    provider: Optional[str] = None,
+    model_name: Optional[str] = None,
+    direct_return: Sequence[str] = (),
+):
+    """
+    (provider, model_name, direct_return)별로 한 번만 컴파일한 공유 에이전트 그래프를 반환합니다.
+
+    LangGraph 그래프는 thread_id 단위로 재진입 가능하므로 세션마다 새로 만들 필요가 없습니다.
+    직접 응답 그래프도 같은 체크포인터와 state 스키마를 쓰므로 턴마다 그래프를 바꿔도 히스토리가 이어집니다.
+    """
+    key = (ModelProvider(provider or settings.model_provider.value).value, model_name, frozenset(direct_return))
+    agent = _graph_pool.get(key)
+    if agent is not None:
+        return agent
+
+    checkpointer = get_checkpointer()
+    with _graph_pool_lock:
+        agent = _graph_pool.get(key)
+        if agent is None:
+            if key[0] == ModelProvider.LOCAL.value:
+                model_key = _local_model_key(model_name)
+                _drop_local_graphs(model_key)
+            agent, summarizer = _build_agent(key[0], model_name, checkpointer, direct_return)
+            _summarizer_pool[key] = summarizer
+            _graph_pool[key] = agent
+            if key[0] == ModelProvider.LOCAL.value:
+                _local_model_keys[key] = model_key
     return agent
 
 
-def load_image_as_base64(image_path: str) -> Optional[str]:
+def _local_model_key(model_name: Optional[str]) -> Tuple[str, str, str]:
+    """현재 설정으로 get_local_glm이 쓸 레지스트리 키 (model_path, dtype, device_map)"""
+    from .local_llm import resolve_model_key
+    return resolve_model_key(
+        model_name or settings.local_model_path,
+        settings.local_device,
+        settings.local_cpu_model_path or None,
+        settings.local_cpu_int8,
+    )
+
+
+def _drop_local_graphs(model_key: Tuple[str, str, str]):
+    """다른 로컬 모델을 바인딩한 그래프를 풀에서 제거합니다 (_graph_pool_lock 안에서 호출).
+
+    그래프가 들고 있는 LocalGLM4V가 사라져야 레지스트리 참조 수가 0이 되어 이전 가중치가 해제됩니다.
+    경로가 같아도 정밀도/장치가 다르면 다른 모델입니다.
     """
-    이미지 파일을 base64로 인코딩합니다.
+    stale = [key for key, loaded_key in _local_model_keys.items() if loaded_key != model_key]
+    for key in stale:
+        del _local_model_keys[key]
+        _graph_pool.pop(key, None)
+        _summarizer_pool.pop(key, None)
+
+
+def get_shared_summarizer(
+    provider: Optional[str] = None, model_name: Optional[str] = None
+) -> Optional[RollingSummarizer]:
+    """공유 그래프와 같이 만든 롤링 요약기 (SUMMARY_ENABLED가 아니면 None)"""
+    get_shared_agent(provider, model_name)
+    key = (ModelProvider(provider or settings.model_provider.value).value, model_name, frozenset())
+    return _summarizer_pool.get(key)
+
+
+def load_image_as_base64(image_source: str) -> Optional[str]:
+    """
+    이미지를 base64로 인코딩합니다.
 
     Args:
-        image_path: 이미지 파일 경로
+        image_source: image:// 참조 또는 이미지 파일 경로
 
     Returns:
         base64 인코딩된 이미지 문자열
     """
-    if not os.path.exists(image_path):
+    loaded = load_image(image_source)
+    if loaded is None:
         return None
 
-    with open(image_path, "rb") as f:
-        image_data = f.read()
-
-    return base64.b64encode(image_data).decode("utf-8")
+    return base64.b64encode(loaded[0]).decode("utf-8")
 
 
-def get_image_mime_type(image_path: str) -> str:
-    """이미지 파일의 MIME 타입을 반환합니다."""
-    ext = Path(image_path).suffix.lower()
-    mime_types = {
-        ".jpg": "image/jpeg",
-        ".jpeg": "image/jpeg",
-        ".png": "image/png",
-        ".gif": "image/gif",
-        ".webp": "image/webp",
-    }
-    return mime_types.get(ext, "image/jpeg")
+def get_image_mime_type(image_source: str) -> str:
+    """이미지의 MIME 타입을 반환합니다."""
+    if is_image_ref(image_source):
+        image = get_image_store().get(image_source)
+        return image.mime_type if image else "image/jpeg"
+    return get_mime_type(image_source)
 
 
 def extract_image_paths(message: str) -> List[str]:
     """
-    메시지에서 이미지 경로를 추출합니다.
+    메시지에서 이미지 참조(image://)와 로컬 이미지 경로를 추출합니다.
 
     Args:
         message: 사용자 메시지
 
     Returns:
-        이미지 경로 리스트
+        이미지 소스 리스트
     """
     image_paths = []
 
+    # 이미지 저장소 참조
+    store = get_image_store()
+    for key in IMAGE_REF_PATTERN.findall(message):
+        if store.get(key) is not None:
+            image_paths.append(f"{IMAGE_REF_PREFIX}{key}")
+
     # 파일 경로 패턴 (절대 경로)
     path_pattern = r'(/[^\s]+\.(?:jpg|jpeg|png|gif|webp))'
     matches = re.findall(path_pattern, message, re.IGNORECASE)
@@ -206,19 +457,20 @@ def create_multimodal_content(message: str, image_paths: List[str]) -> List[Dict
     텍스트와 이미지를 포함한 멀티모달 콘텐츠를 생성합니다.
 
     Args:
-        message: 텍스트 메시지 (이미지 경로 포함)
-        image_paths: 이미지 경로 리스트
+        message: 텍스트 메시지 (이미지 참조/경로 포함)
+        image_paths: 이미지 소스 리스트
 
     Returns:
         멀티모달 콘텐츠 리스트
     """
     content = []
 
-    # 이미지 추가
+    # 이미지 추가 (긴 변 IMAGE_MAX_EDGE로 축소)
     for image_path in image_paths:
-        base64_image = load_image_as_base64(image_path)
-        if base64_image:
-            mime_type = get_image_mime_type(image_path)
+        loaded = load_image_for_llm(image_path, settings.image_max_edge)
+        if loaded:
+            image_data, mime_type = loaded
+            base64_image = base64.b64encode(image_data).decode("utf-8")
             content.append({
                 "type": "image_url",
                 "image_url": {
@@ -226,7 +478,7 @@ def create_multimodal_content(message: str, image_paths: List[str]) -> List[Dict
                 }
             })
 
-    # 텍스트 추가 (경로 유지 - 도구에서 사용)
+    # 텍스트 추가 (참조/경로 유지 - 도구에서 사용)
     content.append({
         "type": "text",
         "text": message
@@ -235,54 +487,211 @@ def create_multimodal_content(message: str, image_paths: List[str]) -> List[Dict
     return content
 
 
+def _deep_sizeof(obj: Any, seen: Optional[set] = None) -> int:
+    """객체 그래프의 대략적인 메모리 사용량(bytes)을 계산합니다."""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool)) or obj is None:
+        return size
+    # 다른 스레드에서 측정하는 동안 이벤트 루프가 컨테이너를 바꿀 수 있으므로 복사본을 순회
+    if isinstance(obj, dict):
+        for key, value in list(obj.items()):
+            size += _deep_sizeof(key, seen) + _deep_sizeof(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in list(obj):
+            size += _deep_sizeof(item, seen)
+    elif hasattr(obj, "__dict__"):
+        size += _deep_sizeof(vars(obj), seen)
+    return size
+
+
 class KoreanFoodAgent:
-    """한국 음식 에이전트 클래스 (MemorySaver로 자동 히스토리 관리)"""
+    """한국 음식 에이전트 클래스
+
+    그래프와 체크포인터는 프로세스 전역으로 공유하고, 대화 히스토리는 thread_id별로 관리합니다.
+    """
 
     def __init__(
         self,
         provider: Optional[str] = None,
-        model_name: Optional[str] = None
+        model_name: Optional[str] = None,
+        thread_id: Optional[str] = None
     ):
         """
         Args:
             provider: 모델 제공자 (openai, gemini)
             model_name: 사용할 모델 이름
+            thread_id: 대화 thread ID (None이면 새로 생성)
         """
         self.provider = provider or settings.model_provider.value
         self.model_name = model_name
-        self.checkpointer = MemorySaver()
-        self.agent = create_food_agent(provider, model_name, self.checkpointer)
-        self.thread_id = "default"
+        self.checkpointer = get_checkpointer()
+        get_shared_agent(self.provider, model_name)  # 첫 요청 전에 그래프 컴파일
+        self.thread_id = thread_id or str(uuid.uuid4())
+        self._summary_task: Optional[asyncio.Task] = None
+
+    @property
+    def agent(self):
+        """공유 그래프 (인스턴스에 들고 있지 않아야 모델 전환 시 풀에서 빠진 그래프가 해제됨)"""
+        return get_shared_agent(self.provider, self.model_name)
+
+    @property
+    def summarizer(self) -> Optional[RollingSummarizer]:
+        return get_shared_summarizer(self.provider, self.model_name)
 
     def new_conversation(self):
         """새 대화를 시작합니다 (새 thread_id 생성)."""
         self.thread_id = str(uuid.uuid4())
 
+    def release(self):
+        """세션이 메모리에서 내려갈 때 호출합니다 (LRU/유휴/메모리 정리).
+
+        durable 체크포인터(SQLite)의 히스토리는 크래시 복구와 다른 워커가 쓰므로 남겨두고,
+        프로세스 메모리에만 있는 체크포인터(MemorySaver)만 thread를 지워 메모리를 돌려받습니다.
+        """
+        self._cancel_summary()
+        if not getattr(self.checkpointer, "durable", False):
+            self._delete_thread()
+
+    def delete_history(self):
+        """현재 thread의 체크포인트를 공유 체크포인터에서 삭제합니다 (명시적 세션 삭제/초기화 전용)."""
+        self._cancel_summary()
+        self._delete_thread()
+
+    def _delete_thread(self):
+        delete_thread = getattr(self.checkpointer, "delete_thread", None)
+        if delete_thread is not None:
+            delete_thread(self.thread_id)
+
     def clear_history(self):
-        """대화 히스토리를 초기화합니다 (새 thread_id로 전환)."""
+        """대화 히스토리를 초기화합니다 (기존 thread 삭제 후 새 thread_id로 전환)."""
+        self.delete_history()
         self.new_conversation()
 
     def _get_config(self):
         """현재 thread_id로 config 생성."""
         return {"configurable": {"thread_id": self.thread_id}}
 
-    def _prepare_message(self, message: str) -> HumanMessage:
+    def memory_usage(self) -> int:
+        """현재 thread의 체크포인트가 차지하는 대략적인 메모리(bytes)를 반환합니다.
+        SQLite 체크포인터는 메모리 대신 압축 저장 용량을 반환합니다."""
+        cp = self.checkpointer
+        if hasattr(cp, "thread_size"):
+            return cp.thread_size(self.thread_id)
+        size = _deep_sizeof(getattr(cp, "storage", {}).get(self.thread_id, {}))
+        for attr in ("writes", "blobs"):
+            store = getattr(cp, attr, None) or {}
+            size += sum(
+                _deep_sizeof(value)
+                for key, value in list(store.items())
+                if isinstance(key, tuple) and key and key[0] == self.thread_id
+            )
+        return size
+
+    def _cancel_summary(self):
+        """진행 중인 백그라운드 요약 취소 (기다리지 않음 - 세션을 메모리에서 내릴 때)"""
+        if self._summary_task is not None and not self._summary_task.done():
+            self._summary_task.cancel()
+        self._summary_task = None
+
+    async def stop_summary(self, cancel: bool = True):
+        """백그라운드 요약이 끝날 때까지 기다립니다 (새 턴/히스토리 삭제 전에 호출).
+
+        cancel이면 먼저 취소하되, 이미 시작한 state 쓰기(RemoveMessage + 요약)는 끝날 때까지 기다려서
+        새 턴과 같은 thread를 동시에 갱신하지 않도록 합니다.
+        """
+        task, self._summary_task = self._summary_task, None
+        if task is None:
+            return
+        if cancel:
+            task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    def _schedule_summary(self):
+        """응답이 끝난 뒤 백그라운드에서 롤링 요약 실행 (응답 지연 없음)"""
+        if self.summarizer is None:
+            return
+        self._summary_task = asyncio.create_task(self._run_summary(self._get_config()))
+
+    async def _run_summary(self, config: dict):
+        try:
+            await self.summarizer.run(self.agent, config)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.getLogger("uvicorn.error").warning(f"[SUMMARY] 요약 실패: {e}")
+
+    def _route(self, message: str) -> tuple:
+        """
+        이번 턴에 쓸 (그래프, 제공자, 라우팅 결정)을 고릅니다.
+
+        - MODEL_ROUTING이면 메시지에 따라 작은/큰 모델 계층 선택 (아니면 에이전트 제공자, 결정은 None)
+        - 의도 분류기가 확신하는 턴이면 도구를 선실행하고, 직접 응답 도구면 직접 응답 그래프 사용
+        """
+        has_images = bool(extract_image_paths(message))
+        decision = None
+        provider, model_name = self.provider, self.model_name
+        if settings.model_routing:
+            decision = _model_router.route(message, has_images, self.provider)
+            if decision.provider != self.provider:
+                provider, model_name = decision.provider, None
+
+        direct_return = ()
+        if (settings.intent_prefetch or settings.direct_return_tools) and not has_images:
+            intent = _intent_router.classify(message)
+            if intent is not None:
+                if settings.intent_prefetch:
+                    _prefetcher.start(self.thread_id, intent.tool, intent.args)
+                if intent.tool in settings.direct_return_tools:
+                    direct_return = (intent.tool,)
+
+        if (provider, model_name, direct_return) == (self.provider, self.model_name, ()):
+            return self.agent, provider, decision
+        return get_shared_agent(provider, model_name, direct_return=direct_return), provider, decision
+
+    def _log_route(self, decision: Optional[RouteDecision], started_at: float):
+        """라우팅 결정과 턴 소요 시간 기록 (계층별 평균 지연 비교용)"""
+        if decision is None:
+            return
+        elapsed = time.monotonic() - started_at
+        get_metrics().observe("turn_duration_seconds", elapsed, tier=decision.tier, reason=decision.reason)
+        logging.getLogger("uvicorn.error").info(
+            f"[ROUTE] tier={decision.tier} provider={decision.provider} reason={decision.reason} "
+            f"{elapsed:.2f}s (thread={self.thread_id})"
+        )
+
+    def _prepare_message(self, message: str, provider: Optional[str] = None) -> HumanMessage:
         """메시지를 HumanMessage로 변환.
         vLLM(텍스트 전용)에서는 이미지를 포함하지 않음 - Gemini가 도구 내에서 처리."""
         # vLLM은 텍스트 전용 모델이므로 이미지 경로만 텍스트로 전달
         # 에이전트가 search_food_by_image 도구에 경로를 전달하면 Gemini가 분석
-        if self.provider in ("vllm", ModelProvider.VLLM):
+        if (provider or self.provider) in ("vllm", ModelProvider.VLLM):
             return HumanMessage(content=message)
 
         image_paths = extract_image_paths(message)
 
         if image_paths:
             content = create_multimodal_content(message, image_paths)
-            return HumanMessage(content=content)
+            # 다음 턴부터 이미지 파트를 참조로 바꿀 수 있도록 image:// 참조를 기록
+            store = get_image_store()
+            refs = []
+            for path in image_paths:
+                if is_image_ref(path):
+                    refs.append(path)
+                else:
+                    loaded = load_image(path)
+                    if loaded:
+                        refs.append(store.put(*loaded))
+            return HumanMessage(content=content, additional_kwargs={IMAGE_REFS_KEY: refs})
 
         return HumanMessage(content=message)
 
-    def chat(self, message: str) -> str:
+    async def achat(self, message: str) -> str:
         """
         사용자 메시지에 응답합니다. (멀티모달 지원, 자동 히스토리 관리)
 
@@ -292,16 +701,31 @@ class KoreanFoodAgent:
         Returns:
             에이전트 응답
         """
-        human_message = self._prepare_message(message)
-
-        result = self.agent.invoke(
-            {"messages": [human_message]},
-            config=self._get_config()
-        )
+        started_at = time.monotonic()
+        await self.stop_summary()
+        graph, provider, decision = self._route(message)
+        human_message = self._prepare_message(message, provider)
+
+        try:
+            result = await graph.ainvoke(
+                {"messages": [human_message]},
+                config=self._get_config()
+            )
+        finally:
+            _prefetcher.discard(self.thread_id)
+        self._log_route(decision, started_at)
+        self._schedule_summary()
 
         messages = result.get("messages", [])
         if messages:
             last_message = messages[-1]
+            # 직접 응답으로 끝난 턴: 같은 단계의 다른 도구 결과가 뒤에 있어도 포맷된 결과가 답변
+            for m in reversed(messages):
+                if not isinstance(m, ToolMessage):
+                    break
+                if is_direct_return(m):
+                    last_message = m
+                    break
             content = last_message.content
             if isinstance(content, list):
                 # 멀티모달 응답에서 텍스트 추출
@@ -312,7 +736,7 @@ class KoreanFoodAgent:
 
         return "응답을 생성하지 못했습니다."
 
-    def stream(self, message: str):
+    async def astream(self, message: str) -> AsyncIterator[Any]:
         """
         스트리밍으로 응답합니다. (자동 히스토리 관리)
 
@@ -320,16 +744,55 @@ class KoreanFoodAgent:
             message: 사용자 입력 메시지
 
         Yields:
-            (message_chunk, metadata) 튜플
+            (stream_mode, chunk) 튜플
         """
-        human_message = self._prepare_message(message)
+        started_at = time.monotonic()
+        await self.stop_summary()
+        graph, provider, decision = self._route(message)
+        human_message = self._prepare_message(message, provider)
 
-        for chunk in self.agent.stream(
+        stream = graph.astream(
             {"messages": [human_message]},
             config=self._get_config(),
             stream_mode=["messages", "custom"]  # custom 이벤트 활성화
-        ):
-            yield chunk
+        )
+        try:
+            async for chunk in stream:
+                yield chunk
+            self._log_route(decision, started_at)
+            self._schedule_summary()
+        finally:
+            # 소비자가 중간에 닫으면(클라이언트 연결 끊김) 실행 중인 노드/도구도 취소
+            await stream.aclose()
+            _prefetcher.discard(self.thread_id)
+
+    def chat(self, message: str) -> str:
+        """achat의 동기 버전 (CLI/스크립트용, 실행 중인 이벤트 루프 밖에서만 호출)
+
+        루프가 닫히면 백그라운드 요약이 취소되므로 같은 루프에서 요약까지 끝낸 뒤 반환합니다.
+        """
+        async def run() -> str:
+            response = await self.achat(message)
+            await self.stop_summary(cancel=False)
+            return response
+
+        return asyncio.run(run())
+
+    def stream(self, message: str) -> Iterator[Any]:
+        """astream의 동기 버전 (CLI/스크립트용, 실행 중인 이벤트 루프 밖에서만 호출)"""
+        loop = asyncio.new_event_loop()
+        agen = self.astream(message)
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(agen.__anext__())
+                except StopAsyncIteration:
+                    break
+        finally:
+            loop.run_until_complete(agen.aclose())
+            # 루프를 닫기 전에 백그라운드 요약을 끝냄 (닫힌 루프의 태스크는 실행되지 않음)
+            loop.run_until_complete(self.stop_summary(cancel=False))
+            loop.close()
 
     def switch_model(self, provider: str, model_name: Optional[str] = None):
         """
@@ -341,6 +804,6 @@ class KoreanFoodAgent:
         """
         self.provider = provider
         self.model_name = model_name
-        self.agent = create_food_agent(provider, model_name, self.checkpointer)
-        self.new_conversation()  # 모델 전환 시 새 대화 시작
+        get_shared_agent(provider, model_name)
+        self.clear_history()  # 모델 전환 시 새 대화 시작
         print(f"✅ 모델 전환 완료: {provider} - {model_name or '기본 모델'}")
@@ -0,0 +1,397 @@
+"""대화 체크포인터 - MemorySaver 또는 SQLite(WAL) 기반 영구 저장"""
+
+import os
+import zlib
+import random
+import sqlite3
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+from .config import settings
+
+
+class CompressedSerializer:
+    """JsonPlusSerializer(msgpack) 결과를 zstd(없으면 zlib)로 압축하는 직렬화기
+
+    타입 문자열에 코덱을 붙여 저장하므로 ("msgpack+zstd") 압축 없이 저장된 값도 그대로 읽습니다.
+    zstd 압축기/해제기는 여러 스레드에서 동시에 쓸 수 없어 스레드마다 따로 만듭니다.
+    """
+
+    def __init__(self, level: int = 3, min_size: int = 256):
+        self.inner = JsonPlusSerializer()
+        self.level = level
+        self.min_size = min_size  # 이보다 작은 값은 압축하지 않음
+        self._local = threading.local()
+
+    def _zstd(self) -> threading.local:
+        local = self._local
+        if not hasattr(local, "compressor"):
+            local.compressor = zstandard.ZstdCompressor(level=self.level)
+            local.decompressor = zstandard.ZstdDecompressor()
+        return local
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        type_, data = self.inner.dumps_typed(obj)
+        if len(data) < self.min_size:
+            return type_, data
+        if ZSTD_AVAILABLE:
+            return f"{type_}+zstd", self._zstd().compressor.compress(data)
+        return f"{type_}+zlib", zlib.compress(data, self.level)
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, blob = data
+        if type_.endswith("+zstd"):
+            return self.inner.loads_typed((type_[:-5], self._zstd().decompressor.decompress(blob)))
+        if type_.endswith("+zlib"):
+            return self.inner.loads_typed((type_[:-5], zlib.decompress(blob)))
+        return self.inner.loads_typed((type_, blob))
+
+
+class SqliteCheckpointSaver(BaseCheckpointSaver):
+    """SQLite(WAL) 기반 체크포인터
+
+    - thread별로 최근 keep_last개의 체크포인트만 유지 (0이면 전부 유지)
+    - 상태는 msgpack + zstd로 압축 저장
+    - WAL 모드라 같은 호스트의 여러 uvicorn 워커가 하나의 DB를 공유할 수 있음
+    """
+
+    # 프로세스 밖에 남는 저장소 (세션이 메모리에서 내려가도 히스토리를 지우지 않음)
+    durable = True
+
+    def __init__(self, db_path: str, keep_last: int = 5):
+        super().__init__(serde=CompressedSerializer())
+        self.db_path = db_path
+        self.keep_last = keep_last
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                parent_checkpoint_id TEXT,
+                type TEXT,
+                checkpoint BLOB,
+                metadata_type TEXT,
+                metadata BLOB,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+            );
+            CREATE TABLE IF NOT EXISTS writes (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL DEFAULT '',
+                checkpoint_id TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                channel TEXT NOT NULL,
+                type TEXT,
+                value BLOB,
+                task_path TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+            );
+            """
+        )
+
+    # ---------- 동기 API ----------
+
+    def _load_tuple(self, row: tuple, write_rows: List[tuple]) -> CheckpointTuple:
+        thread_id, ns, checkpoint_id, parent_id, type_, blob, meta_type, meta_blob = row
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=self.serde.loads_typed((type_, blob)),
+            metadata=self.serde.loads_typed((meta_type, meta_blob)),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": ns,
+                        "checkpoint_id": parent_id,
+                    }
+                }
+                if parent_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((w_type, value)))
+                for task_id, channel, w_type, value in write_rows
+            ],
+        )
+
+    def _select_writes(self, thread_id: str, ns: str, checkpoint_id: str) -> List[tuple]:
+        return self.conn.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? "
+            "ORDER BY task_id, idx",
+            (thread_id, ns, checkpoint_id),
+        ).fetchall()
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+
+        with self._lock:
+            if checkpoint_id:
+                row = self.conn.execute(
+                    "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+                    "type, checkpoint, metadata_type, metadata FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+                    "type, checkpoint, metadata_type, metadata FROM checkpoints "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, ns),
+                ).fetchone()
+            if row is None:
+                return None
+            write_rows = self._select_writes(row[0], row[1], row[2])
+
+        return self._load_tuple(row, write_rows)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        where, params = [], []
+        if config is not None:
+            where.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            ns = config["configurable"].get("checkpoint_ns")
+            if ns is not None:
+                where.append("checkpoint_ns = ?")
+                params.append(ns)
+            checkpoint_id = get_checkpoint_id(config)
+            if checkpoint_id:
+                where.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before is not None:
+            where.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+            "type, checkpoint, metadata_type, metadata FROM checkpoints"
+        )
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+            loaded = [(row, self._select_writes(row[0], row[1], row[2])) for row in rows]
+
+        count = 0
+        for row, write_rows in loaded:
+            item = self._load_tuple(row, write_rows)
+            if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            yield item
+            count += 1
+            if limit is not None and count >= limit:
+                break
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        parent_id = config["configurable"].get("checkpoint_id")
+        type_, blob = self.serde.dumps_typed(checkpoint)
+        meta_type, meta_blob = self.serde.dumps_typed(dict(metadata))
+
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, "
+                    "parent_checkpoint_id, type, checkpoint, metadata_type, metadata) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, ns, checkpoint["id"], parent_id, type_, blob, meta_type, meta_blob),
+                )
+                if self.keep_last > 0:
+                    self._prune(thread_id, ns)
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def _prune(self, thread_id: str, ns: str):
+        """최근 keep_last개를 제외한 체크포인트와 그 writes 삭제 (트랜잭션 안에서 호출)"""
+        keep = (
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT ?"
+        )
+        args = (thread_id, ns, thread_id, ns, self.keep_last)
+        self.conn.execute(
+            f"DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            f"AND checkpoint_id NOT IN ({keep})",
+            args,
+        )
+        self.conn.execute(
+            f"DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? "
+            f"AND checkpoint_id NOT IN ({keep})",
+            args,
+        )
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # 특수 채널(에러, 인터럽트 등)은 덮어쓰고, 일반 채널은 최초 기록만 유지
+        verb = "REPLACE" if all(w[0] in WRITES_IDX_MAP for w in writes) else "IGNORE"
+        rows = [
+            (
+                thread_id, ns, checkpoint_id, task_id,
+                WRITES_IDX_MAP.get(channel, idx), channel,
+                *self.serde.dumps_typed(value), task_path,
+            )
+            for idx, (channel, value) in enumerate(writes)
+        ]
+
+        with self._lock:
+            self.conn.executemany(
+                f"INSERT OR {verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, "
+                "idx, channel, type, value, task_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self.conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            self.conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+
+    def thread_size(self, thread_id: str) -> int:
+        """thread가 차지하는 저장 용량(bytes, 압축 후)"""
+        with self._lock:
+            (cp_bytes,) = self.conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(checkpoint) + LENGTH(metadata)), 0) "
+                "FROM checkpoints WHERE thread_id = ?",
+                (thread_id,),
+            ).fetchone()
+            (w_bytes,) = self.conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(value)), 0) FROM writes WHERE thread_id = ?",
+                (thread_id,),
+            ).fetchone()
+        return cp_bytes + w_bytes
+
+    def get_next_version(self, current: Optional[str], channel: Any) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # ---------- 비동기 API (스레드 풀에서 동기 API 실행) ----------
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+def create_checkpointer() -> BaseCheckpointSaver:
+    """설정(CHECKPOINTER)에 따라 체크포인터를 생성합니다."""
+    kind = settings.checkpointer.lower()
+    if kind == "memory":
+        return MemorySaver()
+    if kind == "sqlite":
+        return SqliteCheckpointSaver(
+            settings.checkpoint_db_path,
+            keep_last=settings.checkpoint_keep_last,
+        )
+    raise ValueError(f"지원하지 않는 체크포인터: {settings.checkpointer}")
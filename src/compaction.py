@@ -0,0 +1,250 @@
+"""히스토리 압축 - 이미 소비된 도구 결과와 이미지를 가벼운 표현으로 교체
+
+도구 결과(ToolMessage)는 그 결과를 사용한 턴이 끝나면 다시 원문이 필요한 경우가 드뭅니다.
+다음 턴부터는 핵심 줄(숫자/가격/영양성분, 섹션 제목), MAP/IMAGE 태그, 출처 URL만 남긴
+요약본으로 교체합니다. 원문은 프로세스 내 저장소에 보관하고 `tool-result://<key>` 참조는
+additional_kwargs에만 남깁니다 (모델이 다시 가져올 방법이 없으므로 프롬프트에는 넣지 않음).
+
+HumanMessage의 base64 이미지 파트도 같은 시점에 `image://<hash>` 참조와 캡션(이미지 분석
+도구 결과 또는 그 턴의 답변 첫 문장)으로 바꿔서, 이후 턴마다 이미지를 다시 보내지 않습니다.
+"""
+
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+from .config import settings
+from .image_store import get_image_store
+
+TOOL_RESULT_REF_PREFIX = "tool-result://"
+COMPACTED_KEY = "compacted"  # additional_kwargs 표시
+IMAGE_REFS_KEY = "image_refs"  # HumanMessage.additional_kwargs: 첨부 이미지의 image:// 참조
+CAPTION_MAX_CHARS = 120
+VISION_TOOL = "search_food_by_image"
+
+MAP_TAG_RE = re.compile(r'\[MAP:[^\]]+\]')
+IMAGE_TAG_RE = re.compile(r'\[IMAGE:https?://[^\]]+\]')
+URL_RE = re.compile(r'https?://[^\s\]\)"\'<>]+')
+SECTION_RE = re.compile(r'^(\[[^\]]{1,40}\]|=== .+ ===)$')
+FACT_RE = re.compile(r'\d')
+# 모델에게 보낸 지시문은 다음 턴에 필요 없음
+DROP_LINE_RE = re.compile(r'^\[요약 요청\]|^\[검색 결과 이미지\]$')
+
+
+class ToolResultStore:
+    """도구 결과 원문 저장소 (총 용량 기준 LRU)"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._results: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def put(self, text: str) -> str:
+        """원문을 저장하고 참조 문자열 반환 (같은 내용은 한 번만 저장)"""
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+        size = len(text.encode("utf-8"))
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+            else:
+                self._results[key] = (text, time.time())
+                self._total_bytes += size
+                while self._total_bytes > self.max_bytes and len(self._results) > 1:
+                    _, (evicted, _) = self._results.popitem(last=False)
+                    self._total_bytes -= len(evicted.encode("utf-8"))
+        return f"{TOOL_RESULT_REF_PREFIX}{key}"
+
+    def get(self, key_or_ref: str) -> Optional[str]:
+        """참조 또는 key로 원문 조회 (제거되었으면 None)"""
+        key = key_or_ref.removeprefix(TOOL_RESULT_REF_PREFIX)
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is None:
+                return None
+            self._results.move_to_end(key)
+            return entry[0]
+
+
+def digest_tool_result(text: str, max_chars: int = 400) -> str:
+    """
+    도구 결과에서 다음 턴에 쓸 만한 부분만 남긴 요약본을 만듭니다.
+
+    - MAP/IMAGE 태그는 그대로 유지 (지도/이미지 재표시용)
+    - 섹션 제목과 숫자가 들어간 줄(가격, 칼로리, 영양성분, 평점 등)을 앞에서부터 max_chars까지
+    - 본문에 나온 출처 URL 최대 3개
+    """
+    tags = MAP_TAG_RE.findall(text) + IMAGE_TAG_RE.findall(text)
+    body = IMAGE_TAG_RE.sub("", MAP_TAG_RE.sub("", text))
+
+    facts: List[str] = []
+    used = 0
+    for raw in body.splitlines():
+        line = raw.strip()
+        if not line or DROP_LINE_RE.search(line):
+            continue
+        # URL은 아래 출처로 따로 모음
+        line = URL_RE.sub("", line).strip(" :-|")
+        if not (SECTION_RE.match(line) or FACT_RE.search(line)):
+            continue
+        if used + len(line) > max_chars:
+            break
+        facts.append(line)
+        used += len(line) + 1
+
+    sources: List[str] = []
+    for url in URL_RE.findall(body):
+        if url not in sources:
+            sources.append(url)
+        if len(sources) >= 3:
+            break
+
+    parts = facts
+    if sources:
+        parts.append("출처: " + " ".join(sources))
+    parts.extend(tags)
+    return "\n".join(parts)
+
+
+def _first_line(text: str) -> str:
+    for line in text.splitlines():
+        line = line.strip(" #*-")
+        if line and not line.startswith("[요약된 도구 결과"):
+            return line
+    return ""
+
+
+def find_image_caption(messages: Sequence[BaseMessage], start: int) -> str:
+    """
+    messages[start]의 이미지에 대한 캡션을 같은 턴에서 찾습니다.
+
+    이미지 분석 도구(search_food_by_image) 결과의 첫 줄, 없으면 그 턴 최종 답변의 첫 문장.
+    """
+    answer = ""
+    for message in messages[start + 1:]:
+        if isinstance(message, HumanMessage):
+            break
+        if isinstance(message, ToolMessage) and message.name == VISION_TOOL and isinstance(message.content, str):
+            caption = _first_line(message.content)
+            if caption:
+                return caption[:CAPTION_MAX_CHARS]
+        if isinstance(message, AIMessage) and not message.tool_calls and isinstance(message.content, str):
+            answer = message.content
+    return re.split(r'(?<=[.!?다요])\s', _first_line(answer), maxsplit=1)[0][:CAPTION_MAX_CHARS]
+
+
+class HistoryCompactor:
+    """마지막 HumanMessage 이전(이미 응답이 끝난 턴)의 긴 ToolMessage와 이미지 파트를 교체"""
+
+    def __init__(
+        self,
+        store: "ToolResultStore",
+        min_chars: int = 600,
+        digest_chars: int = 400,
+        tool_results: bool = True,
+    ):
+        """
+        Args:
+            store: 원문 저장소
+            min_chars: 이보다 짧은 도구 결과는 그대로 둠
+            digest_chars: 요약본의 핵심 줄 최대 길이
+            tool_results: False면 이미지 파트만 교체
+        """
+        self.store = store
+        self.min_chars = min_chars
+        self.digest_chars = digest_chars
+        self.tool_results = tool_results
+
+    def _compact_images(self, messages: Sequence[BaseMessage], index: int) -> HumanMessage:
+        """이미지 파트를 빼고 텍스트 + 이미지 참조/캡션만 남긴 HumanMessage"""
+        message = messages[index]
+        text = "\n".join(
+            part.get("text", "") if isinstance(part, dict) else str(part)
+            for part in message.content
+            if not isinstance(part, dict) or part.get("type") == "text"
+        )
+        caption = find_image_caption(messages, index)
+        store = get_image_store()
+        lines = [text]
+        for ref in message.additional_kwargs.get(IMAGE_REFS_KEY, []):
+            image = store.get(ref)
+            if image is not None and caption:
+                image.meta.setdefault("caption", caption)
+            lines.append(f"[첨부 이미지 {ref}" + (f": {caption}]" if caption else "]"))
+        return HumanMessage(
+            content="\n".join(lines),
+            id=message.id,
+            additional_kwargs={**message.additional_kwargs, COMPACTED_KEY: True},
+        )
+
+    def compact(self, messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+        """
+        교체할 메시지 목록을 반환합니다. (같은 id로 반환하므로 add_messages가 덮어씀)
+        """
+        last_human = next(
+            (i for i in range(len(messages) - 1, -1, -1) if isinstance(messages[i], HumanMessage)),
+            None,
+        )
+        if last_human is None:
+            return []
+
+        replacements: List[BaseMessage] = []
+        for index, message in enumerate(messages[:last_human]):
+            if message.additional_kwargs.get(COMPACTED_KEY):
+                continue
+            if isinstance(message, HumanMessage):
+                if not isinstance(message.content, str) and any(
+                    isinstance(part, dict) and part.get("type") in ("image_url", "image")
+                    for part in message.content
+                ):
+                    replacements.append(self._compact_images(messages, index))
+                continue
+            if not self.tool_results or not isinstance(message, ToolMessage):
+                continue
+            if not isinstance(message.content, str) or len(message.content) < self.min_chars:
+                continue
+
+            ref = self.store.put(message.content)
+            digest = digest_tool_result(message.content, self.digest_chars)
+            replacements.append(ToolMessage(
+                content=f"[요약된 도구 결과]\n{digest}",
+                tool_call_id=message.tool_call_id,
+                name=message.name,
+                id=message.id,
+                status=message.status,
+                artifact=message.artifact,
+                additional_kwargs={**message.additional_kwargs, COMPACTED_KEY: ref},
+            ))
+        return replacements
+
+
+def apply_replacements(
+    messages: Sequence[BaseMessage], replacements: Sequence[BaseMessage]
+) -> List[BaseMessage]:
+    """메시지 목록에서 같은 id의 메시지를 교체한 새 목록 반환"""
+    by_id = {m.id: m for m in replacements}
+    return [by_id.get(m.id, m) for m in messages]
+
+
+# 싱글톤 인스턴스
+_store: Optional[ToolResultStore] = None
+
+
+def get_tool_result_store() -> ToolResultStore:
+    """도구 결과 원문 저장소 싱글톤 인스턴스 반환"""
+    global _store
+    if _store is None:
+        _store = ToolResultStore(max_bytes=int(settings.tool_result_store_max_mb * 1024 * 1024))
+    return _store
@@ -2,12 +2,23 @@
 
 import os
 from enum import Enum
+from typing import Dict, List
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
+def _parse_limits(value: str) -> Dict[str, int]:
+    """"name=3,other=2" 형식의 환경변수를 dict로 변환"""
+    limits = {}
+    for item in value.split(","):
+        name, sep, limit = item.partition("=")
+        if sep and name.strip() and limit.strip().isdigit():
+            limits[name.strip()] = int(limit)
+    return limits
+
+
 class ModelProvider(str, Enum):
     """LLM 제공자"""
     OPENAI = "openai"
@@ -35,6 +46,30 @@ class Settings(BaseModel):
             "/home/ondamlab/.cache/huggingface/hub/models--zai-org--GLM-4.6V-Flash/snapshots/main"
         )
     )
+    # 로컬 모델 장치 (auto = GPU가 없으면 CPU 모드: 동적 int8 양자화 + 작은 체크포인트)
+    local_device: str = Field(
+        default_factory=lambda: os.getenv("LOCAL_DEVICE", "auto")  # auto | cuda | cpu
+    )
+    local_cpu_model_path: str = Field(
+        default_factory=lambda: os.getenv("LOCAL_CPU_MODEL_PATH", "")  # 비우면 LOCAL_MODEL_PATH
+    )
+    local_cpu_threads: int = Field(
+        default_factory=lambda: int(os.getenv("LOCAL_CPU_THREADS", "0"))  # 0 = torch 기본값
+    )
+    local_cpu_int8: bool = Field(
+        default_factory=lambda: os.getenv("LOCAL_CPU_INT8", "true").lower() in ("1", "true", "yes")
+    )
+    # 로컬 모델 배치 스케줄러 (src/local_llm.py) - 여러 세션의 동시 요청을 한 번의 generate로 묶음
+    local_max_batch_size: int = Field(
+        default_factory=lambda: int(os.getenv("LOCAL_MAX_BATCH_SIZE", "8"))  # 1 = 배치 없이 순서대로
+    )
+    local_batch_window_ms: float = Field(
+        default_factory=lambda: float(os.getenv("LOCAL_BATCH_WINDOW_MS", "10"))
+    )
+    # 대화별 프롬프트 접두사 KV 재사용 - 새 턴은 새 토큰만 프리필
+    local_prefix_cache_mb: int = Field(
+        default_factory=lambda: int(os.getenv("LOCAL_PREFIX_CACHE_MB", "1024"))  # 0 = 사용 안 함
+    )
 
     # vLLM 설정
     vllm_base_url: str = Field(
@@ -47,6 +82,170 @@ class Settings(BaseModel):
         )
     )
 
+    # 체크포인터 (대화 히스토리 저장소): memory 또는 sqlite
+    checkpointer: str = Field(default_factory=lambda: os.getenv("CHECKPOINTER", "memory"))
+    checkpoint_db_path: str = Field(
+        default_factory=lambda: os.getenv("CHECKPOINT_DB_PATH", "data/checkpoints.sqlite")
+    )
+    checkpoint_keep_last: int = Field(
+        default_factory=lambda: int(os.getenv("CHECKPOINT_KEEP_LAST", "5"))  # 0 = 전부 유지
+    )
+
+    # 업로드 이미지 저장소 (프로세스 메모리, LRU)
+    image_store_max_mb: float = Field(
+        default_factory=lambda: float(os.getenv("IMAGE_STORE_MAX_MB", "256"))
+    )
+    # LLM에 보내기 전 이미지 긴 변 최대 크기 (px, 0 = 원본)
+    image_max_edge: int = Field(
+        default_factory=lambda: int(os.getenv("IMAGE_MAX_EDGE", "1024"))
+    )
+
+    # multipart 이미지 업로드 제한 (/chat/stream/upload)
+    upload_max_image_mb: float = Field(
+        default_factory=lambda: float(os.getenv("UPLOAD_MAX_IMAGE_MB", "10"))
+    )
+    upload_max_images: int = Field(
+        default_factory=lambda: int(os.getenv("UPLOAD_MAX_IMAGES", "5"))
+    )
+
+    # SSE 텍스트 병합 창 (둘 다 0이면 토큰마다 전송)
+    sse_flush_ms: float = Field(default_factory=lambda: float(os.getenv("SSE_FLUSH_MS", "20")))
+    sse_flush_chars: int = Field(default_factory=lambda: int(os.getenv("SSE_FLUSH_CHARS", "64")))
+    # 스트리밍 중 클라이언트 연결 끊김 확인 주기 (초)
+    sse_disconnect_poll: float = Field(
+        default_factory=lambda: float(os.getenv("SSE_DISCONNECT_POLL", "0.5"))
+    )
+
+    # 세션 관리 (api/main.py)
+    session_max_size: int = Field(
+        default_factory=lambda: int(os.getenv("SESSION_MAX_SIZE", "500"))
+    )
+    session_idle_ttl: float = Field(
+        default_factory=lambda: float(os.getenv("SESSION_IDLE_TTL", "3600"))
+    )
+    session_reap_interval: float = Field(
+        default_factory=lambda: float(os.getenv("SESSION_REAP_INTERVAL", "60"))
+    )
+    session_max_memory_mb: float = Field(
+        default_factory=lambda: float(os.getenv("SESSION_MAX_MEMORY_MB", "0"))  # 0 = 제한 없음
+    )
+
+
+    # 요청 스케줄러 (api/scheduler.py) - text: 일반 대화, heavy: 크롤링/이미지 분석
+    scheduler_text_concurrency: int = Field(
+        default_factory=lambda: int(os.getenv("SCHEDULER_TEXT_CONCURRENCY", "8"))
+    )
+    scheduler_text_queue: int = Field(
+        default_factory=lambda: int(os.getenv("SCHEDULER_TEXT_QUEUE", "32"))
+    )
+    scheduler_heavy_concurrency: int = Field(
+        default_factory=lambda: int(os.getenv("SCHEDULER_HEAVY_CONCURRENCY", "2"))
+    )
+    scheduler_heavy_queue: int = Field(
+        default_factory=lambda: int(os.getenv("SCHEDULER_HEAVY_QUEUE", "8"))
+    )
+    scheduler_session_queue: int = Field(
+        default_factory=lambda: int(os.getenv("SCHEDULER_SESSION_QUEUE", "2"))
+    )
+    scheduler_queue_timeout: float = Field(
+        default_factory=lambda: float(os.getenv("SCHEDULER_QUEUE_TIMEOUT", "30"))  # 0 = 무제한
+    )
+
+
+    # 컨텍스트 트리밍 (src/context.py) - 0이면 제공자별 기본값
+    context_max_tokens: int = Field(
+        default_factory=lambda: int(os.getenv("CONTEXT_MAX_TOKENS", "0"))
+    )
+    context_reserve_output: int = Field(
+        default_factory=lambda: int(os.getenv("CONTEXT_RESERVE_OUTPUT", "2048"))
+    )
+
+    # 도구 결과 압축 (src/compaction.py) - 이전 턴의 긴 도구 결과를 요약본으로 교체
+    compact_tool_results: bool = Field(
+        default_factory=lambda: os.getenv("COMPACT_TOOL_RESULTS", "true").lower() in ("1", "true", "yes")
+    )
+    compact_min_chars: int = Field(
+        default_factory=lambda: int(os.getenv("COMPACT_MIN_CHARS", "600"))
+    )
+    compact_digest_chars: int = Field(
+        default_factory=lambda: int(os.getenv("COMPACT_DIGEST_CHARS", "400"))
+    )
+    tool_result_store_max_mb: float = Field(
+        default_factory=lambda: float(os.getenv("TOOL_RESULT_STORE_MAX_MB", "64"))
+    )
+
+    # 롤링 대화 요약 (src/summary.py) - 응답 후 백그라운드에서 오래된 턴을 요약으로 접음
+    summary_enabled: bool = Field(
+        default_factory=lambda: os.getenv("SUMMARY_ENABLED", "false").lower() in ("1", "true", "yes")
+    )
+    summary_trigger_tokens: int = Field(
+        default_factory=lambda: int(os.getenv("SUMMARY_TRIGGER_TOKENS", "0"))  # 0 = 컨텍스트 예산의 절반
+    )
+    summary_keep_turns: int = Field(
+        default_factory=lambda: int(os.getenv("SUMMARY_KEEP_TURNS", "2"))
+    )
+    summary_max_chars: int = Field(
+        default_factory=lambda: int(os.getenv("SUMMARY_MAX_CHARS", "800"))
+    )
+
+    # 의도 분류 후 도구 선실행 (src/intent.py)
+    intent_prefetch: bool = Field(
+        default_factory=lambda: os.getenv("INTENT_PREFETCH", "true").lower() in ("1", "true", "yes")
+    )
+    # 직접 응답 도구 (src/formatters.py) - 의도가 확실한 턴은 도구 결과를 포맷해서 바로 답변 (기본: 사용 안 함)
+    direct_return_tools: List[str] = Field(
+        default_factory=lambda: [
+            name.strip()
+            for name in os.getenv("DIRECT_RETURN_TOOLS", "").split(",")
+            if name.strip()
+        ]
+    )
+
+    # 모델 계층 라우팅 (src/routing.py) - 인사/단일 도구 턴은 작은 모델, 멀티모달/여러 도구 턴은 큰 모델
+    model_routing: bool = Field(
+        default_factory=lambda: os.getenv("MODEL_ROUTING", "false").lower() in ("1", "true", "yes")
+    )
+    routing_small_provider: str = Field(
+        default_factory=lambda: os.getenv("ROUTING_SMALL_PROVIDER", "vllm")
+    )
+    routing_large_provider: str = Field(
+        default_factory=lambda: os.getenv("ROUTING_LARGE_PROVIDER", "gemini")
+    )
+
+    # LLM 요청 헤징 (src/hedging.py) - openai/gemini 첫 토큰이 p95 마감 시간을 넘기면 두 번째 요청
+    llm_hedging: bool = Field(
+        default_factory=lambda: os.getenv("LLM_HEDGING", "false").lower() in ("1", "true", "yes")
+    )
+    hedge_provider: str = Field(
+        default_factory=lambda: os.getenv("HEDGE_PROVIDER", "")  # 비우면 같은 제공자
+    )
+    hedge_quantile: float = Field(
+        default_factory=lambda: float(os.getenv("HEDGE_QUANTILE", "0.95"))
+    )
+    hedge_initial_delay: float = Field(
+        default_factory=lambda: float(os.getenv("HEDGE_INITIAL_DELAY", "3.0"))  # 표본이 모이기 전 마감 시간
+    )
+    hedge_min_delay: float = Field(
+        default_factory=lambda: float(os.getenv("HEDGE_MIN_DELAY", "0.5"))
+    )
+    hedge_max_delay: float = Field(
+        default_factory=lambda: float(os.getenv("HEDGE_MAX_DELAY", "10.0"))
+    )
+    hedge_max_ratio: float = Field(
+        default_factory=lambda: float(os.getenv("HEDGE_MAX_RATIO", "0.1"))  # 호출 대비 헤지 비율 상한
+    )
+
+    # 도구 동시 실행 제한 (src/tools/concurrency.py) - 한 단계의 여러 tool_call은 동시에 실행됨
+    tool_max_parallel: int = Field(
+        default_factory=lambda: int(os.getenv("TOOL_MAX_PARALLEL", "4"))  # 0 = 제한 없음
+    )
+    tool_concurrency: Dict[str, int] = Field(
+        default_factory=lambda: _parse_limits(os.getenv(
+            "TOOL_CONCURRENCY",
+            "get_restaurant_reviews=3,search_restaurant_info=3,search_food_by_image=2",
+        ))
+    )
+
 
 # 전역 설정 인스턴스
 settings = Settings()
@@ -0,0 +1,244 @@
+"""컨텍스트 관리 - 모델 토크나이저 기반 증분 히스토리 트리밍
+
+pre_model_hook으로 매 모델 호출 전에 실행됩니다.
+- 메시지별 토큰 수는 (message id, 내용 길이) 키로 캐시하므로 새 메시지만 토크나이즈합니다.
+- thread별로 누적 합(prefix sum)을 유지해서 자를 위치를 이진 탐색으로 찾습니다.
+- 시스템 프롬프트, 도구 스키마, 출력 토큰만큼은 미리 예산에서 뺍니다.
+"""
+
+import json
+import bisect
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from .config import settings, ModelProvider
+
+logger = logging.getLogger("uvicorn.error")
+
+# 메시지 하나당 역할/구분 토큰 (chat template 오버헤드)
+MESSAGE_OVERHEAD_TOKENS = 4
+# 이미지 한 장 (base64 문자열을 토크나이즈하지 않고 고정값으로 계산)
+IMAGE_TOKENS = 768
+
+
+def _estimate_tokens(text: str) -> int:
+    """토크나이저가 없을 때의 추정치
+
+    한글 음절은 BPE 토크나이저에서 대부분 1토큰 이상이므로 글자당 1토큰,
+    ASCII는 4글자당 1토큰, 그 밖의 문자는 글자당 1토큰으로 계산합니다.
+    (문자 수/4 기반 추정은 한글을 3~4배 적게 셉니다)
+    """
+    ascii_chars = 0
+    other = 0
+    for ch in text:
+        if ord(ch) < 128:
+            ascii_chars += 1
+        else:
+            other += 1
+    return other + (ascii_chars + 3) // 4
+
+
+def get_token_counter(provider: str, model_name: Optional[str] = None) -> Callable[[str], int]:
+    """
+    모델에 맞는 텍스트 토큰 카운터를 반환합니다.
+
+    - vllm / local: 모델 경로의 HuggingFace 토크나이저 (transformers)
+    - openai: tiktoken
+    - 그 외 또는 라이브러리/모델 파일이 없으면 _estimate_tokens
+    """
+    try:
+        if provider in ("vllm", ModelProvider.VLLM, "local", ModelProvider.LOCAL):
+            from transformers import AutoTokenizer
+
+            is_vllm = provider in ("vllm", ModelProvider.VLLM)
+            path = model_name or (settings.vllm_model if is_vllm else settings.local_model_path)
+            tokenizer = AutoTokenizer.from_pretrained(path, trust_remote_code=True)
+            return lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+
+        if provider in ("openai", ModelProvider.OPENAI):
+            import tiktoken
+
+            try:
+                encoding = tiktoken.encoding_for_model(model_name or settings.openai_model)
+            except KeyError:
+                encoding = tiktoken.get_encoding("o200k_base")
+            return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception as e:
+        logger.info(f"[CONTEXT] 토크나이저 로드 실패, 추정치 사용 ({provider}): {e}")
+
+    return _estimate_tokens
+
+
+class _ThreadWindow:
+    """thread 하나의 메시지별 토큰 수와 누적 합"""
+
+    def __init__(self):
+        self.ids: List[Optional[str]] = []
+        self.prefix: List[int] = [0]  # prefix[i] = 앞의 i개 메시지 토큰 합
+
+
+class ContextTrimmer:
+    """모델 호출 전 히스토리를 토큰 예산에 맞게 자르는 pre_model_hook"""
+
+    def __init__(
+        self,
+        count_text: Callable[[str], int],
+        max_tokens: int,
+        reserve_output: int = 2048,
+        system_prompt: str = "",
+        tools: Sequence[BaseTool] = (),
+        cache_size: int = 50_000,
+        max_threads: int = 2_000,
+    ):
+        """
+        Args:
+            count_text: 텍스트 → 토큰 수
+            max_tokens: 모델 컨텍스트 길이
+            reserve_output: 출력용으로 남겨둘 토큰 수
+            system_prompt: 시스템 프롬프트 (예산에서 제외)
+            tools: 바인딩되는 도구 (스키마 크기만큼 예산에서 제외)
+            cache_size: 메시지 토큰 수 캐시 크기
+            max_threads: 누적 합을 유지할 최대 thread 수
+        """
+        self.count_text = count_text
+        self.max_tokens = max_tokens
+        self.reserve_output = reserve_output
+        self.fixed_tokens = count_text(system_prompt) + MESSAGE_OVERHEAD_TOKENS if system_prompt else 0
+        if tools:
+            schemas = json.dumps([convert_to_openai_tool(t) for t in tools], ensure_ascii=False)
+            self.fixed_tokens += count_text(schemas)
+        self.cache_size = cache_size
+        self.max_threads = max_threads
+        self._cache: "OrderedDict[tuple, int]" = OrderedDict()
+        self._windows: "OrderedDict[str, _ThreadWindow]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def budget(self) -> int:
+        """메시지에 쓸 수 있는 토큰 수"""
+        return max(self.max_tokens - self.reserve_output - self.fixed_tokens, 0)
+
+    def _count_message_uncached(self, message: BaseMessage) -> int:
+        tokens = MESSAGE_OVERHEAD_TOKENS
+        content = message.content
+        if isinstance(content, str):
+            tokens += self.count_text(content)
+        else:
+            for part in content:
+                if isinstance(part, str):
+                    tokens += self.count_text(part)
+                elif part.get("type") == "text":
+                    tokens += self.count_text(part.get("text", ""))
+                elif part.get("type") in ("image_url", "image"):
+                    tokens += IMAGE_TOKENS
+        if isinstance(message, AIMessage) and message.tool_calls:
+            for tc in message.tool_calls:
+                tokens += self.count_text(tc["name"]) + self.count_text(
+                    json.dumps(tc.get("args", {}), ensure_ascii=False)
+                )
+        return tokens
+
+    def count_message(self, message: BaseMessage) -> int:
+        """메시지 토큰 수 (id가 있으면 캐시 사용)"""
+        if message.id is None:
+            return self._count_message_uncached(message)
+
+        # 같은 id라도 내용이 교체될 수 있으므로(도구 결과 압축 등) 길이를 함께 키로 사용
+        key = (message.id, len(message.content) if isinstance(message.content, str) else len(str(message.content)))
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+
+        tokens = self._count_message_uncached(message)
+        with self._lock:
+            self._cache[key] = tokens
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return tokens
+
+    def _window(self, thread_id: Optional[str], messages: Sequence[BaseMessage]) -> _ThreadWindow:
+        """thread의 누적 합을 갱신해서 반환 (이전 호출 이후 추가된 메시지만 계산)"""
+        with self._lock:
+            window = self._windows.get(thread_id) if thread_id else None
+            if window is not None:
+                self._windows.move_to_end(thread_id)
+
+        if window is None:
+            window = _ThreadWindow()
+        else:
+            # 앞부분이 그대로인지 확인 (삭제/요약으로 바뀌었으면 처음부터 다시 계산, 캐시 덕분에 저렴함)
+            n = len(window.ids)
+            if n > len(messages) or any(
+                window.ids[i] != messages[i].id or messages[i].id is None for i in (0, n - 1) if n
+            ):
+                window = _ThreadWindow()
+
+        for message in messages[len(window.ids):]:
+            window.ids.append(message.id)
+            window.prefix.append(window.prefix[-1] + self.count_message(message))
+
+        if thread_id:
+            with self._lock:
+                self._windows[thread_id] = window
+                while len(self._windows) > self.max_threads:
+                    self._windows.popitem(last=False)
+        return window
+
+    def forget(self, thread_id: str):
+        """thread의 누적 합 삭제 (세션 종료 시)"""
+        with self._lock:
+            self._windows.pop(thread_id, None)
+
+    def trim(
+        self,
+        messages: Sequence[BaseMessage],
+        thread_id: Optional[str] = None,
+        extra_tokens: int = 0,
+    ) -> List[BaseMessage]:
+        """
+        토큰 예산 안에 들어가는 최근 메시지만 남깁니다.
+
+        HumanMessage에서 시작하도록 잘라서 tool call/result 쌍이 분리되지 않게 하고,
+        마지막 HumanMessage 이후(현재 턴)는 예산을 넘어도 항상 유지합니다.
+
+        Args:
+            extra_tokens: 이번 호출에만 추가로 예산에서 뺄 토큰 수 (대화 요약 등)
+        """
+        if not messages:
+            return list(messages)
+
+        window = self._window(thread_id, messages)
+        total = window.prefix[-1]
+        budget = max(self.budget - extra_tokens, 0)
+        if total <= budget:
+            return list(messages)
+
+        # total - prefix[start] <= budget 를 만족하는 가장 작은 start
+        start = bisect.bisect_left(window.prefix, total - budget, 0, len(messages))
+
+        last_human = max(
+            (i for i in range(len(messages) - 1, -1, -1) if isinstance(messages[i], HumanMessage)),
+            default=0,
+        )
+        while start < last_human and not isinstance(messages[start], HumanMessage):
+            start += 1
+        start = min(start, last_human)
+
+        logger.debug(
+            f"[CONTEXT] trim {len(messages)} → {len(messages) - start} messages "
+            f"({total} → {total - window.prefix[start]} tokens, budget {budget})"
+        )
+        return list(messages[start:])
+
+    def __call__(self, state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        thread_id = (config or {}).get("configurable", {}).get("thread_id")
+        return {"llm_input_messages": self.trim(state["messages"], thread_id)}
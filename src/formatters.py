@@ -0,0 +1,167 @@
+"""도구 결과 직접 응답(direct return) 포매터
+
+단일 영양정보 검색이나 식당 카드처럼 도구 결과가 곧 답변인 턴은 LLM이 결과를 다시 풀어 쓰는
+두 번째 생성을 건너뜁니다. 직접 응답 도구는 결과를 여기 포매터로 사용자용 마크다운으로 만들어
+ToolMessage로 반환하고(return_direct), 그래프는 그 자리에서 끝납니다.
+후속 질문이 오면 일반 그래프가 같은 thread 히스토리(포맷된 결과 포함)로 LLM을 호출합니다.
+"""
+
+import re
+import functools
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.tools import BaseTool, StructuredTool
+
+from .compaction import MAP_TAG_RE, URL_RE, digest_tool_result
+from .metrics import get_metrics
+
+# ToolMessage.artifact 표시: 이 도구 결과가 턴의 최종 답변
+DIRECT_RETURN_KEY = "direct_return"
+
+MENU_MAX_LINES = 15
+NUTRITION_MAX_LINES = 8
+
+PLACE_RE = re.compile(r'^\[(\d+)\] (.+)$')
+PLACE_FIELD_RE = re.compile(r'^(주소|전화|카테고리|\S+ 지도): ?(.*)$')
+NUTRIENT_RE = re.compile(r'칼로리|열량|kcal|탄수화물|단백질|지방|나트륨|당류|콜레스테롤|식이섬유', re.IGNORECASE)
+SOURCE_TITLE_RE = re.compile(r'^=== (.+) ===$')
+
+Formatter = Callable[[str, Dict[str, Any]], Optional[str]]
+
+
+def format_restaurant_result(text: str, args: Dict[str, Any]) -> Optional[str]:
+    """search_restaurant_info 결과 → 식당 카드 (지도 태그 유지)"""
+    places: List[Dict[str, str]] = []
+    menu: List[str] = []
+    menu_title = ""
+    section = "places"
+
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line or MAP_TAG_RE.fullmatch(line):
+            continue
+        if line in ("[메뉴판]", "[메뉴 검색 결과]"):
+            section, menu_title = "menu", line.strip("[]")
+            continue
+        if section == "menu":
+            menu.append(line)
+            continue
+        match = PLACE_RE.match(line)
+        if match:
+            places.append({"name": match.group(2)})
+            continue
+        field = PLACE_FIELD_RE.match(line)
+        if field and places:
+            key = "지도" if field.group(1).endswith("지도") else field.group(1)
+            places[-1][key] = field.group(2).strip()
+
+    if not places:
+        return None
+
+    query = args.get("query", "")
+    lines = [f"## 🍽️ '{query}' 검색 결과" if query else "## 🍽️ 식당 검색 결과", ""]
+    for i, place in enumerate(places, 1):
+        lines.append(f"### {i}. {place['name']}")
+        if place.get("카테고리"):
+            lines.append(f"- 🏷️ {place['카테고리'].split(' > ')[-1]}")
+        if place.get("주소"):
+            lines.append(f"- 📍 {place['주소']}")
+        if place.get("전화"):
+            lines.append(f"- 📞 {place['전화']}")
+        if place.get("지도"):
+            lines.append(f"- 🗺️ [카카오맵에서 보기]({place['지도']})")
+        lines.append("")
+
+    if menu:
+        lines.append(f"### 📋 {places[0]['name']} {menu_title}")
+        lines.extend(f"- {item}" for item in menu[:MENU_MAX_LINES])
+        if len(menu) > MENU_MAX_LINES:
+            lines.append(f"- … 외 {len(menu) - MENU_MAX_LINES}개")
+        lines.append("")
+
+    lines.append("다른 식당이나 후기가 궁금하시면 말씀해 주세요!")
+    lines.extend(MAP_TAG_RE.findall(text))
+    return "\n".join(lines)
+
+
+def format_nutrition_result(text: str, args: Dict[str, Any]) -> Optional[str]:
+    """get_nutrition_info 결과 → 영양성분 요약 (출처별 영양성분 줄만)"""
+    if not text.startswith("[검색:"):
+        # 검색 실패/결과 없음 메시지는 그대로 답변으로 사용
+        return text
+
+    query = args.get("query", "")
+    facts: List[str] = []
+    sources: List[str] = []
+    title = ""
+    for raw in text.splitlines():
+        line = raw.strip()
+        match = SOURCE_TITLE_RE.match(line)
+        if match:
+            title = match.group(1)
+            continue
+        if line.startswith("출처: "):
+            sources.append(f"[{title or '출처'}]({line[len('출처: '):]})")
+            continue
+        if len(facts) < NUTRITION_MAX_LINES and NUTRIENT_RE.search(line) and re.search(r'\d', line):
+            fact = URL_RE.sub("", line).strip()
+            if fact and fact not in facts and len(fact) <= 120:
+                facts.append(fact)
+
+    if not facts:
+        # 영양성분 줄을 못 찾으면 숫자가 들어간 핵심 줄로 대체
+        facts = [l for l in digest_tool_result(text).splitlines() if not l.startswith(("출처: ", "[검색:"))]
+    if not facts:
+        return f"'{query}' 영양정보를 찾지 못했어요. 음식 이름을 조금 더 구체적으로 알려주세요."
+
+    food = re.sub(r'\s+', ' ', NUTRIENT_RE.sub("", query)).strip()
+    lines = [f"## 🥗 {food} 영양정보" if food else "## 🥗 영양정보", ""]
+    lines.extend(f"- {fact}" for fact in facts)
+    lines.append("")
+    lines.append("> 검색된 자료 기준이며 조리법과 1회 제공량에 따라 달라질 수 있어요.")
+    if sources:
+        lines.append("")
+        lines.append("📚 출처: " + " · ".join(sources))
+    return "\n".join(lines)
+
+
+# 도구 이름 → 포매터 (직접 응답을 지원하는 도구)
+DIRECT_FORMATTERS: Dict[str, Formatter] = {
+    "search_restaurant_info": format_restaurant_result,
+    "get_nutrition_info": format_nutrition_result,
+}
+
+
+def wrap_direct(tool: BaseTool, formatter: Optional[Formatter] = None) -> BaseTool:
+    """
+    결과를 포맷해서 최종 답변으로 반환하는 도구 복사본 (return_direct).
+
+    artifact에 DIRECT_RETURN_KEY를 담아서 스트리밍 쪽이 ToolMessage를 답변 텍스트로 보낼 수 있게 합니다.
+    포매터가 None을 반환하면 원문을 그대로 답변으로 사용합니다.
+    """
+    formatter = formatter or DIRECT_FORMATTERS.get(tool.name)
+    if formatter is None or not isinstance(tool, StructuredTool) or tool.coroutine is None:
+        return tool
+
+    coroutine = tool.coroutine
+    metrics = get_metrics()
+
+    @functools.wraps(coroutine)
+    async def direct(*args, **kwargs):
+        result = await coroutine(*args, **kwargs)
+        text = result if isinstance(result, str) else str(result)
+        formatted = formatter(text, kwargs)
+        metrics.inc("direct_return_total", tool=tool.name, formatted=str(formatted is not None).lower())
+        return formatted or text, {DIRECT_RETURN_KEY: True}
+
+    return tool.model_copy(update={
+        "coroutine": direct,
+        "return_direct": True,
+        "response_format": "content_and_artifact",
+    })
+
+
+def is_direct_return(message: Any) -> bool:
+    """도구 결과가 직접 응답(턴의 최종 답변)인지"""
+    artifact = getattr(message, "artifact", None)
+    return isinstance(artifact, dict) and bool(artifact.get(DIRECT_RETURN_KEY))
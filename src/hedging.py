@@ -0,0 +1,293 @@
+"""LLM 요청 헤징 - 첫 토큰이 늦으면 두 번째 요청을 띄워 먼저 응답한 쪽을 사용
+
+API 모델(ChatOpenAI / ChatGoogleGenerativeAI)은 가끔 첫 토큰까지 수 초씩 멈춥니다.
+HedgedChatModel은 최근 첫 토큰 지연의 p95를 마감 시간으로 삼아, 그 안에 토큰이 오지 않으면 같은
+(또는 HEDGE_PROVIDER) 제공자로 두 번째 요청을 시작합니다. 먼저 토큰을 낸 스트림이 이기고 나머지는
+취소합니다. 헤지는 전체 호출 대비 비율(토큰 버킷)로 제한해서 비용이 일정 비율 이상 늘지 않게 합니다.
+
+메트릭: llm_hedge_total{provider,outcome}, llm_first_token_seconds{provider}
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable
+
+from .metrics import get_metrics
+from .routing import inner_call_config
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class LatencyTracker:
+    """최근 지연 시간 분위수로 헤지 마감 시간 계산"""
+
+    def __init__(
+        self,
+        quantile: float = 0.95,
+        window: int = 200,
+        min_samples: int = 20,
+        initial: float = 3.0,
+        floor: float = 0.5,
+        ceiling: float = 10.0,
+    ):
+        """
+        Args:
+            quantile: 마감 시간으로 쓸 분위수
+            window: 유지할 최근 표본 수
+            min_samples: 이보다 표본이 적으면 initial 사용
+            initial / floor / ceiling: 초기값과 하한/상한 (초)
+        """
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.initial = initial
+        self.floor = floor
+        self.ceiling = ceiling
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def deadline(self) -> float:
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < self.min_samples:
+            return self.initial
+        value = samples[min(int(len(samples) * self.quantile), len(samples) - 1)]
+        return min(max(value, self.floor), self.ceiling)
+
+
+class HedgeBudget:
+    """헤지 비용 상한 (토큰 버킷): 호출마다 ratio만큼 쌓이고 헤지 한 번에 1 소모"""
+
+    def __init__(self, ratio: float = 0.1, burst: float = 3.0):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+
+    def on_request(self):
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class _Attempt:
+    """진행 중인 요청 하나 (첫 결과를 기다리는 태스크 + 스트림)"""
+
+    def __init__(self, name: str, task: asyncio.Future, stream: Optional[AsyncIterator] = None):
+        self.name = name
+        self.task = task
+        self.stream = stream
+
+    def succeeded(self) -> bool:
+        if self.task.cancelled():
+            return False
+        error = self.task.exception()
+        # 빈 스트림은 정상 종료
+        return error is None or isinstance(error, StopAsyncIteration)
+
+    async def close(self):
+        if not self.task.done():
+            self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        if self.stream is not None:
+            await self.stream.aclose()
+
+
+# 제공자/모델별 지연 추적기와 예산 (그래프/요약기가 공유)
+_trackers: Dict[str, LatencyTracker] = {}
+_budgets: Dict[str, HedgeBudget] = {}
+_registry_lock = threading.Lock()
+
+
+def get_latency_tracker(name: str, **kwargs) -> LatencyTracker:
+    with _registry_lock:
+        if name not in _trackers:
+            _trackers[name] = LatencyTracker(**kwargs)
+        return _trackers[name]
+
+
+def get_hedge_budget(name: str, **kwargs) -> HedgeBudget:
+    with _registry_lock:
+        if name not in _budgets:
+            _budgets[name] = HedgeBudget(**kwargs)
+        return _budgets[name]
+
+
+class HedgedChatModel(BaseChatModel):
+    """마감 시간 안에 첫 토큰(비스트리밍은 응답)이 없으면 백업 요청을 띄우는 래퍼"""
+
+    primary: Runnable
+    backup: Runnable
+    primary_name: str = "primary"
+    backup_name: str = "backup"
+    # 스트리밍(첫 토큰)과 비스트리밍(전체 응답)은 지연 분포가 달라서 따로 추적
+    stream_tracker: LatencyTracker
+    invoke_tracker: LatencyTracker
+    budget: HedgeBudget
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def _llm_type(self) -> str:
+        return "hedged"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"primary": self.primary_name, "backup": self.backup_name}
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs) -> "HedgedChatModel":
+        """두 모델에 같은 도구를 바인딩한 복사본 (추적기/예산은 공유)"""
+        return self.model_copy(update={
+            "primary": self.primary.bind_tools(tools, **kwargs),
+            "backup": self.backup.bind_tools(tools, **kwargs),
+        })
+
+    async def _race(self, start: Callable[[Runnable, str], _Attempt], tracker: LatencyTracker) -> _Attempt:
+        """
+        primary를 시작하고 마감 시간이 지나거나 실패하면(예산 안에서) backup을 시작합니다.
+        먼저 성공한 요청을 반환하고 나머지는 취소합니다.
+        """
+        metrics = get_metrics()
+        self.budget.on_request()
+        deadline = tracker.deadline()
+        started_at = time.monotonic()
+        first = start(self.primary, self.primary_name)
+        attempts: List[_Attempt] = [first]
+        hedged = False
+        errors: List[BaseException] = []
+        winner: Optional[_Attempt] = None
+
+        try:
+            while winner is None:
+                pending = {a.task: a for a in attempts}
+                timeout = None if hedged else max(deadline - (time.monotonic() - started_at), 0)
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    attempt = pending[task]
+                    attempts.remove(attempt)
+                    if attempt.succeeded():
+                        winner = attempt
+                        break
+                    errors.append(task.exception())
+                    await attempt.close()
+
+                if winner is not None:
+                    break
+                if hedged or (done and attempts):
+                    if not attempts:
+                        metrics.inc("llm_hedge_total", provider=self.primary_name, outcome="all_failed")
+                        raise errors[0]
+                    continue
+
+                # 마감 시간 초과 또는 primary 실패 → 백업 요청 (한 번만)
+                hedged = True
+                reason = "error" if done else "deadline"
+                if self.budget.try_acquire():
+                    metrics.inc("llm_hedge_total", provider=self.primary_name, outcome=f"fired_{reason}")
+                    logger.info(
+                        f"[HEDGE] {self.primary_name} {reason} ({deadline:.2f}s) → {self.backup_name} 요청 시작"
+                    )
+                    attempts.append(start(self.backup, self.backup_name))
+                else:
+                    metrics.inc("llm_hedge_total", provider=self.primary_name, outcome="skipped_budget")
+                    if not attempts:
+                        raise errors[0]
+        except BaseException:
+            for attempt in attempts:
+                await attempt.close()
+            raise
+
+        # 추적기에는 primary 자신의 지연만 기록: 백업이 이겨서 primary를 취소하면 primary는 적어도
+        # 지금까지(>= 마감 시간) 걸린 것이므로 그 하한을 기록하고, primary가 실패했으면 표본이 아님
+        elapsed = time.monotonic() - started_at
+        if winner is first:
+            tracker.record(elapsed)
+        elif first in attempts:
+            tracker.record(max(elapsed, deadline))
+
+        for attempt in attempts:
+            await attempt.close()
+
+        if hedged:
+            outcome = "primary_won" if winner is first else "backup_won"
+            metrics.inc("llm_hedge_total", provider=self.primary_name, outcome=outcome)
+        return winner
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        # 동기 호출은 헤지하지 않음 (CLI 등)
+        message = self.primary.invoke(messages, config=inner_call_config(run_manager))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        config = inner_call_config(run_manager)
+
+        def start(model: Runnable, name: str) -> _Attempt:
+            return _Attempt(name, asyncio.ensure_future(model.ainvoke(messages, config=config)))
+
+        winner = await self._race(start, self.invoke_tracker)
+        return ChatResult(generations=[ChatGeneration(message=winner.task.result())])
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        config = inner_call_config(run_manager)
+
+        def start(model: Runnable, name: str) -> _Attempt:
+            stream = model.astream(messages, config=config)
+            return _Attempt(name, asyncio.ensure_future(stream.__anext__()), stream)
+
+        async def emit(chunk: AIMessageChunk) -> ChatGenerationChunk:
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager:
+                await run_manager.on_llm_new_token(
+                    chunk.content if isinstance(chunk.content, str) else "", chunk=generation
+                )
+            return generation
+
+        started_at = time.monotonic()
+        winner = await self._race(start, self.stream_tracker)
+        get_metrics().observe("llm_first_token_seconds", time.monotonic() - started_at, provider=winner.name)
+        try:
+            if winner.task.exception() is not None:  # 빈 스트림
+                return
+            yield await emit(winner.task.result())
+            async for chunk in winner.stream:
+                yield await emit(chunk)
+        finally:
+            await winner.stream.aclose()
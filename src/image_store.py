@@ -0,0 +1,209 @@
+"""프로세스 내 이미지 저장소 - 내용 주소(sha256) 기반, LRU 제거
+
+업로드된 이미지를 한 번만 디코딩해서 메모리에 보관하고, 메시지/도구에는
+`image://<digest>` 참조만 전달합니다. 임시 파일을 만들지 않습니다.
+"""
+
+import os
+import re
+import time
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from .config import settings
+
+IMAGE_REF_PREFIX = "image://"
+# 참조는 LLM이 도구 인자로 그대로 옮겨 적어야 하므로 sha256 앞 16자리(64bit)만 사용
+IMAGE_REF_PATTERN = re.compile(r'image://([0-9a-f]{16})\b')
+
+MIME_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+}
+
+
+@dataclass
+class StoredImage:
+    """저장된 이미지 한 장"""
+    key: str
+    data: bytes
+    mime_type: str
+    created_at: float = field(default_factory=time.time)
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def ref(self) -> str:
+        return f"{IMAGE_REF_PREFIX}{self.key}"
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+
+class ImageStore:
+    """sha256 → 이미지 bytes + 메타데이터 (총 용량 기준 LRU)"""
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._images: "OrderedDict[str, StoredImage]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._images)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()[:16]
+
+    def put(self, data: bytes, mime_type: str = "image/jpeg", key: Optional[str] = None) -> str:
+        """
+        이미지를 저장하고 참조 문자열을 반환합니다. 같은 내용은 한 번만 저장됩니다.
+
+        Args:
+            data: 이미지 bytes
+            mime_type: MIME 타입
+            key: 미리 계산한 digest (스트리밍 업로드 시)
+
+        Returns:
+            "image://<digest>" 참조
+        """
+        key = key or self.digest(data)
+        with self._lock:
+            existing = self._images.get(key)
+            if existing is not None:
+                self._images.move_to_end(key)
+                return existing.ref
+
+            image = StoredImage(key=key, data=data, mime_type=mime_type)
+            self._images[key] = image
+            self._total_bytes += image.size
+
+            # 방금 넣은 이미지 하나는 남겨둠
+            while self._total_bytes > self.max_bytes and len(self._images) > 1:
+                _, evicted = self._images.popitem(last=False)
+                self._total_bytes -= evicted.size
+
+            return image.ref
+
+    def put_base64(self, data: str, mime_type: str = "image/jpeg") -> str:
+        """base64 문자열을 디코딩해서 저장하고 참조를 반환합니다."""
+        return self.put(base64.b64decode(data), mime_type)
+
+    def get(self, key_or_ref: str) -> Optional[StoredImage]:
+        """digest 또는 image:// 참조로 이미지 조회"""
+        key = key_or_ref[len(IMAGE_REF_PREFIX):] if key_or_ref.startswith(IMAGE_REF_PREFIX) else key_or_ref
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+            return image
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "count": len(self._images),
+            "total_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+def is_image_ref(source: str) -> bool:
+    return source.startswith(IMAGE_REF_PREFIX)
+
+
+def get_mime_type(path_or_url: str) -> str:
+    """파일 경로 또는 URL의 확장자로 MIME 타입 추정"""
+    ext = Path(path_or_url.split('?')[0]).suffix.lower()
+    return MIME_TYPES.get(ext, "image/jpeg")
+
+
+def load_image(source: str) -> Optional[Tuple[bytes, str]]:
+    """
+    image:// 참조 또는 로컬 파일 경로에서 이미지 bytes와 MIME 타입을 가져옵니다.
+
+    Returns:
+        (bytes, mime_type) 또는 None (찾을 수 없음)
+    """
+    if is_image_ref(source):
+        image = get_image_store().get(source)
+        return (image.data, image.mime_type) if image else None
+
+    if os.path.exists(source):
+        with open(source, "rb") as f:
+            return f.read(), get_mime_type(source)
+
+    return None
+
+
+def downscale_image(data: bytes, mime_type: str, max_edge: int) -> Tuple[bytes, str]:
+    """
+    긴 변이 max_edge보다 크면 비율을 유지해서 줄이고 JPEG으로 다시 인코딩합니다.
+    (EXIF 회전 적용, 투명도가 있으면 PNG 유지) Pillow가 없거나 작으면 원본 그대로.
+    """
+    if max_edge <= 0:
+        return data, mime_type
+    try:
+        from io import BytesIO
+        from PIL import Image, ImageOps
+
+        img = Image.open(BytesIO(data))
+        if max(img.size) <= max_edge:
+            return data, mime_type
+
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        out = BytesIO()
+        has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+        if has_alpha:
+            img.save(out, format="PNG", optimize=True)
+            return out.getvalue(), "image/png"
+        img.convert("RGB").save(out, format="JPEG", quality=85)
+        return out.getvalue(), "image/jpeg"
+    except Exception:
+        return data, mime_type
+
+
+def load_image_for_llm(source: str, max_edge: int) -> Optional[Tuple[bytes, str]]:
+    """
+    LLM에 보낼 이미지를 가져옵니다. max_edge로 축소하고, 저장소 이미지는 축소본을 메타에 캐시합니다.
+
+    Returns:
+        (bytes, mime_type) 또는 None (찾을 수 없음)
+    """
+    image = get_image_store().get(source) if is_image_ref(source) else None
+    cache_key = f"llm_{max_edge}"
+    if image is not None and cache_key in image.meta:
+        return image.meta[cache_key]
+
+    loaded = load_image(source)
+    if loaded is None:
+        return None
+
+    resized = downscale_image(loaded[0], loaded[1], max_edge)
+    if image is not None:
+        image.meta[cache_key] = resized
+    return resized
+
+
+# 싱글톤 인스턴스
+_store: Optional[ImageStore] = None
+
+
+def get_image_store() -> ImageStore:
+    """이미지 저장소 싱글톤 인스턴스 반환"""
+    global _store
+    if _store is None:
+        _store = ImageStore(max_bytes=int(settings.image_store_max_mb * 1024 * 1024))
+    return _store
@@ -0,0 +1,244 @@
+"""규칙 기반 의도 분류 + 도구 선실행(speculative prefetch)
+
+SYSTEM_PROMPT의 의도 → 도구 매핑(맛집 → search_restaurant_info, 레시피 → search_recipe_online,
+칼로리 → get_nutrition_info)을 키워드/문자 bigram으로 먼저 판단해서, 확신이 있으면 첫 LLM 호출과
+동시에 해당 도구를 실행해 둡니다. LLM이 같은 도구를 비슷한 인자로 호출하면 미리 받은 결과를
+그대로 쓰고, 쓰이지 않은 결과는 버립니다. (metrics: speculative_prefetch_total)
+"""
+
+import re
+import time
+import asyncio
+import logging
+import functools
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.tools import BaseTool, StructuredTool
+
+from .metrics import get_metrics
+
+logger = logging.getLogger("uvicorn.error")
+
+
+@dataclass
+class IntentRule:
+    """의도 하나: 도구 이름, 키워드, 대표 문장(문자 bigram 비교용)"""
+    tool: str
+    keywords: Tuple[str, ...]
+    examples: Tuple[str, ...] = ()
+
+
+INTENT_RULES: Tuple[IntentRule, ...] = (
+    IntentRule(
+        tool="get_nutrition_info",
+        keywords=("칼로리", "열량", "영양", "탄수화물", "단백질", "지방", "나트륨", "당류", "kcal"),
+        examples=("김치찌개 칼로리 알려줘", "아메리카노 열량", "비빔밥 영양성분"),
+    ),
+    IntentRule(
+        tool="search_recipe_online",
+        keywords=("레시피", "만드는 법", "만드는법", "요리법", "조리법", "끓이는 법", "끓이는법", "만들어"),
+        examples=("김치찌개 레시피", "된장찌개 만드는 법", "불고기 요리법 알려줘"),
+    ),
+    IntentRule(
+        tool="search_restaurant_info",
+        keywords=("맛집", "식당", "음식점", "가게", "메뉴판"),
+        examples=("강남역 맛집 추천해줘", "홍대 근처 식당", "성수동 파스타 맛집"),
+    ),
+)
+
+# 다른 도구(후기/이미지/저장)로 가거나 앞 대화 맥락이 필요한 요청은 선실행하지 않음
+BLOCK_RE = re.compile(r'후기|리뷰|평점|평가|비교|저장|image://|https?://|그거|이거|저거|거기|아까|방금|위에|그 식당|그 음식')
+
+# 검색어에서 뺄 요청 표현
+FILLER_RE = re.compile(
+    r'(알려\s?주세요|알려\s?줘|알려줄래|가르쳐\s?줘|추천해\s?주세요|추천해\s?줘|추천\s?좀|'
+    r'궁금해요|궁금해|어떻게\s?돼|어떻게\s?되나요|뭐예요|뭐야|얼마야|얼마나\s?돼|'
+    r'해\s?주세요|해\s?줘|좀|부탁해|있어\??|있나요)'
+)
+PUNCT_RE = re.compile(r'[?!.~,]+')
+
+
+def _bigrams(text: str) -> set:
+    text = re.sub(r'\s+', '', text.lower())
+    return {text[i:i + 2] for i in range(len(text) - 1)} or {text}
+
+
+def similarity(a: str, b: str) -> float:
+    """문자 bigram Jaccard 유사도"""
+    x, y = _bigrams(a), _bigrams(b)
+    return len(x & y) / len(x | y) if x and y else 0.0
+
+
+def extract_query(message: str) -> str:
+    """사용자 메시지에서 검색어로 쓸 부분만 남김 ("강남역 맛집 추천해줘" → "강남역 맛집")"""
+    query = PUNCT_RE.sub(" ", FILLER_RE.sub(" ", message))
+    return re.sub(r'\s+', ' ', query).strip()
+
+
+@dataclass
+class Intent:
+    tool: str
+    args: Dict[str, Any]
+    score: float
+
+
+class IntentRouter:
+    """키워드 + 문자 bigram 유사도 기반 의도 분류기 (CPU, 모델 없음)"""
+
+    def __init__(self, rules: Tuple[IntentRule, ...] = INTENT_RULES, min_score: float = 1.0, max_chars: int = 60):
+        """
+        Args:
+            rules: 의도 규칙
+            min_score: 이 점수 이상이고 2등과 차이가 클 때만 확신
+            max_chars: 이보다 긴 메시지는 여러 요청일 수 있으므로 분류하지 않음
+        """
+        self.rules = rules
+        self.min_score = min_score
+        self.max_chars = max_chars
+        self._examples = [(rule, [_bigrams(e) for e in rule.examples]) for rule in rules]
+
+    def score(self, message: str) -> List[Tuple[float, IntentRule]]:
+        """규칙별 점수 (키워드 일치 수 + 대표 문장과의 최대 bigram 유사도), 높은 순"""
+        grams = _bigrams(message)
+        scores = []
+        for rule, examples in self._examples:
+            hits = sum(1 for kw in rule.keywords if kw in message)
+            sim = max((len(grams & e) / len(grams | e) for e in examples), default=0.0)
+            scores.append((hits + sim, rule))
+        return sorted(scores, key=lambda s: s[0], reverse=True)
+
+    def classify(self, message: str) -> Optional[Intent]:
+        """확신이 있을 때만 Intent 반환"""
+        message = message.strip()
+        if not message or len(message) > self.max_chars or BLOCK_RE.search(message):
+            return None
+
+        (top, rule), (second, _) = self.score(message)[:2]
+        if top < self.min_score or second >= top * 0.5:
+            return None
+
+        query = extract_query(message)
+        # 키워드만 있고 대상(음식/지역)이 없으면 LLM이 맥락으로 채울 가능성이 큼
+        if len(query) < 4 or all(query.replace(kw, "").strip() == "" for kw in rule.keywords if kw in query):
+            return None
+        return Intent(tool=rule.tool, args={"query": query}, score=top)
+
+
+@dataclass
+class _Speculation:
+    tool: str
+    args: Dict[str, Any]
+    task: asyncio.Task
+    started_at: float = field(default_factory=time.monotonic)
+
+
+class SpeculativePrefetcher:
+    """thread별 선실행 도구 호출 관리
+
+    wrap()으로 감싼 도구는 실행 전에 같은 thread에 맞는 선실행 결과가 있는지 확인합니다.
+    선실행은 감싸기 전(동시 실행 제한이 적용된) 도구로 실행하므로 다시 가로채지 않습니다.
+    """
+
+    def __init__(self, tools: List[BaseTool], query_similarity: float = 0.6):
+        """
+        Args:
+            tools: 선실행에 쓸 도구 (ToolConcurrencyLimiter로 감싼 도구)
+            query_similarity: LLM 인자와 선실행 인자의 query 유사도가 이 이상이면 재사용
+        """
+        self._tools = {t.name: t for t in tools}
+        self.query_similarity = query_similarity
+        self._pending: Dict[str, Dict[str, _Speculation]] = {}
+        self.metrics = get_metrics()
+
+    def wrap_all(self) -> List[BaseTool]:
+        """그래프에 넘길 도구 (선실행 결과 확인 포함)"""
+        return [self.wrap(t) for t in self._tools.values()]
+
+    def start(self, thread_id: str, tool_name: str, args: Dict[str, Any]) -> bool:
+        """도구를 백그라운드에서 먼저 실행 (실행 중인 이벤트 루프 필요)"""
+        tool = self._tools.get(tool_name)
+        if tool is None or tool_name in self._pending.get(thread_id, {}):
+            return False
+
+        task = asyncio.create_task(tool.ainvoke(args))
+        # 결과를 쓰지 않고 버려져도 예외가 로그에 남지 않도록
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._pending.setdefault(thread_id, {})[tool_name] = _Speculation(tool_name, args, task)
+        self.metrics.inc("speculative_prefetch_total", tool=tool_name, outcome="started")
+        logger.info(f"[PREFETCH] {tool_name}({args}) 선실행 (thread={thread_id})")
+        return True
+
+    def _args_match(self, tool_name: str, spec_args: Dict[str, Any], call_args: Dict[str, Any]) -> bool:
+        schema = self._tools[tool_name].args
+        for key in set(spec_args) | set(call_args):
+            default = schema.get(key, {}).get("default")
+            spec, call = spec_args.get(key, default), call_args.get(key, default)
+            if key == "query" and isinstance(spec, str) and isinstance(call, str):
+                if similarity(spec, call) < self.query_similarity:
+                    return False
+            elif spec != call:
+                return False
+        return True
+
+    def take(self, thread_id: Optional[str], tool_name: str, args: Dict[str, Any]) -> Optional[asyncio.Task]:
+        """LLM이 요청한 호출과 맞는 선실행 태스크를 꺼냄 (없으면 None)"""
+        spec = self._pending.get(thread_id, {}).pop(tool_name, None) if thread_id else None
+        if spec is None:
+            return None
+        if spec.task.cancelled() or not self._args_match(tool_name, spec.args, args):
+            spec.task.cancel()
+            self.metrics.inc("speculative_prefetch_total", tool=tool_name, outcome="miss")
+            return None
+        self.metrics.inc("speculative_prefetch_total", tool=tool_name, outcome="hit")
+        return spec.task
+
+    def discard(self, thread_id: Optional[str]):
+        """쓰이지 않은 선실행 결과 폐기 (실행 중이면 취소)"""
+        pending = self._pending.pop(thread_id, None) if thread_id else None
+        for spec in (pending or {}).values():
+            spec.task.cancel()
+            self.metrics.inc("speculative_prefetch_total", tool=spec.tool, outcome="discarded")
+
+    def has_pending(self, thread_id: Optional[str]) -> bool:
+        return bool(thread_id and self._pending.get(thread_id))
+
+    def wrap(self, tool: BaseTool) -> BaseTool:
+        """선실행 결과가 있으면 그것을 쓰는 도구 복사본 반환"""
+        if not isinstance(tool, StructuredTool) or tool.coroutine is None:
+            return tool
+
+        coroutine = tool.coroutine
+
+        @functools.wraps(coroutine)
+        async def prefetched(*args, **kwargs):
+            thread_id = None
+            if self._pending:
+                try:
+                    from langgraph.config import get_config
+                    thread_id = get_config().get("configurable", {}).get("thread_id")
+                except RuntimeError:
+                    pass
+
+            task = self.take(thread_id, tool.name, kwargs) if thread_id else None
+            if task is not None:
+                try:
+                    from langgraph.config import get_stream_writer
+                    get_stream_writer()({"tool": tool.name, "status": "미리 검색한 결과 사용 중..."})
+                except RuntimeError:
+                    pass
+                try:
+                    # wait()는 이쪽이 취소돼도 태스크를 취소하지 않으므로 직접 정리
+                    await asyncio.wait({task})
+                except asyncio.CancelledError:
+                    task.cancel()
+                    raise
+                if not task.cancelled() and task.exception() is None:
+                    return task.result()
+                # 선실행이 취소/실패했으면 그래프 안에서 다시 실행
+                error = "cancelled" if task.cancelled() else repr(task.exception())
+                logger.warning(f"[PREFETCH] {tool.name} 선실행 결과 사용 불가 ({error}), 다시 실행")
+                self.metrics.inc("speculative_prefetch_total", tool=tool.name, outcome="failed")
+            return await coroutine(*args, **kwargs)
+
+        return tool.model_copy(update={"coroutine": prefetched})
@@ -1,29 +1,643 @@
 """로컬 GLM-4.6V-Flash 모델 통합 모듈 (Tool Calling 지원)"""
 
+import gc
+import copy
 import json
+import time
+import queue
+import weakref
+import threading
 import torch
-from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
 from langchain_core.callbacks import CallbackManagerForLLMRun
 from langchain_core.language_models import BaseChatModel
-from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
-from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
 from langchain_core.tools import BaseTool
 from langchain_core.utils.function_calling import convert_to_openai_tool
 from pydantic import Field
 
+from .metrics import get_metrics
+
+TOOL_CALL_OPEN = "```tool_call"
+FENCE = "```"
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+
+class _StreamParser:
+    """생성 중인 텍스트를 일반 텍스트 / 도구 호출 블록으로 나누는 증분 파서
+
+    일반 텍스트는 바로 내보내고, ```tool_call ... ``` 블록은 닫힐 때까지 모았다가 한 번에,
+    <think> ... </think>는 버립니다. 여는 표시가 청크 경계에서 잘린 경우(예: "``")는 다음 청크까지 보류합니다.
+    """
+
+    OPENERS = (TOOL_CALL_OPEN, THINK_OPEN)
+
+    def __init__(self):
+        self.buffer = ""
+        self.mode = "text"  # text | tool | think
+        self.strip_next = False  # </think> 뒤 공백 제거
+
+    def _holdback(self) -> int:
+        """버퍼 끝에서 여는 표시의 앞부분일 수 있는 길이"""
+        for size in range(min(len(self.buffer), max(len(o) for o in self.OPENERS) - 1), 0, -1):
+            tail = self.buffer[-size:]
+            if any(opener.startswith(tail) for opener in self.OPENERS):
+                return size
+        return 0
+
+    def _text(self, text: str) -> List[Tuple[str, str]]:
+        if self.strip_next:
+            text = text.lstrip()
+            self.strip_next = not text
+        return [("text", text)] if text else []
+
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        """새 텍스트 → [("text", 문자열) | ("tool", 블록 내용)]"""
+        self.buffer += text
+        out: List[Tuple[str, str]] = []
+        while self.buffer:
+            if self.mode == "text":
+                found = [(self.buffer.find(o), o) for o in self.OPENERS if o in self.buffer]
+                if found:
+                    index, opener = min(found)
+                    out.extend(self._text(self.buffer[:index]))
+                    self.buffer = self.buffer[index + len(opener):]
+                    self.mode = "tool" if opener == TOOL_CALL_OPEN else "think"
+                    continue
+                keep = self._holdback()
+                out.extend(self._text(self.buffer[:len(self.buffer) - keep]))
+                self.buffer = self.buffer[len(self.buffer) - keep:]
+                break
+
+            closer = FENCE if self.mode == "tool" else THINK_CLOSE
+            index = self.buffer.find(closer)
+            if index < 0:
+                break
+            if self.mode == "tool":
+                out.append(("tool", self.buffer[:index]))
+            else:
+                self.strip_next = True
+            self.buffer = self.buffer[index + len(closer):]
+            self.mode = "text"
+        return out
+
+    def finish(self) -> List[Tuple[str, str]]:
+        """생성 종료: 남은 텍스트 / 닫히지 않은 도구 호출 블록 반환"""
+        buffer, self.buffer = self.buffer, ""
+        if self.mode == "tool":
+            return [("tool", buffer)]
+        if self.mode == "think":
+            return []
+        return self._text(buffer)
+
+
+@dataclass
+class GenerationRequest:
+    """스케줄러 큐에 들어가는 생성 요청 하나 (입력 텐서는 배치 크기 1)"""
+    inputs: Any
+    max_new_tokens: int
+    temperature: float
+    stop: Tuple[str, ...] = ()
+    # 스트리밍이면 디코딩된 텍스트 조각을 넣고, 끝나면 None을 넣음
+    text_queue: Optional[queue.Queue] = None
+    future: Future = field(default_factory=Future)
+    cancelled: threading.Event = field(default_factory=threading.Event)
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+    # 스케줄러 내부 상태
+    token_ids: List[int] = field(default_factory=list)
+    text: str = ""
+    sent: int = 0
+    # 증분 디코딩 창: token_ids[prefix_offset:read_offset]는 이미 text에 반영된 문맥 토큰
+    prefix_offset: int = 0
+    read_offset: int = 0
+    done: bool = False  # 더 생성하지 않음 (EOS / stop / max_new_tokens / 취소)
+    finished: bool = False  # 결과를 돌려줌 (이후 같은 행의 토큰은 무시)
+
+    @property
+    def batchable(self) -> bool:
+        """텍스트 전용 요청만 묶음 (이미지 텐서는 요청마다 모양이 달라서 단독 실행)"""
+        return set(self.inputs.keys()) <= {"input_ids", "attention_mask"}
+
+    @property
+    def sampling_key(self) -> float:
+        # 한 번의 generate 호출은 샘플링 설정을 하나만 쓰므로 같은 온도끼리만 묶음
+        return max(self.temperature, 0.0)
+
+
+class _BatchStreamer:
+    """generate가 단계마다 넘기는 (batch,) 토큰을 요청별로 나눠 디코딩하는 streamer"""
+
+    def __init__(self, scheduler: "BatchScheduler", batch: List[GenerationRequest]):
+        self.scheduler = scheduler
+        self.batch = batch
+        self.prompt_seen = False
+
+    def put(self, value):
+        if not self.prompt_seen:  # 첫 호출은 프롬프트
+            self.prompt_seen = True
+            return
+        for request, token in zip(self.batch, value.reshape(len(self.batch), -1)[:, -1].tolist()):
+            if not request.done:
+                self.scheduler.on_token(request, token)
+
+    def end(self):
+        pass
+
+
+class _BatchStoppingCriteria:
+    """행별 종료 판단 (요청별 max_new_tokens / stop / 취소 / EOS)
+
+    끝난 행은 배치의 다른 행이 끝날 때까지 기다리지 않고 바로 결과를 돌려줍니다.
+    """
+
+    def __init__(self, scheduler: "BatchScheduler", batch: List[GenerationRequest]):
+        self.scheduler = scheduler
+        self.batch = batch
+
+    def __call__(self, input_ids, scores, **kwargs):
+        last = input_ids[:, -1].tolist()
+        for request, token in zip(self.batch, last):
+            if request.done:
+                continue
+            if token in self.scheduler.eos_token_ids or request.cancelled.is_set():
+                request.done = True
+                self.scheduler._finish(request)
+        return torch.tensor([r.done for r in self.batch], dtype=torch.bool, device=input_ids.device)
+
+
+def _cache_nbytes(cache: Any) -> int:
+    """DynamicCache가 차지하는 메모리 (transformers 버전별 구조 차이 처리)"""
+    layers = getattr(cache, "layers", None)
+    if layers is not None:
+        tensors = [t for layer in layers for t in (getattr(layer, "keys", None), getattr(layer, "values", None))]
+    else:
+        tensors = list(getattr(cache, "key_cache", [])) + list(getattr(cache, "value_cache", []))
+    return sum(t.numel() * t.element_size() for t in tensors if t is not None and hasattr(t, "numel"))
+
+
+def _common_prefix(a: Tuple[int, ...], b: List[int]) -> int:
+    n = min(len(a), len(b))
+    if a[:n] == tuple(b[:n]):
+        return n
+    for i in range(n):
+        if a[i] != b[i]:
+            return i
+    return n
+
+
+class PrefixKVCache:
+    """프롬프트 토큰 → past_key_values LRU (메모리 상한)
+
+    로컬 모델은 매 턴 [시스템 프롬프트 + 도구 설명 + 전체 히스토리]를 다시 프리필합니다.
+    요청마다 저장된 프롬프트 중 가장 긴 공통 접두사를 찾아 그 KV를 복사해 쓰면 새 토큰만 프리필합니다.
+    - 같은 대화의 다음 턴: 이전 턴 프롬프트 전체를 재사용 (이전 항목은 새 항목으로 대체)
+    - 새 대화: 다른 대화 항목에서 시스템 프롬프트 + 도구 설명 부분만 잘라(crop) 재사용
+    스케줄러 스레드에서만 접근하므로 잠금이 없습니다.
+    """
+
+    def __init__(self, max_bytes: int, min_tokens: int = 32):
+        """
+        Args:
+            max_bytes: 저장할 KV 전체 크기 상한 (넘으면 오래 안 쓴 항목부터 제거)
+            min_tokens: 이보다 짧은 공통 접두사는 재사용하지 않음 (복사 비용이 더 큼)
+        """
+        self.max_bytes = max_bytes
+        self.min_tokens = min_tokens
+        self._entries: "OrderedDict[Tuple[int, ...], Tuple[Any, int]]" = OrderedDict()
+        self._bytes = 0
+        self.metrics = get_metrics()
+
+    def lookup(self, input_ids: List[int]) -> Tuple[Any, int]:
+        """(generate에 넘길 캐시 복사본 또는 None, 재사용 토큰 수)"""
+        best_key, best = None, 0
+        for key in self._entries:
+            length = _common_prefix(key, input_ids)
+            if length > best:
+                best_key, best = key, length
+        # 마지막 토큰은 프리필해야 다음 토큰 logits가 나옴
+        best = min(best, len(input_ids) - 1)
+
+        if best_key is None or best < self.min_tokens:
+            self.metrics.inc("local_prefix_cache_total", outcome="miss")
+            return None, 0
+
+        self._entries.move_to_end(best_key)
+        cache = copy.deepcopy(self._entries[best_key][0])
+        if best < len(best_key):
+            cache.crop(best)
+        self.metrics.inc("local_prefix_cache_total", outcome="hit" if best == len(best_key) else "partial")
+        return cache, best
+
+    def store(self, input_ids: List[int], cache: Any):
+        """generate가 끝난 캐시를 프롬프트 길이로 잘라 저장 (이 프롬프트로 끝나는 이전 항목은 대체)"""
+        key = tuple(input_ids)
+        cache.crop(len(key))
+        nbytes = _cache_nbytes(cache)
+        if nbytes > self.max_bytes:
+            # 저장하지 못하므로 이 대화의 이전 항목은 그대로 둠
+            return
+        for old in [k for k in self._entries if len(k) <= len(key) and key[:len(k)] == k]:
+            self._bytes -= self._entries.pop(old)[1]
+
+        self._entries[key] = (cache, nbytes)
+        self._bytes += nbytes
+        while self._bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+            self.metrics.inc("local_prefix_cache_evictions_total")
+        self.metrics.observe("local_prefix_cache_bytes", self._bytes)
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+
+def _reset_rope_deltas(model: Any, device: Any):
+    """
+    GLM-4V는 첫 프리필에서 계산한 rope_deltas를 모델에 저장해 두고 이어지는 스텝의 위치에 더합니다.
+    캐시를 재사용하면 첫 호출부터 이어지는 스텝이므로 다른 요청(이미지 포함)이 남긴 값 대신
+    텍스트 전용 위치(deltas=0)를 쓰게 합니다.
+    """
+    for module in (model, getattr(model, "model", None)):
+        if module is not None and hasattr(module, "rope_deltas"):
+            module.rope_deltas = torch.zeros((1, 1), dtype=torch.long, device=device)
+
+
+class BatchScheduler:
+    """공유 모델 하나의 생성 요청을 모아 배치로 실행하는 스케줄러
+
+    세션마다 model.generate를 직접 부르면 디바이스에서 직렬화되거나 뒤섞입니다. 요청은 큐에 넣고,
+    전용 스레드가 첫 요청을 받은 뒤 batch_window 동안 더 기다려서 같은 온도의 텍스트 요청을
+    max_batch_size까지 왼쪽 패딩 배치로 묶어 generate를 한 번 호출합니다. 요청별 max_new_tokens와
+    stop 문자열은 행별 StoppingCriteria로 지키고, 결과는 요청의 Future(스트리밍이면 text_queue)로 돌려줍니다.
+    배치가 실행 중일 때 들어온 요청은 다음 배치로 갑니다 (정적 배치).
+
+    혼자 실행되는 텍스트 요청은 PrefixKVCache로 이전 턴 프롬프트의 KV를 재사용합니다.
+    (패딩 배치는 행마다 캐시 길이가 달라 재사용하지 않음)
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        processor: Any,
+        max_batch_size: int = 8,
+        batch_window: float = 0.01,
+        prefix_cache: Optional[PrefixKVCache] = None,
+    ):
+        """
+        Args:
+            model: generate를 지원하는 HF 모델
+            processor: AutoProcessor 또는 토크나이저
+            max_batch_size: 한 번에 묶을 최대 요청 수 (1 = 배치 없이 순서대로 실행)
+            batch_window: 첫 요청 뒤 다른 요청을 기다리는 시간 (초)
+            prefix_cache: 프롬프트 접두사 KV 캐시 (None = 사용 안 함)
+        """
+        self.model = model
+        self.tokenizer = getattr(processor, "tokenizer", processor)
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_window = batch_window
+        self.prefix_cache = prefix_cache
+
+        eos = model.generation_config.eos_token_id
+        self.eos_token_ids = set(eos if isinstance(eos, (list, tuple)) else [eos]) - {None}
+        self.pad_token_id = self.tokenizer.pad_token_id
+        if self.pad_token_id is None:
+            self.pad_token_id = min(self.eos_token_ids) if self.eos_token_ids else 0
+
+        self.metrics = get_metrics()
+        self._queue: queue.Queue = queue.Queue()
+        self._pending: deque = deque()  # 온도가 달라 다음 배치로 미룬 요청
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="glm-batch", daemon=True)
+        self._worker.start()
+
+    def submit(self, request: GenerationRequest) -> Future:
+        if self._closed:
+            raise RuntimeError("모델이 해제되어 생성 요청을 받을 수 없습니다")
+        self._queue.put(request)
+        return request.future
+
+    def close(self):
+        """실행 중인 배치가 끝나면 작업 스레드 종료 (대기 중인 요청은 실패 처리)"""
+        self._closed = True
+        self._queue.put(None)
+
+    def _collect(self) -> Optional[List[GenerationRequest]]:
+        """첫 요청을 기다린 뒤 batch_window 동안 함께 묶을 요청을 모음 (종료 시 None)"""
+        if self._pending:
+            first = self._pending.popleft()
+        else:
+            first = self._queue.get()
+            if first is None:
+                return None
+
+        batch = [first]
+        if not first.batchable:
+            return batch
+
+        candidates, self._pending = self._pending, deque()
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            if candidates:
+                request = candidates.popleft()
+            else:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if request is None:
+                    self._queue.put(None)  # 이번 배치를 끝낸 뒤 종료
+                    break
+            if request.batchable and request.sampling_key == first.sampling_key:
+                batch.append(request)
+            else:
+                self._pending.append(request)
+        # 자리가 없어 못 넣은 요청은 먼저 온 순서대로 앞에 둠
+        self._pending = candidates + self._pending
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                break
+            try:
+                self._generate(batch)
+            except BaseException as e:
+                for request in batch:
+                    self._fail(request, e)
+
+        error = RuntimeError("모델이 해제되었습니다")
+        for request in self._pending:
+            self._fail(request, error)
+        while not self._queue.empty():
+            request = self._queue.get_nowait()
+            if request is not None:
+                self._fail(request, error)
+
+        # 가중치의 마지막 참조는 이 스레드가 들고 있으므로 여기서 놓고 캐시를 비움
+        self.model = None
+        if self.prefix_cache is not None:
+            self.prefix_cache.clear()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def _pad(self, batch: List[GenerationRequest]) -> Dict[str, Any]:
+        """왼쪽 패딩으로 한 배치 입력을 만듦 (디코더 전용 모델은 오른쪽 끝에서 이어서 생성)"""
+        length = max(r.inputs["input_ids"].shape[1] for r in batch)
+        input_ids, attention_mask = [], []
+        for request in batch:
+            ids = request.inputs["input_ids"]
+            mask = request.inputs.get("attention_mask")
+            if mask is None:
+                mask = torch.ones_like(ids)
+            pad = length - ids.shape[1]
+            input_ids.append(torch.nn.functional.pad(ids, (pad, 0), value=self.pad_token_id))
+            attention_mask.append(torch.nn.functional.pad(mask, (pad, 0), value=0))
+        return {"input_ids": torch.cat(input_ids), "attention_mask": torch.cat(attention_mask)}
+
+    def _generate(self, batch: List[GenerationRequest]):
+        from transformers import StoppingCriteriaList
+
+        started_at = time.monotonic()
+        for request in batch:
+            self.metrics.observe("local_queue_wait_seconds", started_at - request.enqueued_at)
+        self.metrics.observe("local_batch_size", len(batch))
+
+        inputs = dict(batch[0].inputs) if len(batch) == 1 else self._pad(batch)
+        prompt_ids, cache = None, None
+        if self.prefix_cache is not None and len(batch) == 1 and batch[0].batchable:
+            from transformers import DynamicCache
+
+            prompt_ids = inputs["input_ids"][0].tolist()
+            cache, reused = self.prefix_cache.lookup(prompt_ids)
+            if cache is None:
+                cache = DynamicCache()
+            else:
+                _reset_rope_deltas(self.model, inputs["input_ids"].device)
+            inputs["past_key_values"] = cache
+            self.metrics.inc("local_prefill_tokens_total", len(prompt_ids) - reused)
+            self.metrics.inc("local_prefix_cached_tokens_total", reused)
+
+        temperature = batch[0].sampling_key
+        with torch.no_grad():
+            self.model.generate(
+                **inputs,
+                max_new_tokens=max(r.max_new_tokens for r in batch),
+                temperature=temperature if temperature > 0 else None,
+                do_sample=temperature > 0,
+                pad_token_id=self.pad_token_id,
+                streamer=_BatchStreamer(self, batch),
+                stopping_criteria=StoppingCriteriaList([_BatchStoppingCriteria(self, batch)]),
+            )
+
+        if cache is not None:
+            self.prefix_cache.store(prompt_ids, cache)
+        elapsed = time.monotonic() - started_at
+        tokens = sum(len(r.token_ids) for r in batch)
+        self.metrics.observe("local_batch_seconds", elapsed)
+        self.metrics.inc("local_generated_tokens_total", tokens)
+        if elapsed > 0:
+            self.metrics.observe("local_tokens_per_second", tokens / elapsed)
+        # 가장 긴 max_new_tokens까지 간 행 등 아직 결과를 못 받은 행
+        for request in batch:
+            self._finish(request)
+
+    def on_token(self, request: GenerationRequest, token: int):
+        """새 토큰 하나 반영: 디코딩, stop 문자열/max_new_tokens 확인, 스트리밍 조각 전달
+
+        전체 출력을 매번 디코딩하지 않고 TextIteratorStreamer처럼 직전 문맥 토큰부터만 디코딩해서
+        늘어난 부분만 붙이고, stop 문자열도 새로 붙은 끝부분에서만 찾습니다.
+        """
+        request.token_ids.append(token)
+        if len(request.token_ids) >= request.max_new_tokens:
+            request.done = True
+
+        ids = request.token_ids
+        prefix_text = self.tokenizer.decode(ids[request.prefix_offset:request.read_offset], skip_special_tokens=True)
+        new_text = self.tokenizer.decode(ids[request.prefix_offset:], skip_special_tokens=True)
+        if new_text.endswith("\ufffd") and not request.done:  # 멀티바이트 문자가 아직 덜 나옴
+            return
+        start = len(request.text)
+        if len(new_text) > len(prefix_text):
+            request.text += new_text[len(prefix_text):]
+            request.prefix_offset, request.read_offset = request.read_offset, len(ids)
+
+        if request.stop:
+            # 이전 텍스트와 새 조각에 걸친 stop 문자열까지 찾도록 (가장 긴 stop 길이 - 1)만큼 앞에서 시작
+            window = max(len(stop) for stop in request.stop) - 1
+            found = [i for i in (request.text.find(stop, max(start - window, 0)) for stop in request.stop) if i >= 0]
+            if found:
+                request.text = request.text[:min(found)]
+                request.done = True
+
+        # stop 문자열의 앞부분일 수 있는 끝부분은 확정될 때까지 보류
+        holdback = 0 if request.done else max((len(s) - 1 for s in request.stop), default=0)
+        self._emit(request, len(request.text) - holdback)
+        if request.done:
+            self._finish(request)
+
+    def _emit(self, request: GenerationRequest, end: int):
+        if request.text_queue is not None and end > request.sent:
+            request.text_queue.put(request.text[request.sent:end])
+            request.sent = end
+
+    def _finish(self, request: GenerationRequest):
+        if request.finished:
+            return
+        request.finished = True
+        self._emit(request, len(request.text))
+        if request.text_queue is not None:
+            request.text_queue.put(None)
+        if not request.future.done():
+            request.future.set_result(request.text)
+
+    def _fail(self, request: GenerationRequest, error: BaseException):
+        if request.finished:
+            return
+        request.finished = True
+        if not request.future.done():
+            request.future.set_exception(error)
+        if request.text_queue is not None:
+            request.text_queue.put(None)
+
+
+DEFAULT_MODEL_PATH = "/home/ondamlab/.cache/huggingface/hub/models--zai-org--GLM-4.6V-Flash/snapshots/main"
+
+
+def resolve_device(device: str) -> str:
+    """LOCAL_DEVICE 값 → "cuda" | "cpu" (auto는 GPU가 있으면 cuda)"""
+    if device == "auto":
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    return device
+
+
+def resolve_model_key(
+    model_path: str,
+    device: str = "auto",
+    cpu_model_path: Optional[str] = None,
+    cpu_int8: bool = True,
+) -> Tuple[str, str, str]:
+    """설정값 → 레지스트리 키 (model_path, dtype, device_map)"""
+    if resolve_device(device) == "cpu":
+        return cpu_model_path or model_path, ("int8" if cpu_int8 else "float32"), "cpu"
+    return model_path, "bfloat16", "auto"
+
+
+def quantize_for_cpu(model: Any) -> Any:
+    """Linear 레이어를 동적 int8로 양자화 (가중치는 int8로 저장, 활성값은 추론 중에 양자화)"""
+    from torch.ao.quantization import quantize_dynamic
+
+    return quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+@dataclass
+class _LoadedModel:
+    """프로세스 전역으로 공유하는 가중치/프로세서 핸들"""
+    model: Any
+    processor: Any
+    scheduler: BatchScheduler
+    refs: int = 0
+
+
+# (model_path, dtype, device_map) → 로드된 모델 (참조 수가 0이 되면 해제)
+_model_registry: Dict[Tuple[str, str, str], _LoadedModel] = {}
+_model_registry_lock = threading.Lock()
+
+
+def acquire_model(
+    model_path: str,
+    dtype: str = "bfloat16",
+    device_map: str = "auto",
+    max_batch_size: int = 8,
+    batch_window: float = 0.01,
+    prefix_cache_mb: int = 1024,
+) -> _LoadedModel:
+    """모델 핸들의 참조를 하나 얻습니다. 처음 요청된 키만 실제로 로드합니다.
+
+    dtype="int8"이면 float32로 CPU에 올린 뒤 Linear 레이어를 동적 int8로 양자화합니다.
+    배치/프리픽스 캐시 설정은 처음 로드할 때의 값으로 스케줄러를 만듭니다.
+    """
+    key = (model_path, dtype, device_map)
+    with _model_registry_lock:
+        loaded = _model_registry.get(key)
+        if loaded is None:
+            from transformers import AutoProcessor, Glm4vForConditionalGeneration
+
+            quantize = dtype == "int8"
+            print(f"🔄 Loading GLM-4.6V-Flash from {model_path} ({dtype}, {device_map})...")
+            started_at = time.monotonic()
+            processor = AutoProcessor.from_pretrained(model_path, use_fast=False)
+            model = Glm4vForConditionalGeneration.from_pretrained(
+                model_path,
+                torch_dtype=torch.float32 if quantize else getattr(torch, dtype),
+                device_map=device_map,
+            )
+            if quantize:
+                model = quantize_for_cpu(model)
+            model.eval()
+            elapsed = time.monotonic() - started_at
+            get_metrics().observe("local_model_load_seconds", elapsed, dtype=dtype)
+
+            if device_map != "cpu" and torch.cuda.is_available():
+                print(f"✅ Model loaded in {elapsed:.1f}s! GPU Memory: {torch.cuda.memory_allocated()/1024**3:.2f} GB")
+            else:
+                print(f"✅ Model loaded in {elapsed:.1f}s! (CPU, {torch.get_num_threads()} threads)")
+            prefix_cache = PrefixKVCache(prefix_cache_mb * 1024 * 1024) if prefix_cache_mb > 0 else None
+            scheduler = BatchScheduler(
+                model, processor,
+                max_batch_size=max_batch_size,
+                batch_window=batch_window,
+                prefix_cache=prefix_cache,
+            )
+            loaded = _model_registry[key] = _LoadedModel(model=model, processor=processor, scheduler=scheduler)
+        loaded.refs += 1
+        return loaded
+
+
+def release_model(key: Tuple[str, str, str]):
+    """모델 핸들의 참조를 하나 반환합니다. 마지막 참조면 가중치를 해제합니다."""
+    with _model_registry_lock:
+        loaded = _model_registry.get(key)
+        if loaded is None:
+            return
+        loaded.refs -= 1
+        if loaded.refs > 0:
+            return
+        del _model_registry[key]
+    # 스케줄러가 실행 중인 배치를 끝내고 가중치를 놓음
+    loaded.scheduler.close()
+    print(f"🧹 GLM 모델 해제: {key[0]}")
+
 
 class LocalGLM4V(BaseChatModel):
     """GLM-4.6V-Flash를 LangChain ChatModel로 래핑 (Tool Calling 지원)"""
 
-    model_path: str = Field(default="/home/ondamlab/.cache/huggingface/hub/models--zai-org--GLM-4.6V-Flash/snapshots/main")
+    model_path: str = Field(default=DEFAULT_MODEL_PATH)
     temperature: float = Field(default=0.7)
     max_new_tokens: int = Field(default=2048)
+    dtype: str = Field(default="bfloat16")
+    device_map: str = Field(default="auto")
+    max_batch_size: int = Field(default=8)  # 동시 요청을 묶을 최대 배치 크기
+    batch_window: float = Field(default=0.01)  # 배치를 모으는 대기 시간 (초)
+    prefix_cache_mb: int = Field(default=1024)  # 프롬프트 접두사 KV 캐시 상한 (0 = 사용 안 함)
     tools: List[Dict] = Field(default_factory=list)  # 바인딩된 도구들
 
-    # 내부 상태 (private)
+    # 내부 상태 (private) - 가중치는 _model_registry에서 공유, 인스턴스는 도구 목록만 다름
     _model: Any = None
     _processor: Any = None
-    _device: str = "cuda"
+    _scheduler: Any = None
+    _tools_prompt: Optional[str] = None
+    _release: Any = None
 
     class Config:
         arbitrary_types_allowed = True
@@ -32,6 +646,10 @@ class LocalGLM4V(BaseChatModel):
         super().__init__(**kwargs)
         self._load_model()
 
+    @property
+    def model_key(self) -> Tuple[str, str, str]:
+        return (self.model_path, self.dtype, self.device_map)
+
     def bind_tools(
         self,
         tools: Sequence[Union[Dict[str, Any], BaseTool]],
@@ -45,34 +663,44 @@ class LocalGLM4V(BaseChatModel):
             else:
                 formatted_tools.append(tool)
 
-        # 새 인스턴스 생성 (tools만 다르게)
+        # 새 인스턴스 생성 (tools만 다르게, 가중치는 레지스트리에서 공유)
         return LocalGLM4V(
             model_path=self.model_path,
             temperature=self.temperature,
             max_new_tokens=self.max_new_tokens,
-            tools=formatted_tools
+            dtype=self.dtype,
+            device_map=self.device_map,
+            max_batch_size=self.max_batch_size,
+            batch_window=self.batch_window,
+            prefix_cache_mb=self.prefix_cache_mb,
+            tools=formatted_tools,
+            callbacks=self.callbacks,
         )
 
     def _load_model(self):
-        """모델과 프로세서 로드"""
+        """공유 레지스트리에서 모델과 프로세서 참조를 얻음 (처음 한 번만 실제 로드)"""
         if self._model is not None:
             return
 
-        from transformers import AutoProcessor, Glm4vForConditionalGeneration
-
-        print(f"🔄 Loading GLM-4.6V-Flash from {self.model_path}...")
-
-        self._processor = AutoProcessor.from_pretrained(
-            self.model_path,
-            use_fast=False
-        )
-        self._model = Glm4vForConditionalGeneration.from_pretrained(
-            self.model_path,
-            torch_dtype=torch.bfloat16,
-            device_map="auto"
+        loaded = acquire_model(
+            *self.model_key,
+            max_batch_size=self.max_batch_size,
+            batch_window=self.batch_window,
+            prefix_cache_mb=self.prefix_cache_mb,
         )
+        self._model = loaded.model
+        self._processor = loaded.processor
+        self._scheduler = loaded.scheduler
+        # 인스턴스가 사라지면 참조 반환 (self를 잡지 않도록 키만 전달)
+        self._release = weakref.finalize(self, release_model, self.model_key)
 
-        print(f"✅ Model loaded! GPU Memory: {torch.cuda.memory_allocated()/1024**3:.2f} GB")
+    def release(self):
+        """모델 참조를 즉시 반환 (이후 이 인스턴스는 사용 불가)"""
+        if self._release is not None:
+            self._release()
+        self._model = None
+        self._processor = None
+        self._scheduler = None
 
     @property
     def _llm_type(self) -> str:
@@ -150,9 +778,11 @@ class LocalGLM4V(BaseChatModel):
         return glm_messages
 
     def _build_tools_prompt(self) -> str:
-        """도구 정보를 프롬프트로 변환"""
+        """도구 정보를 프롬프트로 변환 (도구 목록은 인스턴스마다 고정이므로 한 번만 생성)"""
         if not self.tools:
             return ""
+        if self._tools_prompt is not None:
+            return self._tools_prompt
 
         tools_desc = "\n\n## 사용 가능한 도구들:\n"
         for tool in self.tools:
@@ -181,6 +811,7 @@ class LocalGLM4V(BaseChatModel):
 
 도구 호출이 필요 없으면 일반 텍스트로 응답하세요.
 """
+        self._tools_prompt = tools_desc
         return tools_desc
 
     def _parse_tool_calls(self, text: str) -> tuple[str, List[Dict]]:
@@ -212,14 +843,8 @@ class LocalGLM4V(BaseChatModel):
 
         return clean_text, tool_calls
 
-    def _generate(
-        self,
-        messages: List[BaseMessage],
-        stop: Optional[List[str]] = None,
-        run_manager: Optional[CallbackManagerForLLMRun] = None,
-        **kwargs
-    ) -> ChatResult:
-        """메시지 생성 (Tool Calling 지원)"""
+    def _prepare_inputs(self, messages: List[BaseMessage]):
+        """메시지 → 모델 입력 텐서 (도구 설명은 첫 사용자 메시지 앞에 추가)"""
         glm_messages = self._convert_messages_to_glm_format(messages)
 
         # 도구 정보를 시스템 프롬프트에 추가
@@ -242,22 +867,35 @@ class LocalGLM4V(BaseChatModel):
 
         # token_type_ids 제거 (GLM에서 불필요)
         inputs.pop("token_type_ids", None)
+        return inputs
 
-        # 생성
-        with torch.no_grad():
-            generated_ids = self._model.generate(
-                **inputs,
-                max_new_tokens=self.max_new_tokens,
-                temperature=self.temperature if self.temperature > 0 else None,
-                do_sample=self.temperature > 0,
-            )
-
-        # 응답 디코딩
-        output_text = self._processor.decode(
-            generated_ids[0][inputs["input_ids"].shape[1]:],
-            skip_special_tokens=True
+    def _request(
+        self, messages: List[BaseMessage], stop: Optional[List[str]], streaming: bool = False
+    ) -> GenerationRequest:
+        """메시지 → 배치 스케줄러에 넣을 생성 요청"""
+        return GenerationRequest(
+            inputs=self._prepare_inputs(messages),
+            max_new_tokens=self.max_new_tokens,
+            temperature=self.temperature,
+            stop=tuple(stop or ()),
+            text_queue=queue.Queue() if streaming else None,
         )
 
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs
+    ) -> ChatResult:
+        """메시지 생성 (Tool Calling 지원)"""
+        # 생성 (다른 세션 요청과 함께 배치로 실행됨)
+        request = self._request(messages, stop)
+        try:
+            output_text = self._scheduler.submit(request).result()
+        finally:
+            request.cancelled.set()
+
         # <think> 태그 제거
         if "<think>" in output_text and "</think>" in output_text:
             import re
@@ -289,11 +927,58 @@ class LocalGLM4V(BaseChatModel):
         stop: Optional[List[str]] = None,
         run_manager: Optional[CallbackManagerForLLMRun] = None,
         **kwargs
-    ) -> Iterator[ChatGeneration]:
-        """스트리밍 생성 (현재는 전체 생성 후 한번에 반환)"""
-        # TODO: 실제 토큰별 스트리밍 구현
-        result = self._generate(messages, stop, run_manager, **kwargs)
-        yield result.generations[0]
+    ) -> Iterator[ChatGenerationChunk]:
+        """토큰 단위 스트리밍 생성
+
+        생성은 배치 스케줄러 스레드에서 실행되고, 디코딩된 텍스트 조각을 요청의 text_queue로 받습니다.
+        일반 텍스트는 받는 즉시 AIMessageChunk로 내보내고, ```tool_call 블록은 닫힌 뒤 파싱해서
+        tool_call_chunks로 내보냅니다. 소비자가 중간에 닫으면 배치 안의 이 요청 행만 멈춥니다.
+        """
+        request = self._request(messages, stop, streaming=True)
+        self._scheduler.submit(request)
+
+        parser = _StreamParser()
+        tool_index = 0
+
+        def to_chunks(parts: List[Tuple[str, str]]) -> Iterator[ChatGenerationChunk]:
+            nonlocal tool_index
+            for kind, value in parts:
+                if kind == "text":
+                    chunk = ChatGenerationChunk(message=AIMessageChunk(content=value))
+                    if run_manager:
+                        run_manager.on_llm_new_token(value, chunk=chunk)
+                    yield chunk
+                    continue
+                try:
+                    call = json.loads(value.strip())
+                except json.JSONDecodeError:
+                    continue
+                if not isinstance(call, dict) or "name" not in call:
+                    continue
+                chunk = ChatGenerationChunk(message=AIMessageChunk(
+                    content="",
+                    tool_call_chunks=[{
+                        "name": call["name"],
+                        "args": json.dumps(call.get("arguments", {}), ensure_ascii=False),
+                        "id": f"call_{tool_index}",
+                        "index": tool_index,
+                    }],
+                ))
+                if run_manager:
+                    run_manager.on_llm_new_token("", chunk=chunk)
+                yield chunk
+                tool_index += 1
+
+        try:
+            while True:
+                text = request.text_queue.get()
+                if text is None:
+                    break
+                yield from to_chunks(parser.feed(text))
+            request.future.result()  # 생성 중 오류가 있었으면 여기서 발생
+            yield from to_chunks(parser.finish())
+        finally:
+            request.cancelled.set()
 
 
 # 싱글톤 인스턴스 (모델 재로딩 방지)
@@ -303,16 +988,51 @@ _glm_instance: Optional[LocalGLM4V] = None
 def get_local_glm(
     model_path: Optional[str] = None,
     temperature: float = 0.7,
-    max_new_tokens: int = 2048
+    max_new_tokens: int = 2048,
+    max_batch_size: int = 8,
+    batch_window: float = 0.01,
+    prefix_cache_mb: int = 1024,
+    device: str = "auto",
+    cpu_model_path: Optional[str] = None,
+    cpu_threads: int = 0,
+    cpu_int8: bool = True,
 ) -> LocalGLM4V:
-    """GLM 모델 싱글톤 인스턴스 반환"""
+    """GLM 모델 싱글톤 인스턴스 반환
+
+    다른 모델(경로/정밀도/장치)을 요청하면 새 모델로 전환합니다. 새 가중치를 올리기 전에 이전 싱글톤의
+    참조를 먼저 반환하므로, 이전 모델을 바인딩한 그래프까지 사라졌다면 (get_shared_agent가 새 로컬 모델
+    그래프를 만들 때 이전 모델의 그래프를 풀에서 제거) 두 모델이 동시에 메모리에 올라가지 않습니다.
+
+    Args:
+        device: "auto" | "cuda" | "cpu" (auto는 GPU가 없으면 CPU 모드)
+        cpu_model_path: CPU 모드에서 쓸 더 작은 체크포인트 (None이면 model_path)
+        cpu_threads: CPU 모드 torch 스레드 수 (0 = torch 기본값)
+        cpu_int8: CPU 모드에서 Linear 레이어를 동적 int8로 양자화
+    """
     global _glm_instance
 
-    if _glm_instance is None:
+    model_path, dtype, device_map = key = resolve_model_key(
+        model_path or DEFAULT_MODEL_PATH, device, cpu_model_path, cpu_int8
+    )
+    if device_map == "cpu" and cpu_threads > 0:
+        torch.set_num_threads(cpu_threads)
+
+    if _glm_instance is None or _glm_instance.model_key != key:
+        if _glm_instance is not None:
+            # 새 가중치를 올리기 전에 이전 모델 참조부터 반환
+            _glm_instance.release()
+            _glm_instance = None
+            # 풀에서 제거된 이전 그래프(순환 참조)의 바인딩 인스턴스도 지금 회수
+            gc.collect()
         _glm_instance = LocalGLM4V(
-            model_path=model_path or "/home/ondamlab/.cache/huggingface/hub/models--zai-org--GLM-4.6V-Flash/snapshots/main",
+            model_path=model_path,
             temperature=temperature,
-            max_new_tokens=max_new_tokens
+            max_new_tokens=max_new_tokens,
+            dtype=dtype,
+            device_map=device_map,
+            max_batch_size=max_batch_size,
+            batch_window=batch_window,
+            prefix_cache_mb=prefix_cache_mb,
         )
 
     return _glm_instance
@@ -0,0 +1,122 @@
+"""프로세스 내 메트릭 - 카운터/관측값 집계, Prometheus 텍스트 포맷 출력
+
+외부 의존성 없이 간단한 카운터와 (count, sum, max) 요약만 제공합니다.
+`GET /metrics`(api/main.py)에서 render_prometheus() 결과를 그대로 반환합니다.
+"""
+
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    inner = ",".join(f'{k}="{v}"' for k, v in key)
+    return "{" + inner + "}"
+
+
+class Metrics:
+    """이름 + 라벨 단위 카운터/요약 저장소 (스레드 안전)"""
+
+    def __init__(self):
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._summaries: Dict[str, Dict[LabelKey, list]] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help_text: str):
+        """메트릭 설명 (# HELP) 등록"""
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """카운터 증가"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """관측값 기록 (count, sum, max 유지)"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._summaries.setdefault(name, {})
+            summary = series.get(key)
+            if summary is None:
+                series[key] = [1, value, value]
+            else:
+                summary[0] += 1
+                summary[1] += value
+                summary[2] = max(summary[2], value)
+
+    def get(self, name: str, **labels) -> float:
+        """카운터 현재값 (없으면 0)"""
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON 직렬화 가능한 형태로 전체 메트릭 반환"""
+        with self._lock:
+            counters = {
+                name: {_format_labels(k) or "_": v for k, v in series.items()}
+                for name, series in self._counters.items()
+            }
+            summaries = {
+                name: {
+                    _format_labels(k) or "_": {"count": s[0], "sum": s[1], "max": s[2]}
+                    for k, s in series.items()
+                }
+                for name, series in self._summaries.items()
+            }
+        return {"counters": counters, "summaries": summaries}
+
+    def render_prometheus(self, extra: Optional[Dict[str, float]] = None) -> str:
+        """
+        Prometheus 텍스트 포맷으로 출력
+
+        Args:
+            extra: 함께 출력할 게이지 값 (이름 → 값)
+        """
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+
+            for name, series in sorted(self._summaries.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} summary")
+                for key, (count, total, _) in series.items():
+                    labels = _format_labels(key)
+                    lines.append(f"{name}_count{labels} {count:g}")
+                    lines.append(f"{name}_sum{labels} {total:g}")
+                lines.append(f"# TYPE {name}_max gauge")
+                for key, (_, _, peak) in series.items():
+                    lines.append(f"{name}_max{_format_labels(key)} {peak:g}")
+
+        for name, value in sorted((extra or {}).items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value:g}")
+
+        return "\n".join(lines) + "\n"
+
+
+# 싱글톤 인스턴스
+_metrics: Optional[Metrics] = None
+
+
+def get_metrics() -> Metrics:
+    """메트릭 저장소 싱글톤 인스턴스 반환"""
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics()
+    return _metrics
@@ -0,0 +1,111 @@
+"""프롬프트 프리픽스 캐싱 - 바이트 단위로 고정된 시스템 프롬프트 + 도구 스키마
+
+매 모델 호출의 앞부분은 SYSTEM_PROMPT와 ALL_TOOLS의 JSON 스키마입니다. 이 부분을 세션/턴과
+무관하게 바이트 단위로 같게 유지하면 제공자 쪽 프리픽스 캐시(vLLM automatic prefix caching,
+OpenAI/Gemini 암묵적 캐싱)가 프리필을 한 번만 계산합니다.
+- 시스템 메시지에는 고정 프롬프트만 넣고, 대화 요약처럼 바뀌는 내용은 그 뒤 메시지로 보냅니다.
+- build_prefix()가 프롬프트 + 정규화된 도구 스키마의 버전 해시를 만들고, 같은 모델의 그래프끼리
+  프리픽스가 다르면 경고합니다.
+- PromptCacheCallback이 호출마다 캐시된 입력 토큰 비율을 로그/메트릭으로 남깁니다.
+"""
+
+import json
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.tools import BaseTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from .metrics import get_metrics
+from .summary import SUMMARY_TAG
+
+logger = logging.getLogger("uvicorn.error")
+
+
+@dataclass(frozen=True)
+class StablePrefix:
+    """모델 호출마다 같은 앞부분 (시스템 프롬프트 + 도구 스키마)"""
+    system_prompt: str
+    tool_schemas: Tuple[str, ...]  # 도구별 정규화된 JSON (바인딩 순서)
+    version: str
+
+    @property
+    def text(self) -> str:
+        return self.system_prompt + "\n" + "\n".join(self.tool_schemas)
+
+
+def build_prefix(system_prompt: str, tools: Sequence[BaseTool]) -> StablePrefix:
+    """
+    시스템 프롬프트와 도구 스키마로 버전이 붙은 프리픽스를 만듭니다.
+
+    스키마는 키 정렬 + 공백 없는 JSON으로 정규화해서 해시하므로, 도구 설명이나 인자가 바뀔 때만
+    버전이 바뀝니다. (래핑한 도구 복사본도 스키마가 같으면 같은 버전)
+    """
+    schemas = tuple(
+        json.dumps(convert_to_openai_tool(t), ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        for t in tools
+    )
+    digest = hashlib.sha256("\x00".join((system_prompt,) + schemas).encode("utf-8")).hexdigest()[:12]
+    return StablePrefix(system_prompt=system_prompt, tool_schemas=schemas, version=digest)
+
+
+_versions: Dict[tuple, str] = {}
+_versions_lock = threading.Lock()
+
+
+def register_prefix(provider: str, model_name: Optional[str], prefix: StablePrefix):
+    """그래프를 만들 때 프리픽스 버전 기록 (같은 모델의 그래프끼리 다르면 캐시가 나뉘므로 경고)"""
+    key = (provider, model_name)
+    with _versions_lock:
+        previous = _versions.setdefault(key, prefix.version)
+    if previous != prefix.version:
+        logger.warning(
+            f"[PREFIX] {provider}/{model_name or 'default'} 프리픽스가 그래프마다 다름 "
+            f"({previous} != {prefix.version}) - 프리픽스 캐시가 나뉩니다"
+        )
+    else:
+        logger.info(f"[PREFIX] {provider}/{model_name or 'default'} v={prefix.version} ({len(prefix.text)}자)")
+    get_metrics().inc("prompt_prefix_builds_total", provider=provider, version=prefix.version)
+
+
+def _cached_tokens(usage: Dict[str, Any]) -> int:
+    details = usage.get("input_token_details") or {}
+    return int(details.get("cache_read") or 0)
+
+
+class PromptCacheCallback(BaseCallbackHandler):
+    """LLM 호출마다 입력 토큰 중 제공자 캐시에서 읽은 비율을 기록
+
+    usage_metadata.input_token_details.cache_read 기준입니다.
+    (vLLM은 --enable-prompt-tokens-details, OpenAI/vLLM 스트리밍은 stream_usage=True 필요)
+    """
+
+    run_inline = True
+
+    def __init__(self, provider: str, version: str):
+        self.provider = provider
+        self.version = version
+        self.metrics = get_metrics()
+
+    def on_llm_end(self, response: LLMResult, *, tags: Optional[List[str]] = None, **kwargs: Any):
+        caller = "summary" if SUMMARY_TAG in (tags or []) else "agent"
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if not usage or not usage.get("input_tokens"):
+                    continue
+                prompt = usage["input_tokens"]
+                cached = _cached_tokens(usage)
+                labels = {"provider": self.provider, "caller": caller}
+                self.metrics.inc("llm_prompt_tokens_total", prompt, **labels)
+                self.metrics.inc("llm_prompt_cached_tokens_total", cached, **labels)
+                self.metrics.observe("llm_prompt_cache_hit_ratio", cached / prompt, **labels)
+                logger.info(
+                    f"[PREFIX] v={self.version} {self.provider} {caller} "
+                    f"prompt={prompt} cached={cached} ({cached / prompt:.0%})"
+                )
@@ -0,0 +1,284 @@
+"""모델 계층 라우팅 - 싼 모델 우선, 필요할 때만 큰 모델
+
+턴마다 메시지를 보고 모델 계층을 고릅니다 (KoreanFoodAgent._route).
+- 인사, 의도가 확실한 단일 도구 턴 → 작은 모델 (로컬 vLLM)
+- 이미지가 있거나 여러 도구가 필요한 턴 → 큰 모델 (Gemini)
+- 그 외 → 에이전트에 설정된 제공자
+
+작은 모델 그래프의 LLM은 EscalatingChatModel로 감싸서, 잘못된 도구 호출(없는 도구, 스키마에 맞지 않는
+인자, 파싱 실패)이나 요청 실패가 나면 같은 입력으로 큰 모델을 다시 호출합니다.
+라우팅 결정은 [ROUTE] 로그와 turn_duration_seconds{tier,reason}, model_escalations_total로 남습니다.
+"""
+
+import re
+import time
+import logging
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from langgraph.constants import TAG_NOSTREAM
+
+from .intent import IntentRouter
+from .metrics import get_metrics
+
+logger = logging.getLogger("uvicorn.error")
+
+SMALL_TIER = "small"
+LARGE_TIER = "large"
+DEFAULT_TIER = "default"
+
+GREETING_RE = re.compile(
+    r'^(안녕|하이|헬로|hello|hi|hey|ㅎㅇ|반가|고마워|고맙|감사|ㄱㅅ|잘\s?가|바이|bye|좋은\s?(아침|하루|밤)|ㅋㅋ|ㅎㅎ)',
+    re.IGNORECASE,
+)
+# 여러 식당/음식을 함께 다루는 요청 (도구를 여러 번 호출)
+MULTI_TOOL_RE = re.compile(r'비교|각각|둘 다|모두|전부|그리고|후기')
+# 작은 모델이 도구 호출을 텍스트로 흘린 경우 (서버 파서가 인식하지 못함)
+LEAKED_TOOL_CALL_RE = re.compile(r'<tool_call>|<\|tool_call|\{\s*"name"\s*:\s*"\w+"\s*,\s*"(arguments|parameters)"')
+LEAK_OPENERS = ("<tool_call>", "<|tool_call")
+LEAK_JSON_NAME_RE = re.compile(r'\{"name":"\w*')
+LEAK_JSON_KEYS = ('","arguments"', '","parameters"')
+
+
+def _could_be_leak(tail: str) -> bool:
+    """tail이 (더 이어지면) LEAKED_TOOL_CALL_RE에 걸릴 수 있는지"""
+    if tail.startswith("<"):
+        return any(opener.startswith(tail) or tail.startswith(opener) for opener in LEAK_OPENERS)
+    compact = re.sub(r"\s+", "", tail)
+    if '{"name":"'.startswith(compact):
+        return True
+    match = LEAK_JSON_NAME_RE.match(compact)
+    if match is None:
+        return False
+    rest = compact[match.end():]
+    return any(key.startswith(rest) or rest.startswith(key) for key in LEAK_JSON_KEYS)
+
+
+def leak_holdback(text: str) -> int:
+    """text 끝에서 흘린 도구 호출의 시작일 수 있어 보류할 길이 (0이면 모두 내보내도 됨)"""
+    for match in re.finditer(r"[<{]", text):
+        if _could_be_leak(text[match.start():]):
+            return len(text) - match.start()
+    return 0
+
+
+@dataclass
+class RouteDecision:
+    tier: str
+    provider: str
+    reason: str
+
+
+class ModelRouter:
+    """메시지 → 모델 계층 (규칙 기반, 모델 호출 없음)"""
+
+    def __init__(
+        self,
+        intents: IntentRouter,
+        small_provider: str,
+        large_provider: str,
+        greeting_max_chars: int = 20,
+    ):
+        """
+        Args:
+            intents: 단일 도구 의도 판단에 쓰는 분류기
+            small_provider: 인사/단일 도구 턴을 처리할 제공자
+            large_provider: 멀티모달/여러 도구 턴과 승격에 쓸 제공자
+            greeting_max_chars: 이보다 짧은 인사말만 작은 모델로 보냄
+        """
+        self.intents = intents
+        self.small_provider = small_provider
+        self.large_provider = large_provider
+        self.greeting_max_chars = greeting_max_chars
+
+    def route(self, message: str, has_images: bool, default_provider: str) -> RouteDecision:
+        text = message.strip()
+        if has_images:
+            return RouteDecision(LARGE_TIER, self.large_provider, "multimodal")
+
+        scores = self.intents.score(text)
+        intent_hits = sum(1 for score, _ in scores if score >= 1.0)
+        if intent_hits == 0 and len(text) <= self.greeting_max_chars and GREETING_RE.match(text):
+            return RouteDecision(SMALL_TIER, self.small_provider, "greeting")
+        if intent_hits >= 2 or MULTI_TOOL_RE.search(text):
+            return RouteDecision(LARGE_TIER, self.large_provider, "multi_tool")
+        if self.intents.classify(text) is not None:
+            return RouteDecision(SMALL_TIER, self.small_provider, "single_tool")
+        return RouteDecision(DEFAULT_TIER, default_provider, "default")
+
+
+def inner_call_config(run_manager) -> dict:
+    """내부 모델 호출 config (추적은 이어가고 messages 스트림에는 내보내지 않음)"""
+    return {"callbacks": run_manager.get_child() if run_manager else None, "tags": [TAG_NOSTREAM]}
+
+
+class EscalatingChatModel(BaseChatModel):
+    """작은 모델의 결과가 잘못된 도구 호출이면 큰 모델로 다시 호출하는 래퍼
+
+    스트리밍 시 도구 호출이 나오기 전의 텍스트 토큰은 바로 내보내고, 도구 호출 청크부터는 모아 두었다가
+    검증을 통과하면 내보냅니다. 텍스트로 흘린 도구 호출(`<tool_call>`, `{"name": ..., "arguments"`)의
+    시작일 수 있는 끝부분은 확정될 때까지 보류하고, 승격되면 보류한 텍스트는 버립니다.
+    내부 호출에는 TAG_NOSTREAM을 붙여 LangGraph messages 스트림에 같은 토큰이 두 번 나가지 않게 합니다
+    (사용자에게는 이 래퍼가 내보낸 청크만 보임). 도구 호출 앞에 이미 내보낸 텍스트는 되돌릴 수 없으므로,
+    승격되면 큰 모델의 출력이 그 뒤에 이어집니다.
+    """
+
+    primary: Runnable
+    fallback: Runnable
+    primary_name: str = "small"
+    fallback_name: str = "large"
+    tool_schemas: List[Dict[str, Any]] = []
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def _llm_type(self) -> str:
+        return "escalating"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"primary": self.primary_name, "fallback": self.fallback_name}
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs) -> "EscalatingChatModel":
+        """두 모델에 같은 도구를 바인딩한 복사본"""
+        return self.model_copy(update={
+            "primary": self.primary.bind_tools(tools, **kwargs),
+            "fallback": self.fallback.bind_tools(tools, **kwargs),
+            "tool_schemas": [convert_to_openai_tool(t) for t in tools],
+        })
+
+    def invalid_reason(self, message: BaseMessage) -> Optional[str]:
+        """잘못된 도구 호출이면 이유, 정상이면 None"""
+        if getattr(message, "invalid_tool_calls", None):
+            return "invalid_tool_call"
+
+        tool_calls = getattr(message, "tool_calls", None) or []
+        if not tool_calls:
+            content = message.content if isinstance(message.content, str) else str(message.content)
+            return "leaked_tool_call" if LEAKED_TOOL_CALL_RE.search(content) else None
+
+        schemas = {s["function"]["name"]: s["function"].get("parameters", {}) for s in self.tool_schemas}
+        for tc in tool_calls:
+            params = schemas.get(tc["name"])
+            if params is None:
+                return "unknown_tool"
+            args = tc.get("args") or {}
+            properties = params.get("properties", {})
+            if any(key not in properties for key in args) or any(
+                key not in args for key in params.get("required", [])
+            ):
+                return "bad_args"
+        return None
+
+    def _escalated(self, reason: str, started_at: float):
+        elapsed = time.monotonic() - started_at
+        get_metrics().inc("model_escalations_total", primary=self.primary_name, reason=reason)
+        get_metrics().observe("model_escalation_wasted_seconds", elapsed, primary=self.primary_name)
+        logger.warning(
+            f"[ROUTE] {self.primary_name} → {self.fallback_name} 승격 ({reason}, {elapsed:.2f}s 소모)"
+        )
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        config = inner_call_config(run_manager)
+        started_at = time.monotonic()
+        try:
+            message = self.primary.invoke(messages, config=config)
+            reason = self.invalid_reason(message)
+        except Exception as e:
+            reason = f"error:{type(e).__name__}"
+        if reason:
+            self._escalated(reason, started_at)
+            message = self.fallback.invoke(messages, config=config)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        config = inner_call_config(run_manager)
+        started_at = time.monotonic()
+        try:
+            message = await self.primary.ainvoke(messages, config=config)
+            reason = self.invalid_reason(message)
+        except Exception as e:
+            reason = f"error:{type(e).__name__}"
+        if reason:
+            self._escalated(reason, started_at)
+            message = await self.fallback.ainvoke(messages, config=config)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        config = inner_call_config(run_manager)
+
+        async def emit(chunk: AIMessageChunk):
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager:
+                await run_manager.on_llm_new_token(
+                    chunk.content if isinstance(chunk.content, str) else "", chunk=generation
+                )
+            return generation
+
+        started_at = time.monotonic()
+        held: List[AIMessageChunk] = []
+        pending = ""  # 흘린 도구 호출의 시작일 수 있어 보류 중인 텍스트
+        aggregate: Optional[AIMessageChunk] = None
+        reason = None
+        stream = self.primary.astream(messages, config=config)
+        try:
+            async for chunk in stream:
+                aggregate = chunk if aggregate is None else aggregate + chunk
+                if held or chunk.tool_call_chunks:
+                    held.append(chunk)
+                    continue
+                if not isinstance(chunk.content, str):
+                    yield await emit(chunk)
+                    continue
+                pending += chunk.content
+                if LEAKED_TOOL_CALL_RE.search(pending):
+                    reason = "leaked_tool_call"
+                    break
+                keep = leak_holdback(pending)
+                safe, pending = pending[:len(pending) - keep], pending[len(pending) - keep:]
+                yield await emit(chunk.model_copy(update={"content": safe}))
+            if not reason:
+                reason = self.invalid_reason(aggregate) if aggregate is not None else "empty"
+        except Exception as e:
+            reason = f"error:{type(e).__name__}"
+        finally:
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+        if not reason:
+            if pending:
+                yield await emit(AIMessageChunk(content=pending))
+            for chunk in held:
+                yield await emit(chunk)
+            return
+
+        self._escalated(reason, started_at)
+        async for chunk in self.fallback.astream(messages, config=config):
+            yield await emit(chunk)
+
@@ -0,0 +1,38 @@
+"""공용 비동기 HTTP 클라이언트"""
+
+import asyncio
+from typing import Optional
+
+import httpx
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """현재 이벤트 루프에 묶인 httpx.AsyncClient 싱글톤 반환
+
+    커넥션 풀은 생성된 이벤트 루프에 묶이므로, 동기 래퍼(asyncio.run)처럼
+    루프가 바뀌면 새 클라이언트를 만듭니다.
+    """
+    global _client, _client_loop
+
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_http_client():
+    """공용 클라이언트 종료 (앱 종료 시 호출)"""
+    global _client, _client_loop
+
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
@@ -3,6 +3,7 @@
 import os
 import re
 import base64
+import asyncio
 from pathlib import Path
 from typing import Optional, Dict, Any, List
 
@@ -12,18 +13,17 @@ try:
 except ImportError:
     pass
 
-try:
-    import requests
-    REQUESTS_AVAILABLE = True
-except ImportError:
-    REQUESTS_AVAILABLE = False
+import httpx
+
+from .http import get_http_client
+from ..image_store import load_image
 
 
 class SerperImageSearcher:
     """Serper.dev를 활용한 이미지 검색기
 
     Google Lens + 텍스트 검색 지원
-    로컬 파일도 지원 (임시 업로드)
+    로컬 파일 / 이미지 저장소 참조도 지원 (임시 업로드)
     """
 
     def __init__(self, api_key: Optional[str] = None):
@@ -34,12 +34,13 @@ class SerperImageSearcher:
         self.search_url = "https://google.serper.dev/search"
         self.serpapi_url = "https://serpapi.com/search"
 
-    def _apply_exif_orientation(self, file_path: str) -> str:
-        """EXIF orientation을 적용한 이미지를 임시 파일로 저장"""
+    def _apply_exif_orientation(self, image_data: bytes) -> bytes:
+        """EXIF orientation을 적용한 이미지 bytes 반환 (회전이 필요 없으면 원본 그대로)"""
         try:
+            from io import BytesIO
             from PIL import Image, ExifTags
 
-            img = Image.open(file_path)
+            img = Image.open(BytesIO(image_data))
             orientation_key = None
             for key in ExifTags.TAGS.keys():
                 if ExifTags.TAGS[key] == 'Orientation':
@@ -57,7 +58,7 @@ class SerperImageSearcher:
                 elif orientation == 8:
                     img = img.rotate(90, expand=True)
                 else:
-                    return file_path
+                    return image_data
 
                 import random
                 pixels = img.load()
@@ -65,21 +66,29 @@ class SerperImageSearcher:
                 r, g, b = pixels[x, y][:3] if len(pixels[x, y]) >= 3 else (pixels[x, y], pixels[x, y], pixels[x, y])
                 pixels[x, y] = (r, g, (b + random.randint(1, 5)) % 256)
 
-                import tempfile
-                temp_file = tempfile.NamedTemporaryFile(suffix='.jpeg', delete=False)
-                img.save(temp_file.name, format='JPEG', quality=90)
-                return temp_file.name
+                buffer = BytesIO()
+                img.convert('RGB').save(buffer, format='JPEG', quality=90)
+                return buffer.getvalue()
 
         except Exception:
             pass
-        return file_path
+        return image_data
 
-    def upload_image(self, file_path: str) -> Optional[str]:
-        """로컬 이미지를 임시 호스팅 서비스에 업로드"""
-        if not os.path.exists(file_path):
+    async def upload_image(self, image_source: str) -> Optional[str]:
+        """image:// 참조 또는 로컬 이미지를 임시 호스팅 서비스에 업로드"""
+        loaded = load_image(image_source)
+        if loaded is None:
             return None
+        return await self.upload_image_bytes(*loaded)
 
-        file_path = self._apply_exif_orientation(file_path)
+    async def upload_image_bytes(self, image_data: bytes, mime_type: str = "image/jpeg") -> Optional[str]:
+        """이미지 bytes를 임시 호스팅 서비스에 업로드 (임시 파일 없이 메모리에서 처리)"""
+        rotated = await asyncio.to_thread(self._apply_exif_orientation, image_data)
+        if rotated is not image_data:
+            image_data, mime_type = rotated, "image/jpeg"
+
+        ext = {"image/png": ".png", "image/gif": ".gif", "image/webp": ".webp"}.get(mime_type, ".jpg")
+        file_name = f"image{ext}"
 
         upload_services = [
             self._upload_to_litterbox,
@@ -89,22 +98,20 @@ class SerperImageSearcher:
 
         for upload_func in upload_services:
             try:
-                url = upload_func(file_path)
+                url = await upload_func(image_data, file_name, mime_type)
                 if url:
                     return url
             except Exception:
                 continue
         return None
 
-    def _upload_to_imgbb(self, file_path: str) -> Optional[str]:
-        with open(file_path, 'rb') as f:
-            image_data = base64.b64encode(f.read()).decode()
-
-        response = requests.post(
+    async def _upload_to_imgbb(self, image_data: bytes, file_name: str, mime_type: str) -> Optional[str]:
+        client = get_http_client()
+        response = await client.post(
             'https://api.imgbb.com/1/upload',
             data={
                 'key': 'da2d77ea2fc52e04d4e62a6d3906f48f',
-                'image': image_data,
+                'image': base64.b64encode(image_data).decode(),
                 'expiration': 600,
             },
             timeout=30
@@ -116,14 +123,14 @@ class SerperImageSearcher:
                 return data['data']['url']
         return None
 
-    def _upload_to_freeimage(self, file_path: str) -> Optional[str]:
-        with open(file_path, 'rb') as f:
-            response = requests.post(
-                'https://freeimage.host/api/1/upload',
-                data={'key': '6d207e02198a847aa98d0a2a901485a5'},
-                files={'source': f},
-                timeout=30
-            )
+    async def _upload_to_freeimage(self, image_data: bytes, file_name: str, mime_type: str) -> Optional[str]:
+        client = get_http_client()
+        response = await client.post(
+            'https://freeimage.host/api/1/upload',
+            data={'key': '6d207e02198a847aa98d0a2a901485a5'},
+            files={'source': (file_name, image_data, mime_type)},
+            timeout=30
+        )
 
         if response.status_code == 200:
             data = response.json()
@@ -131,14 +138,14 @@ class SerperImageSearcher:
                 return data['image']['url']
         return None
 
-    def _upload_to_litterbox(self, file_path: str) -> Optional[str]:
-        with open(file_path, 'rb') as f:
-            response = requests.post(
-                'https://litterbox.catbox.moe/resources/internals/api.php',
-                data={'reqtype': 'fileupload', 'time': '1h'},
-                files={'fileToUpload': f},
-                timeout=60
-            )
+    async def _upload_to_litterbox(self, image_data: bytes, file_name: str, mime_type: str) -> Optional[str]:
+        client = get_http_client()
+        response = await client.post(
+            'https://litterbox.catbox.moe/resources/internals/api.php',
+            data={'reqtype': 'fileupload', 'time': '1h'},
+            files={'fileToUpload': (file_name, image_data, mime_type)},
+            timeout=60
+        )
 
         if response.status_code == 200:
             url = response.text.strip()
@@ -146,21 +153,16 @@ class SerperImageSearcher:
                 return url
         return None
 
-    def get_image_url(self, image_source: str) -> Optional[str]:
-        """이미지 소스(URL 또는 로컬 경로)에서 공개 URL 획득"""
+    async def get_image_url(self, image_source: str) -> Optional[str]:
+        """이미지 소스(URL, image:// 참조, 로컬 경로)에서 공개 URL 획득"""
         if image_source.startswith('http://') or image_source.startswith('https://'):
             return image_source
 
-        if os.path.exists(image_source):
-            uploaded_url = self.upload_image(image_source)
-            if uploaded_url:
-                return uploaded_url
-        return None
+        return await self.upload_image(image_source)
 
-    def search_with_lens(self, image_url: str) -> Dict[str, Any]:
+    async def search_with_lens(self, image_url: str) -> Dict[str, Any]:
         """Google Lens로 이미지 검색 (Serper.dev 우선)"""
-        if not REQUESTS_AVAILABLE:
-            return {"error": "requests 라이브러리가 설치되지 않았습니다."}
+        client = get_http_client()
 
         # Serper.dev 우선
         if self.serper_key:
@@ -170,7 +172,7 @@ class SerperImageSearcher:
                     "Content-Type": "application/json"
                 }
                 data = {"url": image_url, "gl": "kr", "hl": "ko"}
-                response = requests.post(self.lens_url, headers=headers, json=data, timeout=30)
+                response = await client.post(self.lens_url, headers=headers, json=data, timeout=30)
                 response.raise_for_status()
                 result = response.json()
                 organic = result.get("organic", [])
@@ -193,7 +195,7 @@ class SerperImageSearcher:
                     "hl": "ko",
                     "country": "kr"
                 }
-                response = requests.get(self.serpapi_url, params=params, timeout=30)
+                response = await client.get(self.serpapi_url, params=params, timeout=30)
                 response.raise_for_status()
                 result = response.json()
                 return {
@@ -206,14 +208,14 @@ class SerperImageSearcher:
 
         return {"error": "API 키가 설정되지 않았습니다."}
 
-    def search_with_combined(self, image_url: str) -> Dict[str, Any]:
+    async def search_with_combined(self, image_url: str) -> Dict[str, Any]:
         """여러 검색 방법을 조합하여 최상의 결과 반환"""
-        lens_result = self.search_with_lens(image_url)
+        lens_result = await self.search_with_lens(image_url)
         if "error" not in lens_result:
             return lens_result
         return {"error": "검색 결과를 찾지 못했습니다."}
 
-    def search_text(self, query: str) -> Dict[str, Any]:
+    async def search_text(self, query: str) -> Dict[str, Any]:
         """Serper 텍스트 검색"""
         if not self.api_key:
             return {"error": "SERPER_API_KEY가 설정되지 않았습니다."}
@@ -225,14 +227,15 @@ class SerperImageSearcher:
         data = {"q": query, "gl": "kr", "hl": "ko"}
 
         try:
-            response = requests.post(self.search_url, headers=headers, json=data, timeout=30)
+            client = get_http_client()
+            response = await client.post(self.search_url, headers=headers, json=data, timeout=30)
             response.raise_for_status()
             result = response.json()
             return {
                 "organic_results": result.get("organic", []),
                 "answer_box": result.get("answerBox", {})
             }
-        except requests.RequestException as e:
+        except httpx.HTTPError as e:
             return {"error": f"API 요청 실패: {str(e)}"}
 
 
@@ -0,0 +1,167 @@
+"""롤링 대화 요약 - 오래된 턴을 요약문 하나로 접어서 프롬프트 크기를 일정하게 유지
+
+응답이 끝난 뒤 백그라운드에서 실행됩니다 (KoreanFoodAgent._schedule_summary).
+히스토리가 trigger_tokens를 넘으면 최근 keep_turns개 턴을 제외한 메시지를 기존 요약과 합쳐
+새 요약으로 만들고, 해당 메시지는 RemoveMessage로 state에서 지웁니다.
+요약문은 state의 `summary` 키에 저장되고 pre_model_hook이 시스템 메시지 다음 메시지로 넣습니다.
+(시스템 메시지는 프리픽스 캐시를 위해 고정 - src/prompt_cache.py)
+"""
+
+import json
+import asyncio
+import logging
+from typing import Any, Callable, List, Optional, Sequence
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+    ToolMessage,
+)
+from langgraph.prebuilt.chat_agent_executor import AgentState
+
+logger = logging.getLogger("uvicorn.error")
+
+# LLM 호출을 사용자 스트림에 섞지 않기 위한 태그
+SUMMARY_TAG = "rolling_summary"
+
+SUMMARY_PROMPT = """다음은 한국 음식 상담 대화의 앞부분입니다. 이후 대화에서 참고할 수 있도록 요약하세요.
+- 사용자의 관심사/선호(지역, 음식, 식단 제약 등)와 이미 답변한 내용(식당명, 메뉴, 가격, 레시피, 영양정보의 핵심 수치)을 유지하세요.
+- 기존 요약이 있으면 새 내용과 합쳐 하나의 요약으로 갱신하세요.
+- 한국어로, {max_chars}자 이내의 항목 목록으로만 작성하세요."""
+
+
+class SummaryState(AgentState):
+    """AgentState + 롤링 요약"""
+    summary: str
+
+
+def _render(message: BaseMessage) -> str:
+    """요약 입력용 한 줄 표현"""
+    content = message.content
+    if not isinstance(content, str):
+        content = " ".join(
+            part.get("text", "") if isinstance(part, dict) else str(part)
+            for part in content
+            if not isinstance(part, dict) or part.get("type") == "text"
+        )
+    if isinstance(message, HumanMessage):
+        return f"사용자: {content}"
+    if isinstance(message, ToolMessage):
+        return f"도구 결과({message.name}): {content[:600]}"
+    if isinstance(message, AIMessage) and message.tool_calls:
+        calls = ", ".join(
+            f"{tc['name']}({json.dumps(tc.get('args', {}), ensure_ascii=False)})" for tc in message.tool_calls
+        )
+        return f"도구 호출: {calls}"
+    return f"AI: {content}"
+
+
+class RollingSummarizer:
+    """히스토리가 길어지면 오래된 턴을 요약으로 접습니다."""
+
+    def __init__(
+        self,
+        llm: BaseChatModel,
+        count_message: Callable[[BaseMessage], int],
+        trigger_tokens: int,
+        keep_turns: int = 2,
+        max_chars: int = 800,
+    ):
+        """
+        Args:
+            llm: 요약에 사용할 모델 (도구 바인딩 없이 사용)
+            count_message: 메시지 → 토큰 수 (ContextTrimmer.count_message)
+            trigger_tokens: 히스토리가 이 토큰 수를 넘으면 요약
+            keep_turns: 요약하지 않고 원문으로 남길 최근 턴(HumanMessage) 수
+            max_chars: 요약문 최대 길이
+        """
+        self.llm = llm
+        self.count_message = count_message
+        self.trigger_tokens = trigger_tokens
+        self.keep_turns = max(keep_turns, 1)
+        self.max_chars = max_chars
+
+    def select(self, messages: Sequence[BaseMessage]) -> int:
+        """
+        요약할 메시지 개수 (messages[:n])를 반환합니다. 요약이 필요 없으면 0.
+
+        최근 keep_turns개 턴의 첫 HumanMessage 앞에서 자르므로 tool call/result 쌍이 나뉘지 않습니다.
+        """
+        if sum(self.count_message(m) for m in messages) <= self.trigger_tokens:
+            return 0
+
+        human_indices = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+        if len(human_indices) <= self.keep_turns:
+            return 0
+        return human_indices[-self.keep_turns]
+
+    async def summarize(self, previous: str, messages: Sequence[BaseMessage]) -> str:
+        """기존 요약 + 오래된 메시지 → 새 요약"""
+        transcript = "\n".join(_render(m) for m in messages)
+        if previous:
+            transcript = f"[기존 요약]\n{previous}\n\n[이어진 대화]\n{transcript}"
+
+        response = await self.llm.ainvoke(
+            [
+                SystemMessage(content=SUMMARY_PROMPT.format(max_chars=self.max_chars)),
+                HumanMessage(content=transcript),
+            ],
+            config={"tags": [SUMMARY_TAG]},
+        )
+        content = response.content
+        if isinstance(content, list):
+            content = "".join(
+                part.get("text", "") for part in content if isinstance(part, dict) and part.get("type") == "text"
+            )
+        return content.strip()[: self.max_chars * 2]
+
+    async def run(self, graph: Any, config: dict) -> bool:
+        """
+        thread의 state를 확인해서 필요하면 요약하고 state를 갱신합니다.
+
+        Returns:
+            요약했으면 True
+        """
+        snapshot = await graph.aget_state(config)
+        values = snapshot.values or {}
+        messages: List[BaseMessage] = values.get("messages", [])
+        # 실행 중(도구 호출 대기 등)인 thread는 건드리지 않음
+        if snapshot.next or not messages:
+            return False
+
+        n = self.select(messages)
+        if not n:
+            return False
+
+        old = messages[:n]
+        summary = await self.summarize(values.get("summary", ""), old)
+        if not summary:
+            return False
+
+        # 취소돼도 이미 시작한 state 쓰기는 끝까지 기다림 (취소한 쪽이 기다린 뒤 새 턴을 시작하도록)
+        write = asyncio.ensure_future(graph.aupdate_state(
+            config,
+            {"messages": [RemoveMessage(id=m.id) for m in old], "summary": summary},
+            as_node="agent",
+        ))
+        try:
+            await asyncio.shield(write)
+        except asyncio.CancelledError:
+            await write
+            raise
+        logger.info(
+            f"[SUMMARY] thread={config['configurable'].get('thread_id')} "
+            f"{n}개 메시지 요약 ({len(summary)}자)"
+        )
+        return True
+
+
+def summary_message(summary: Optional[str]) -> Optional[HumanMessage]:
+    """시스템 메시지 다음에 넣을 요약 메시지 (요약이 없으면 None)"""
+    if not summary:
+        return None
+    return HumanMessage(content=f"[이전 대화 요약]\n{summary}")
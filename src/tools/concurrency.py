@@ -0,0 +1,91 @@
+"""도구 동시 실행 제한
+
+LangGraph ToolNode는 한 AIMessage의 tool_calls를 asyncio.gather로 동시에 실행합니다.
+여기서는 각 도구의 코루틴을 세마포어로 감싸서 전체 동시 실행 수와 도구별 동시 실행 수
+(예: Playwright로 Chromium을 띄우는 후기 크롤링)를 프로세스 전체 기준으로 제한합니다.
+"""
+
+import time
+import asyncio
+import functools
+from typing import Dict, List, Optional
+
+from langchain_core.tools import BaseTool, StructuredTool
+
+from ..metrics import get_metrics
+
+
+class ToolConcurrencyLimiter:
+    """전체/도구별 세마포어 (이벤트 루프가 바뀌면 다시 생성)"""
+
+    def __init__(self, max_parallel: int = 4, per_tool: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            max_parallel: 동시에 실행할 수 있는 도구 호출 수 (0이면 제한 없음)
+            per_tool: 도구 이름 → 동시 실행 수
+        """
+        self.max_parallel = max_parallel
+        self.per_tool = dict(per_tool or {})
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._global: Optional[asyncio.Semaphore] = None
+        self._tools: Dict[str, asyncio.Semaphore] = {}
+
+    def _semaphores(self, name: str) -> List[asyncio.Semaphore]:
+        # 세마포어는 처음 대기한 이벤트 루프에 묶이므로 동기 래퍼(asyncio.run)에서도 동작하도록
+        # 루프가 바뀌면 새로 만듦
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._global = asyncio.Semaphore(self.max_parallel) if self.max_parallel > 0 else None
+            self._tools = {
+                tool_name: asyncio.Semaphore(limit)
+                for tool_name, limit in self.per_tool.items() if limit > 0
+            }
+
+        semaphores = []
+        # 도구별 제한을 먼저 얻어야 전체 슬롯을 쥔 채 도구별 대기를 하지 않음
+        if name in self._tools:
+            semaphores.append(self._tools[name])
+        if self._global is not None:
+            semaphores.append(self._global)
+        return semaphores
+
+    def wrap(self, tool: BaseTool) -> BaseTool:
+        """도구 코루틴을 동시 실행 제한으로 감싼 복사본 반환"""
+        if not isinstance(tool, StructuredTool) or tool.coroutine is None:
+            return tool
+
+        coroutine = tool.coroutine
+        metrics = get_metrics()
+
+        @functools.wraps(coroutine)
+        async def limited(*args, **kwargs):
+            semaphores = self._semaphores(tool.name)
+            queued_at = time.monotonic()
+            acquired = []
+            try:
+                for semaphore in semaphores:
+                    await semaphore.acquire()
+                    acquired.append(semaphore)
+                metrics.observe("tool_queue_seconds", time.monotonic() - queued_at, tool=tool.name)
+
+                started_at = time.monotonic()
+                outcome = "error"
+                try:
+                    result = await coroutine(*args, **kwargs)
+                    outcome = "ok"
+                    return result
+                except asyncio.CancelledError:
+                    outcome = "cancelled"
+                    raise
+                finally:
+                    metrics.inc("tool_calls_total", tool=tool.name, outcome=outcome)
+                    metrics.observe("tool_duration_seconds", time.monotonic() - started_at, tool=tool.name)
+            finally:
+                for semaphore in reversed(acquired):
+                    semaphore.release()
+
+        return tool.model_copy(update={"coroutine": limited})
+
+    def wrap_all(self, tools: List[BaseTool]) -> List[BaseTool]:
+        return [self.wrap(t) for t in tools]
@@ -2,21 +2,18 @@
 
 import os
 import re
-from pathlib import Path
+import asyncio
 from typing import Dict, Any
 from langchain_core.tools import tool
 from langgraph.config import get_stream_writer
 
-try:
-    import requests
-except ImportError:
-    pass
-
 from ..config import settings
+from ..image_store import IMAGE_REF_PREFIX, get_image_store, load_image
 from ..services import get_searcher
+from ..services.http import get_http_client
 
 
-def extract_blog_content(url: str) -> Dict[str, Any]:
+async def extract_blog_content(url: str) -> Dict[str, Any]:
     """블로그 페이지에서 음식 관련 본문 텍스트 추출"""
     result = {"url": url, "content": ""}
 
@@ -25,7 +22,8 @@ def extract_blog_content(url: str) -> Dict[str, Any]:
             url = url.replace('blog.naver.com', 'm.blog.naver.com')
 
         headers = {'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 14_0 like Mac OS X)'}
-        response = requests.get(url, headers=headers, timeout=10)
+        client = get_http_client()
+        response = await client.get(url, headers=headers, timeout=10)
         if response.status_code != 200:
             return result
 
@@ -45,27 +43,17 @@ def extract_blog_content(url: str) -> Dict[str, Any]:
                     relevant_sentences.append(sentence.strip())
 
         result["content"] = ' '.join(relevant_sentences[:10])
-    except:
+    except Exception:
         pass
 
     return result
 
 
-def _get_mime_type(path_or_url: str) -> str:
-    """파일 경로 또는 URL에서 MIME 타입 추출"""
-    ext = Path(path_or_url.split('?')[0]).suffix.lower()
-    return {
-        ".jpg": "image/jpeg", ".jpeg": "image/jpeg",
-        ".png": "image/png", ".gif": "image/gif",
-        ".webp": "image/webp",
-    }.get(ext, "image/jpeg")
-
-
-def _analyze_with_gemini(image_source: str, image_url: str, search_results: str) -> str:
+async def _analyze_with_gemini(image_source: str, image_url: str, search_results: str) -> str:
     """Gemini API로 이미지 + Google Lens 검색 결과를 종합 분석
 
     Args:
-        image_source: 원본 이미지 소스 (로컬 경로 또는 URL)
+        image_source: 원본 이미지 소스 (image:// 참조, 로컬 경로 또는 URL)
         image_url: 업로드된 공개 이미지 URL
         search_results: Google Lens 검색 결과 텍스트
     """
@@ -78,13 +66,12 @@ def _analyze_with_gemini(image_source: str, image_url: str, search_results: str)
         genai.configure(api_key=api_key)
         model = genai.GenerativeModel('gemini-3-flash-preview')
 
-        # 이미지 준비 (로컬 파일이면 직접 읽기, URL이면 다운로드)
-        if os.path.exists(image_source):
-            with open(image_source, 'rb') as f:
-                image_data = f.read()
-            mime_type = _get_mime_type(image_source)
+        # 이미지 준비 (저장소/로컬 파일이면 그대로 사용, URL이면 다운로드)
+        loaded = load_image(image_source)
+        if loaded is not None:
+            image_data, mime_type = loaded
         else:
-            resp = requests.get(image_url, timeout=15)
+            resp = await get_http_client().get(image_url, timeout=15)
             resp.raise_for_status()
             image_data = resp.content
             mime_type = resp.headers.get('Content-Type', 'image/jpeg').split(';')[0]
@@ -106,7 +93,7 @@ def _analyze_with_gemini(image_source: str, image_url: str, search_results: str)
 - 검색 결과에 없는 내용을 추측하지 마세요
 - 보기 좋게 이모지와 볼드체를 활용해 포맷팅"""
 
-        response = model.generate_content([image_part, prompt])
+        response = await model.generate_content_async([image_part, prompt])
         return response.text
 
     except Exception as e:
@@ -114,13 +101,13 @@ def _analyze_with_gemini(image_source: str, image_url: str, search_results: str)
 
 
 @tool
-def search_food_by_image(image_source: str) -> str:
+async def search_food_by_image(image_source: str) -> str:
     """
     새로운 음식 이미지가 있을 때만 사용하세요.
-    이미지 URL 또는 로컬 파일 경로를 받아 Google Lens + Gemini로 분석합니다.
+    이미지 URL, 업로드 이미지 참조(image://...) 또는 로컬 파일 경로를 받아 Google Lens + Gemini로 분석합니다.
 
     Args:
-        image_source: 이미지 URL 또는 로컬 파일 경로 (필수)
+        image_source: 이미지 URL, image:// 참조 또는 로컬 파일 경로 (필수)
 
     Returns:
         Gemini 종합 분석 결과 (음식 이름, 식당, 메뉴, 가격 등)
@@ -132,23 +119,26 @@ def search_food_by_image(image_source: str) -> str:
 
     image_source = image_source.strip()
 
-    if not image_source.startswith(('http://', 'https://', '/')):
+    if not image_source.startswith(('http://', 'https://', '/', IMAGE_REF_PREFIX)):
         return "[이미지 없음] 유효한 이미지 경로가 아닙니다."
 
-    if not image_source.startswith(('http://', 'https://')) and not os.path.exists(image_source):
+    if image_source.startswith(IMAGE_REF_PREFIX):
+        if get_image_store().get(image_source) is None:
+            return f"[이미지 없음] 업로드 이미지를 찾을 수 없습니다: {image_source}"
+    elif not image_source.startswith(('http://', 'https://')) and not os.path.exists(image_source):
         return f"[이미지 없음] 파일을 찾을 수 없습니다: {image_source}"
 
     searcher = get_searcher()
 
     # 1. 이미지 업로드
     writer({"tool": "search_food_by_image", "status": "이미지 업로드 중..."})
-    image_url = searcher.get_image_url(image_source)
+    image_url = await searcher.get_image_url(image_source)
     if not image_url:
         return f"이미지를 업로드할 수 없습니다: {image_source}"
 
     # 2. Google Lens 검색
     writer({"tool": "search_food_by_image", "status": "Google Lens로 검색 중..."})
-    result = searcher.search_with_combined(image_url)
+    result = await searcher.search_with_combined(image_url)
 
     if "error" in result:
         return f"검색 실패: {result['error']}"
@@ -181,8 +171,8 @@ def search_food_by_image(image_source: str) -> str:
 
     if blog_links:
         raw_parts.append("\n[블로그 본문]")
-        for i, link in enumerate(blog_links[:3], 1):
-            blog_data = extract_blog_content(link)
+        blogs = await asyncio.gather(*(extract_blog_content(link) for link in blog_links[:3]))
+        for i, blog_data in enumerate(blogs, 1):
             if blog_data["content"]:
                 raw_parts.append(f"--- 블로그 {i} ---")
                 raw_parts.append(blog_data["content"][:1000])
@@ -197,7 +187,7 @@ def search_food_by_image(image_source: str) -> str:
 
     # 4. Gemini로 이미지 + 검색 결과 종합 분석
     writer({"tool": "search_food_by_image", "status": "Gemini로 종합 분석 중..."})
-    analysis = _analyze_with_gemini(image_source, image_url, search_text)
+    analysis = await _analyze_with_gemini(image_source, image_url, search_text)
 
     # 5. 썸네일 추가 (프론트엔드 이미지 표시용)
     output = analysis
@@ -1,14 +1,9 @@
 """영양정보 검색 도구"""
 
+import asyncio
 from langchain_core.tools import tool
 from langgraph.config import get_stream_writer
 
-try:
-    import requests
-    REQUESTS_AVAILABLE = True
-except ImportError:
-    REQUESTS_AVAILABLE = False
-
 try:
     from bs4 import BeautifulSoup
     BS4_AVAILABLE = True
@@ -16,9 +11,10 @@ except ImportError:
     BS4_AVAILABLE = False
 
 from ..services import get_searcher
+from ..services.http import get_http_client
 
 
-def _crawl_nutrition_page(url: str) -> str:
+async def _crawl_nutrition_page(url: str) -> str:
     """영양정보 페이지 본문 크롤링"""
     if not BS4_AVAILABLE:
         return ""
@@ -29,7 +25,7 @@ def _crawl_nutrition_page(url: str) -> str:
         if 'blog.naver.com' in url and 'm.blog' not in url:
             url = url.replace('blog.naver.com', 'm.blog.naver.com')
 
-        resp = requests.get(url, headers=headers, timeout=10)
+        resp = await get_http_client().get(url, headers=headers, timeout=10)
         resp.encoding = 'utf-8'
 
         if resp.status_code != 200:
@@ -45,14 +41,14 @@ def _crawl_nutrition_page(url: str) -> str:
             lines = [l.strip() for l in text.split('\n') if l.strip()]
             return '\n'.join(lines)[:2000]
 
-    except:
+    except Exception:
         return ""
 
     return ""
 
 
 @tool
-def get_nutrition_info(query: str) -> str:
+async def get_nutrition_info(query: str) -> str:
     """
     칼로리, 영양성분, 열량, 탄수화물, 단백질 등을 물으면 반드시 이 도구를 사용하세요.
     직접 영양정보를 답변하지 말고 이 도구로 검색하세요.
@@ -64,11 +60,15 @@ def get_nutrition_info(query: str) -> str:
         영양정보 검색 결과
     """
     # 실시간 스트리밍
-    writer = get_stream_writer()
-    writer({"tool": "get_nutrition_info", "status": "영양 정보 검색 중..."})
+    # get_stream_writer는 LangGraph 컨텍스트에서만 동작 (선실행은 그래프 밖에서 호출됨)
+    try:
+        writer = get_stream_writer()
+        writer({"tool": "get_nutrition_info", "status": "영양 정보 검색 중..."})
+    except RuntimeError:
+        writer = lambda x: None
 
     searcher = get_searcher()
-    search_result = searcher.search_text(query)
+    search_result = await searcher.search_text(query)
 
     if "error" in search_result:
         return f"검색 실패: {search_result['error']}"
@@ -82,12 +82,12 @@ def get_nutrition_info(query: str) -> str:
 
     output = [f"[검색: {query}]"]
 
-    for item in organic[:3]:
+    pages = await asyncio.gather(*(_crawl_nutrition_page(item.get("link", "")) for item in organic[:3]))
+
+    for item, content in zip(organic[:3], pages):
         title = item.get("title", "")
         link = item.get("link", "")
 
-        content = _crawl_nutrition_page(link)
-
         if content:
             output.append(f"\n=== {title} ===")
             output.append(f"출처: {link}")
@@ -3,12 +3,6 @@
 from langchain_core.tools import tool
 from langgraph.config import get_stream_writer
 
-try:
-    import requests
-    REQUESTS_AVAILABLE = True
-except ImportError:
-    REQUESTS_AVAILABLE = False
-
 try:
     from bs4 import BeautifulSoup
     BS4_AVAILABLE = True
@@ -16,16 +10,18 @@ except ImportError:
     BS4_AVAILABLE = False
 
 from ..services import get_searcher
+from ..services.http import get_http_client
 
 
-def _crawl_recipe_fast(url: str) -> str:
-    """requests로 빠른 레시피 크롤링"""
+async def _crawl_recipe_fast(url: str) -> str:
+    """httpx로 빠른 레시피 크롤링"""
     if not BS4_AVAILABLE:
         return "BeautifulSoup 라이브러리가 필요합니다."
 
     try:
         headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        resp = requests.get(url, headers=headers, timeout=10)
+        client = get_http_client()
+        resp = await client.get(url, headers=headers, timeout=10)
         resp.encoding = 'utf-8'
 
         if resp.status_code != 200:
@@ -87,7 +83,7 @@ def _crawl_recipe_fast(url: str) -> str:
         else:
             if 'blog.naver.com' in url and 'm.blog.naver.com' not in url:
                 url = url.replace('blog.naver.com', 'm.blog.naver.com')
-                resp = requests.get(url, headers=headers, timeout=10)
+                resp = await client.get(url, headers=headers, timeout=10)
                 soup = BeautifulSoup(resp.text, 'html.parser')
                 content = soup.select_one('.se-main-container, #postViewArea, .post-view')
             else:
@@ -108,7 +104,7 @@ def _crawl_recipe_fast(url: str) -> str:
 
 
 @tool
-def search_recipe_online(query: str) -> str:
+async def search_recipe_online(query: str) -> str:
     """
     레시피, 만드는 법, 요리법, 조리법을 물으면 반드시 이 도구를 사용하세요.
     직접 레시피를 답변하지 말고 이 도구로 검색하세요.
@@ -118,11 +114,15 @@ def search_recipe_online(query: str) -> str:
     Returns:
         레시피 정보 (재료, 조리 순서)
     """
-    writer = get_stream_writer()
-    writer({"tool": "search_recipe_online", "status": "레시피 검색 중..."})
+    # get_stream_writer는 LangGraph 컨텍스트에서만 동작 (선실행은 그래프 밖에서 호출됨)
+    try:
+        writer = get_stream_writer()
+        writer({"tool": "search_recipe_online", "status": "레시피 검색 중..."})
+    except RuntimeError:
+        writer = lambda x: None
 
     searcher = get_searcher()
-    search_result = searcher.search_text(query)
+    search_result = await searcher.search_text(query)
 
     if "error" in search_result:
         return f"검색 실패: {search_result['error']}"
@@ -136,7 +136,7 @@ def search_recipe_online(query: str) -> str:
     output = [f"[검색: {query}]"]
     for i, item in enumerate(organic[:1], 1):
         link = item.get("link", "")
-        recipe_data = _crawl_recipe_fast(link)
+        recipe_data = await _crawl_recipe_fast(link)
         output.append(f"\n=== 레시피 {i} ===\n{recipe_data}")
 
     return "\n".join(output)
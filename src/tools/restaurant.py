@@ -13,7 +13,7 @@ from ..services import get_kakao
 
 
 @tool
-def search_restaurant_info(query: str, page: int = 1) -> str:
+async def search_restaurant_info(query: str, page: int = 1) -> str:
     """
     맛집, 식당, 메뉴, 가격을 찾을 때 이 도구를 사용하세요.
     식당명으로 검색하면 메뉴명, 가격, 주소, 전화번호를 알 수 있습니다.
@@ -26,11 +26,15 @@ def search_restaurant_info(query: str, page: int = 1) -> str:
     Returns:
         식당 정보 (이름, 주소, 전화번호, 카테고리, 메뉴, 가격)
     """
-    writer = get_stream_writer()
-    writer({"tool": "search_restaurant_info", "status": "카카오맵 검색 중..."})
+    # get_stream_writer는 LangGraph 컨텍스트에서만 동작 (선실행은 그래프 밖에서 호출됨)
+    try:
+        writer = get_stream_writer()
+        writer({"tool": "search_restaurant_info", "status": "카카오맵 검색 중..."})
+    except RuntimeError:
+        writer = lambda x: None
 
     kakao = get_kakao()
-    result = kakao.search_restaurant(query, page=page)
+    result = await kakao.search_restaurant(query, page=page)
 
     output = []
     place_id = None
@@ -70,14 +74,14 @@ def search_restaurant_info(query: str, page: int = 1) -> str:
     menu_text = ""
     if place_id and PLAYWRIGHT_AVAILABLE:
         writer({"tool": "search_restaurant_info", "status": "메뉴 정보 수집 중..."})
-        menu_text = kakao.get_menu_via_playwright(place_id)
+        menu_text = await kakao.get_menu_via_playwright(place_id)
 
     if menu_text:
         output.append("[메뉴판]")
         output.append(menu_text)
     else:
         writer({"tool": "search_restaurant_info", "status": "메뉴 검색 중..."})
-        menu_info = kakao.search_menu_via_serper(query)
+        menu_info = await kakao.search_menu_via_serper(query)
         if menu_info:
             output.append("[메뉴 검색 결과]")
             output.append(menu_info)
@@ -89,7 +93,7 @@ def search_restaurant_info(query: str, page: int = 1) -> str:
 
 
 @tool
-def get_restaurant_reviews(restaurant_name: str) -> str:
+async def get_restaurant_reviews(restaurant_name: str) -> str:
     """
     후기, 리뷰, 평점, 평가, 비교를 물으면 반드시 이 도구를 사용하세요.
     식당 비교 시 각 식당마다 이 도구를 호출하세요.
@@ -104,7 +108,7 @@ def get_restaurant_reviews(restaurant_name: str) -> str:
         return "Playwright가 설치되지 않아 후기를 가져올 수 없습니다."
 
     kakao = get_kakao()
-    result = kakao.search_restaurant(restaurant_name)
+    result = await kakao.search_restaurant(restaurant_name)
 
     if not result or not result.get("documents"):
         return f"'{restaurant_name}' 식당을 찾을 수 없습니다."
@@ -119,7 +123,7 @@ def get_restaurant_reviews(restaurant_name: str) -> str:
     if not place_id:
         return f"'{restaurant_name}' 후기 페이지를 찾을 수 없습니다."
 
-    reviews_text = kakao.get_reviews_via_playwright(place_id, max_reviews=15)
+    reviews_text = await kakao.get_reviews_via_playwright(place_id, max_reviews=15)
 
     output = []
     output.append(f"[{place_name} 후기]")
@@ -1,11 +1,13 @@
 """새 음식 이미지 저장 도구"""
 
-import os
 import uuid
+import asyncio
 from typing import Optional
 from langchain_core.tools import tool
 from langgraph.config import get_stream_writer
 
+from ..image_store import load_image
+
 # 환경 변수 로드
 try:
     from dotenv import load_dotenv
@@ -14,37 +16,30 @@ except ImportError:
     pass
 
 
-def upload_to_supabase_storage(local_path: str, supabase) -> str:
+def upload_to_supabase_storage(file_data: bytes, content_type: str, supabase) -> str:
     """
-    로컬 이미지 파일을 Supabase Storage에 업로드하고 공개 URL 반환
+    이미지 bytes를 Supabase Storage에 업로드하고 공개 URL 반환
 
     Args:
-        local_path: 로컬 파일 경로
+        file_data: 이미지 bytes
+        content_type: MIME 타입
         supabase: Supabase 클라이언트
 
     Returns:
         업로드된 이미지의 공개 URL
     """
-    # 파일 확장자 추출
-    ext = os.path.splitext(local_path)[1] or '.jpg'
+    # 확장자 결정
+    ext_map = {
+        'image/jpeg': '.jpg',
+        'image/png': '.png',
+        'image/gif': '.gif',
+        'image/webp': '.webp',
+    }
+    ext = ext_map.get(content_type, '.jpg')
 
     # 고유 파일명 생성
     file_name = f"food_images/{uuid.uuid4()}{ext}"
 
-    # 파일 읽기
-    with open(local_path, 'rb') as f:
-        file_data = f.read()
-
-    # Content-Type 결정
-    content_type_map = {
-        '.jpg': 'image/jpeg',
-        '.jpeg': 'image/jpeg',
-        '.png': 'image/png',
-        '.gif': 'image/gif',
-        '.webp': 'image/webp',
-    }
-    content_type = content_type_map.get(ext.lower(), 'image/jpeg')
-
     # Supabase Storage에 업로드
     result = supabase.storage.from_('images').upload(
         file_name,
@@ -59,7 +54,7 @@ def upload_to_supabase_storage(local_path: str, supabase) -> str:
 
 
 @tool
-def save_food_image(
+async def save_food_image(
     image_url: str,
     food_name: str,
     source_type: str = "",
@@ -77,7 +72,7 @@ def save_food_image(
     비슷해 보이는 다른 음식 사진은 새 이미지입니다!
 
     Args:
-        image_url: 업로드된 이미지 URL 또는 로컬 파일 경로
+        image_url: 업로드된 이미지 URL, image:// 참조 또는 로컬 파일 경로
         food_name: 음식 이름 (AI 추론값도 OK)
         source_type: "restaurant", "home_cooked", "delivery" 중 하나 (모르면 생략)
         restaurant_name: 식당 이름 (알면)
@@ -97,12 +92,13 @@ def save_food_image(
 
         supabase = get_supabase_client()
 
-        # 로컬 파일인 경우 Supabase Storage에 업로드
+        # 업로드 이미지/로컬 파일인 경우 Supabase Storage에 업로드
         final_url = image_url
-        if os.path.exists(image_url):
+        loaded = load_image(image_url)
+        if loaded is not None:
             writer({"tool": "save_food_image", "status": "이미지 업로드 중..."})
             print(f"\ud83d\udce4 로컬 이미지를 Supabase Storage에 업로드 중: {image_url}")
-            final_url = upload_to_supabase_storage(image_url, supabase)
+            final_url = await asyncio.to_thread(upload_to_supabase_storage, *loaded, supabase)
             print(f"\u2705 업로드 완료: {final_url}")
 
         writer({"tool": "save_food_image", "status": "데이터베이스 저장 중..."})
@@ -119,7 +115,7 @@ def save_food_image(
         if location:
             data["location"] = location
 
-        result = supabase.table("food_images").insert(data).execute()
+        result = await asyncio.to_thread(supabase.table("food_images").insert(data).execute)
 
         if result.data:
             image_id = result.data[0]["id"]
@@ -1,6 +1,7 @@
 """음식 이미지 정보 업데이트 도구"""
 
 import os
+import asyncio
 from typing import Optional
 from langchain_core.tools import tool
 from langgraph.config import get_stream_writer
@@ -14,7 +15,7 @@ except ImportError:
 
 
 @tool
-def update_food_image(
+async def update_food_image(
     image_id: str,
     food_name: str = "",
     source_type: str = "",
@@ -62,7 +63,9 @@ def update_food_image(
         if not data:
             return "업데이트할 정보가 없습니다"
 
-        result = supabase.table("food_images").update(data).eq("id", image_id).execute()
+        result = await asyncio.to_thread(
+            supabase.table("food_images").update(data).eq("id", image_id).execute
+        )
 
         verified_parts = []
         if data.get("food_verified"):
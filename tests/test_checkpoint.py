@@ -0,0 +1,113 @@
+"""SqliteCheckpointSaver - 저장/복원, keep_last 정리, thread 삭제"""
+
+import pytest
+
+pytest.importorskip("langgraph")
+
+from langgraph.checkpoint.base import empty_checkpoint
+
+from src.checkpoint import CompressedSerializer, SqliteCheckpointSaver
+
+
+def _config(thread_id: str, checkpoint_id=None) -> dict:
+    configurable = {"thread_id": thread_id, "checkpoint_ns": ""}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+
+def _checkpoint(text: str) -> dict:
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {"messages": [text]}
+    return checkpoint
+
+
+def _put_chain(saver: SqliteCheckpointSaver, thread_id: str, texts) -> list:
+    """부모를 이어가며 체크포인트를 차례로 저장하고 config 목록을 반환"""
+    configs = []
+    config = _config(thread_id)
+    for step, text in enumerate(texts):
+        config = saver.put(config, _checkpoint(text), {"source": "loop", "step": step}, {})
+        configs.append(config)
+    return configs
+
+
+@pytest.fixture
+def saver(tmp_path):
+    saver = SqliteCheckpointSaver(str(tmp_path / "checkpoints.db"), keep_last=0)
+    yield saver
+    saver.conn.close()
+
+
+def test_round_trip(saver):
+    long_text = "김치찌개 " * 200  # min_size보다 커서 압축되는 값
+    config = saver.put(_config("t1"), _checkpoint(long_text), {"source": "input", "step": -1}, {})
+
+    loaded = saver.get_tuple(config)
+    assert loaded is not None
+    assert loaded.checkpoint["channel_values"] == {"messages": [long_text]}
+    assert loaded.metadata["step"] == -1
+    assert loaded.parent_config is None
+
+    (type_,) = saver.conn.execute("SELECT type FROM checkpoints WHERE thread_id = 't1'").fetchone()
+    assert type_.endswith(("+zstd", "+zlib"))
+
+
+def test_get_tuple_returns_latest_with_parent(saver):
+    first, second = _put_chain(saver, "t1", ["첫 턴", "두 번째 턴"])
+
+    latest = saver.get_tuple(_config("t1"))
+    assert latest.config["configurable"]["checkpoint_id"] == second["configurable"]["checkpoint_id"]
+    assert latest.parent_config["configurable"]["checkpoint_id"] == first["configurable"]["checkpoint_id"]
+    assert saver.get_tuple(_config("missing")) is None
+
+
+def test_put_writes_keeps_first_regular_write(saver):
+    (config,) = _put_chain(saver, "t1", ["턴"])
+    saver.put_writes(config, [("messages", "원래 값")], task_id="task-1")
+    saver.put_writes(config, [("messages", "재시도 값")], task_id="task-1")
+
+    loaded = saver.get_tuple(config)
+    assert loaded.pending_writes == [("task-1", "messages", "원래 값")]
+
+
+def test_keep_last_prunes_checkpoints_and_writes(tmp_path):
+    saver = SqliteCheckpointSaver(str(tmp_path / "checkpoints.db"), keep_last=2)
+    first, *_ = configs = _put_chain(saver, "t1", ["1", "2"])
+    saver.put_writes(first, [("messages", "오래된 write")], task_id="task-1")
+    configs += _put_chain(saver, "t1", ["3", "4"])
+
+    remaining = [item.config["configurable"]["checkpoint_id"] for item in saver.list(_config("t1"))]
+    assert remaining == [c["configurable"]["checkpoint_id"] for c in reversed(configs[-2:])]
+    (writes,) = saver.conn.execute("SELECT COUNT(*) FROM writes WHERE thread_id = 't1'").fetchone()
+    assert writes == 0
+    saver.conn.close()
+
+
+def test_delete_thread_only_removes_that_thread(saver):
+    (config,) = _put_chain(saver, "t1", ["삭제할 대화"])
+    saver.put_writes(config, [("messages", "write")], task_id="task-1")
+    _put_chain(saver, "t2", ["남길 대화"])
+    assert saver.thread_size("t1") > 0
+
+    saver.delete_thread("t1")
+
+    assert saver.get_tuple(_config("t1")) is None
+    assert saver.thread_size("t1") == 0
+    assert saver.get_tuple(_config("t2")) is not None
+
+
+async def test_async_api(saver):
+    config = await saver.aput(_config("t1"), _checkpoint("비동기"), {"source": "loop", "step": 0}, {})
+    loaded = await saver.aget_tuple(config)
+    assert loaded.checkpoint["channel_values"] == {"messages": ["비동기"]}
+
+    await saver.adelete_thread("t1")
+    assert [item async for item in saver.alist(_config("t1"))] == []
+
+
+def test_serializer_reads_uncompressed_values():
+    serde = CompressedSerializer(min_size=1_000_000)
+    type_, data = serde.dumps_typed({"summary": "짧은 값"})
+    assert "+" not in type_
+    assert serde.loads_typed((type_, data)) == {"summary": "짧은 값"}
@@ -0,0 +1,114 @@
+"""ContextTrimmer - 토큰 예산 트리밍, 턴 경계 유지, 증분 계산"""
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from src.context import MESSAGE_OVERHEAD_TOKENS, ContextTrimmer, _estimate_tokens
+
+
+class CountingLen:
+    """글자 수 = 토큰 수, 호출 횟수 기록"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text: str) -> int:
+        self.calls += 1
+        return len(text)
+
+
+def _history() -> list:
+    return [
+        HumanMessage(content="강남역 맛집 알려줘" * 4, id="h1"),
+        AIMessage(content="추천 맛집 목록입니다" * 4, id="a1"),
+        HumanMessage(content="거기 메뉴도 알려줘" * 4, id="h2"),
+        AIMessage(
+            content="",
+            id="a2",
+            tool_calls=[{"name": "get_menu", "args": {"restaurant": "식당"}, "id": "call-1"}],
+        ),
+        ToolMessage(content="메뉴: 김치찌개 8000원" * 4, tool_call_id="call-1", id="t2"),
+        AIMessage(content="메뉴는 김치찌개입니다" * 4, id="a3"),
+        HumanMessage(content="가격은?", id="h3"),
+    ]
+
+
+def _suffix_tokens(trimmer: ContextTrimmer, messages: list, start: int) -> int:
+    return sum(trimmer.count_message(m) for m in messages[start:])
+
+
+def test_estimate_tokens_counts_hangul_per_syllable():
+    assert _estimate_tokens("김치찌개") == 4
+    assert _estimate_tokens("abcdefgh") == 2
+
+
+def test_budget_excludes_system_prompt_and_output():
+    trimmer = ContextTrimmer(count_text=len, max_tokens=1000, reserve_output=200, system_prompt="x" * 96)
+    assert trimmer.budget == 1000 - 200 - (96 + MESSAGE_OVERHEAD_TOKENS)
+
+
+def test_history_within_budget_is_unchanged():
+    messages = _history()
+    trimmer = ContextTrimmer(count_text=len, max_tokens=10_000, reserve_output=0)
+    assert trimmer.trim(messages, "t1") == messages
+
+
+def test_trim_starts_at_a_human_message_and_keeps_tool_pairs():
+    messages = _history()
+    probe = ContextTrimmer(count_text=len, max_tokens=0, reserve_output=0)
+    # 도구 결과(t2)부터만 들어가는 예산 → 도구 호출과 떨어지지 않도록 다음 턴(h3)부터
+    budget = _suffix_tokens(probe, messages, 4)
+    trimmer = ContextTrimmer(count_text=len, max_tokens=budget, reserve_output=0)
+    assert [m.id for m in trimmer.trim(messages, "t1")] == ["h3"]
+
+    # 두 번째 턴 전체가 들어가면 h2부터
+    trimmer = ContextTrimmer(count_text=len, max_tokens=_suffix_tokens(probe, messages, 2), reserve_output=0)
+    assert [m.id for m in trimmer.trim(messages, "t1")] == ["h2", "a2", "t2", "a3", "h3"]
+
+
+def test_current_turn_is_kept_even_over_budget():
+    messages = _history()
+    trimmer = ContextTrimmer(count_text=len, max_tokens=1, reserve_output=0)
+    assert [m.id for m in trimmer.trim(messages, "t1")] == ["h3"]
+
+
+def test_extra_tokens_shrink_the_budget():
+    messages = _history()
+    probe = ContextTrimmer(count_text=len, max_tokens=0, reserve_output=0)
+    budget = _suffix_tokens(probe, messages, 2)
+    trimmer = ContextTrimmer(count_text=len, max_tokens=budget, reserve_output=0)
+    assert trimmer.trim(messages, "t1", extra_tokens=1)[0].id == "h3"
+
+
+def test_only_new_messages_are_counted():
+    counter = CountingLen()
+    trimmer = ContextTrimmer(count_text=counter, max_tokens=10_000, reserve_output=0)
+    messages = _history()
+    trimmer.trim(messages, "t1")
+    counter.calls = 0
+
+    messages.append(AIMessage(content="8000원입니다", id="a4"))
+    trimmer.trim(messages, "t1")
+    assert counter.calls == 1
+
+
+def test_rewritten_history_is_recounted():
+    trimmer = ContextTrimmer(count_text=len, max_tokens=10_000, reserve_output=0)
+    messages = _history()
+    trimmer.trim(messages, "t1")
+
+    # 요약 등으로 앞부분이 삭제되면 누적 합을 다시 계산
+    shortened = messages[2:]
+    assert trimmer.trim(shortened, "t1") == shortened
+    window = trimmer._window("t1", shortened)
+    assert window.ids == [m.id for m in shortened]
+    assert window.prefix[-1] == _suffix_tokens(trimmer, shortened, 0)
+
+
+def test_hook_returns_llm_input_messages():
+    trimmer = ContextTrimmer(count_text=len, max_tokens=1, reserve_output=0)
+    result = trimmer({"messages": _history()}, {"configurable": {"thread_id": "t1"}})
+    assert [m.id for m in result["llm_input_messages"]] == ["h3"]
@@ -0,0 +1,165 @@
+"""HedgedChatModel - 마감 시간/실패 시 백업 요청, 예산, 진 요청 정리, primary 지연만 기록"""
+
+import asyncio
+import itertools
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.runnables import Runnable
+
+from src.hedging import HedgeBudget, HedgedChatModel, LatencyTracker
+from src.metrics import get_metrics
+
+DEADLINE = 0.05
+_names = itertools.count()
+
+
+class FakeModel(Runnable):
+    """delay초 뒤에 reply를 돌려주거나 error를 내는 모델 (취소/종료 횟수 기록)"""
+
+    def __init__(self, reply: str, delay: float = 0.0, error: Exception = None):
+        self.reply = reply
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.cancelled = 0
+        self.closed = 0
+
+    def invoke(self, input, config=None, **kwargs):
+        raise NotImplementedError
+
+    async def _wait(self):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        await self._wait()
+        return AIMessage(content=self.reply)
+
+    async def astream(self, input, config=None, **kwargs):
+        try:
+            await self._wait()
+            for word in self.reply.split(" "):
+                yield AIMessageChunk(content=word)
+        finally:
+            self.closed += 1
+
+
+def _hedged(primary: FakeModel, backup: FakeModel, budget: float = 3.0) -> HedgedChatModel:
+    # 추적기 표본이 min_samples보다 적으므로 마감 시간은 항상 initial
+    return HedgedChatModel(
+        primary=primary,
+        backup=backup,
+        primary_name=f"primary-{next(_names)}",
+        backup_name="backup",
+        stream_tracker=LatencyTracker(initial=DEADLINE),
+        invoke_tracker=LatencyTracker(initial=DEADLINE),
+        budget=HedgeBudget(ratio=0, burst=budget),
+    )
+
+
+def _outcome(model: HedgedChatModel, outcome: str) -> float:
+    return get_metrics().get("llm_hedge_total", provider=model.primary_name, outcome=outcome)
+
+
+def _invoke(model: HedgedChatModel) -> AIMessage:
+    return asyncio.run(model.ainvoke([HumanMessage(content="김치찌개 칼로리")]))
+
+
+def _stream(model: HedgedChatModel) -> str:
+    async def main():
+        return "".join([chunk.content async for chunk in model.astream([HumanMessage(content="비빔밥")])])
+
+    return asyncio.run(main())
+
+
+def test_fast_primary_is_not_hedged():
+    primary, backup = FakeModel("primary"), FakeModel("backup")
+    model = _hedged(primary, backup)
+
+    assert _invoke(model).content == "primary"
+    assert backup.calls == 0
+    samples = list(model.invoke_tracker._samples)
+    assert len(samples) == 1 and samples[0] < DEADLINE
+
+
+def test_deadline_fires_the_backup_and_cancels_the_primary():
+    primary, backup = FakeModel("primary", delay=5), FakeModel("backup")
+    model = _hedged(primary, backup)
+
+    assert _invoke(model).content == "backup"
+    assert _outcome(model, "fired_deadline") == 1
+    assert _outcome(model, "backup_won") == 1
+    assert primary.cancelled == 1
+    # 백업의 지연이 아니라 primary가 적어도 걸린 시간(>= 마감 시간)을 기록
+    (sample,) = model.invoke_tracker._samples
+    assert sample >= DEADLINE
+
+
+def test_primary_failure_fires_the_backup_without_a_sample():
+    primary, backup = FakeModel("primary", error=RuntimeError("503")), FakeModel("backup")
+    model = _hedged(primary, backup)
+
+    assert _invoke(model).content == "backup"
+    assert _outcome(model, "fired_error") == 1
+    assert list(model.invoke_tracker._samples) == []
+
+
+def test_empty_budget_waits_for_the_primary():
+    primary, backup = FakeModel("primary", delay=DEADLINE * 3), FakeModel("backup")
+    model = _hedged(primary, backup, budget=0)
+
+    assert _invoke(model).content == "primary"
+    assert _outcome(model, "skipped_budget") == 1
+    assert backup.calls == 0
+
+
+def test_empty_budget_and_primary_failure_raises():
+    primary, backup = FakeModel("primary", error=RuntimeError("503")), FakeModel("backup")
+    model = _hedged(primary, backup, budget=0)
+
+    with pytest.raises(RuntimeError, match="503"):
+        _invoke(model)
+    assert backup.calls == 0
+
+
+def test_all_attempts_failing_raises_the_first_error():
+    primary = FakeModel("primary", error=RuntimeError("primary down"))
+    backup = FakeModel("backup", error=RuntimeError("backup down"))
+    model = _hedged(primary, backup)
+
+    with pytest.raises(RuntimeError, match="primary down"):
+        _invoke(model)
+    assert _outcome(model, "all_failed") == 1
+
+
+def test_stream_loser_is_cancelled_and_closed():
+    primary, backup = FakeModel("느린 응답", delay=5), FakeModel("빠른 응답")
+    model = _hedged(primary, backup)
+
+    assert _stream(model) == "빠른응답"
+    assert primary.cancelled == 1
+    assert primary.closed == 1
+    assert backup.closed == 1
+    assert _outcome(model, "backup_won") == 1
+
+
+def test_stream_primary_wins_after_hedge():
+    primary, backup = FakeModel("primary", delay=DEADLINE * 2), FakeModel("backup", delay=5)
+    model = _hedged(primary, backup)
+
+    assert _stream(model) == "primary"
+    assert _outcome(model, "primary_won") == 1
+    assert backup.cancelled == 1 and backup.closed == 1
+    # 헤지 후 primary가 이기면 primary 자신의 실제 지연을 기록
+    (sample,) = model.stream_tracker._samples
+    assert DEADLINE < sample < 5
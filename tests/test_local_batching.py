@@ -0,0 +1,124 @@
+"""BatchScheduler - 작은 랜덤 Llama로 행별 종료(max_new_tokens / stop)와 증분 디코딩 확인
+
+가중치를 내려받아야 하므로 torch/transformers가 없거나 모델을 받을 수 없으면 건너뜁니다.
+"""
+
+import time
+import queue
+
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+pytest.importorskip("langchain_core")
+
+from src.local_llm import BatchScheduler, GenerationRequest
+
+MODEL = "hf-internal-testing/tiny-random-LlamaForCausalLM"
+PROMPTS = ["김치찌개 레시피 알려줘", "강남역 맛집 추천해줘", "비빔밥 칼로리는?"]
+
+
+@pytest.fixture(scope="module")
+def model_and_tokenizer():
+    try:
+        tokenizer = transformers.AutoTokenizer.from_pretrained(MODEL)
+        model = transformers.AutoModelForCausalLM.from_pretrained(MODEL, torch_dtype=torch.float32).eval()
+    except Exception as e:  # 오프라인 등
+        pytest.skip(f"{MODEL} 로드 실패: {e}")
+    # 랜덤 모델이 중간에 EOS를 내지 않도록 해서 max_new_tokens까지 생성되게 함
+    model.generation_config.eos_token_id = None
+    return model, tokenizer
+
+
+@pytest.fixture
+def scheduler(model_and_tokenizer, monkeypatch):
+    model, tokenizer = model_and_tokenizer
+    batch_sizes = []
+    generate = model.generate
+
+    def recording_generate(**kwargs):
+        batch_sizes.append(kwargs["input_ids"].shape[0])
+        return generate(**kwargs)
+
+    monkeypatch.setattr(model, "generate", recording_generate)
+    scheduler = BatchScheduler(model, tokenizer, max_batch_size=4, batch_window=0.2)
+    scheduler.batch_sizes = batch_sizes
+    yield scheduler
+    scheduler.close()
+    scheduler._worker.join(timeout=30)
+
+
+def _request(tokenizer, prompt: str, max_new_tokens: int, stop=(), stream: bool = False) -> GenerationRequest:
+    inputs = tokenizer(prompt, return_tensors="pt")
+    inputs.pop("token_type_ids", None)
+    return GenerationRequest(
+        inputs=dict(inputs),
+        max_new_tokens=max_new_tokens,
+        temperature=0.0,
+        stop=tuple(stop),
+        text_queue=queue.Queue() if stream else None,
+    )
+
+
+def _run(scheduler, requests) -> dict:
+    """요청을 한꺼번에 넣고 각 요청이 끝난 시각을 반환"""
+    finished_at = {}
+    for i, request in enumerate(requests):
+        request.future.add_done_callback(lambda _, i=i: finished_at.setdefault(i, time.monotonic()))
+        scheduler.submit(request)
+    for request in requests:
+        request.future.result(timeout=120)
+    return finished_at
+
+
+def _drain(request: GenerationRequest) -> list:
+    pieces = []
+    while True:
+        piece = request.text_queue.get(timeout=5)
+        if piece is None:
+            return pieces
+        pieces.append(piece)
+
+
+def test_rows_stop_at_their_own_max_new_tokens(scheduler, model_and_tokenizer):
+    _, tokenizer = model_and_tokenizer
+    requests = [_request(tokenizer, p, n) for p, n in zip(PROMPTS, (2, 6, 40))]
+    finished_at = _run(scheduler, requests)
+
+    assert scheduler.batch_sizes == [3]
+    assert [len(r.token_ids) for r in requests] == [2, 6, 40]
+    # 짧은 행은 가장 긴 행을 기다리지 않고 먼저 결과를 받음
+    assert finished_at[0] < finished_at[2]
+    assert finished_at[1] < finished_at[2]
+
+
+def test_stop_string_ends_only_its_row(scheduler, model_and_tokenizer):
+    _, tokenizer = model_and_tokenizer
+    baseline = [_request(tokenizer, p, 24) for p in PROMPTS[:2]]
+    _run(scheduler, baseline)
+    text = baseline[0].future.result()
+    stop = text[len(text) // 3:len(text) // 3 + 3]
+    if not stop.strip():
+        pytest.skip("랜덤 모델 출력에서 stop 문자열로 쓸 부분이 없음")
+
+    requests = [_request(tokenizer, PROMPTS[0], 24, stop=[stop], stream=True), _request(tokenizer, PROMPTS[1], 24)]
+    _run(scheduler, requests)
+
+    expected = text[:text.find(stop)]
+    assert requests[0].future.result() == expected
+    assert "".join(_drain(requests[0])) == expected
+    assert len(requests[0].token_ids) < 24
+    # 같은 배치의 다른 행은 영향 없음
+    assert requests[1].future.result() == baseline[1].future.result()
+    assert len(requests[1].token_ids) == 24
+
+
+def test_incremental_decoding_matches_full_decode(scheduler, model_and_tokenizer):
+    _, tokenizer = model_and_tokenizer
+    requests = [_request(tokenizer, p, 32, stream=True) for p in PROMPTS]
+    _run(scheduler, requests)
+
+    for request in requests:
+        full = tokenizer.decode(request.token_ids, skip_special_tokens=True)
+        assert request.future.result() == full
+        assert "".join(_drain(request)) == full
@@ -0,0 +1,79 @@
+"""_StreamParser - 로컬 모델 출력의 텍스트 / tool_call 블록 / <think> 분리"""
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("langchain_core")
+
+from src.local_llm import _StreamParser
+
+
+def _parse(chunks) -> list:
+    """청크를 차례로 넣고 이벤트를 모음 (인접한 text 이벤트는 합침)"""
+    parser = _StreamParser()
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    events.extend(parser.finish())
+    merged = []
+    for kind, value in events:
+        if kind == "text" and merged and merged[-1][0] == "text":
+            merged[-1] = ("text", merged[-1][1] + value)
+        else:
+            merged.append((kind, value))
+    return merged
+
+
+TOOL_BLOCK = '\n{"name": "get_nutrition_info", "arguments": {"query": "김치찌개"}}\n'
+
+CASES = [
+    ("plain text", "김치찌개 레시피입니다.", [("text", "김치찌개 레시피입니다.")]),
+    (
+        "tool call block",
+        f"검색해볼게요. ```tool_call{TOOL_BLOCK}``` 잠시만요",
+        [("text", "검색해볼게요. "), ("tool", TOOL_BLOCK), ("text", " 잠시만요")],
+    ),
+    (
+        "other code fence is text",
+        "```python\nprint(1)\n```",
+        [("text", "```python\nprint(1)\n```")],
+    ),
+    ("unclosed tool call is flushed", "```tool_call\n{\"name\": \"x\"", [("tool", '\n{"name": "x"')]),
+    ("think block is dropped", "<think>사용자가 원하는 것은...</think>\n\n  답변입니다.", [("text", "답변입니다.")]),
+    ("unclosed think is dropped", "앞부분 <think>생각 중", [("text", "앞부분 ")]),
+    ("only whitespace after think", "<think>x</think>  \n", []),
+    ("partial opener at the end is released", "코드는 ``", [("text", "코드는 ``")]),
+    ("partial think opener at the end is released", "a <thi", [("text", "a <thi")]),
+]
+
+
+@pytest.mark.parametrize("text, expected", [c[1:] for c in CASES], ids=[c[0] for c in CASES])
+def test_whole_text(text, expected):
+    assert _parse([text]) == expected
+
+
+@pytest.mark.parametrize("text, expected", [c[1:] for c in CASES], ids=[c[0] for c in CASES])
+def test_one_char_at_a_time(text, expected):
+    # 여는/닫는 표시가 청크 경계에서 잘려도 같은 결과
+    assert _parse(list(text)) == expected
+
+
+def test_partial_opener_is_held_until_next_chunk():
+    parser = _StreamParser()
+    assert parser.feed("검색 ``") == [("text", "검색 ")]
+    assert parser.feed("`tool_") == []
+    assert parser.feed('call{"name": "x"}```끝') == [("tool", '{"name": "x"}'), ("text", "끝")]
+
+
+def test_non_opener_is_not_held():
+    parser = _StreamParser()
+    assert parser.feed("비빔밥 <b>") == [("text", "비빔밥 <b>")]
+    assert parser.feed("칼로리 `x` 입니다") == [("text", "칼로리 `x` 입니다")]
+
+
+def test_whitespace_strip_after_think_spans_chunks():
+    parser = _StreamParser()
+    assert parser.feed("<think>생각</think>") == []
+    assert parser.feed("\n ") == []
+    assert parser.feed(" 답변  입니다") == [("text", "답변  입니다")]
+    assert parser.feed(" 끝") == [("text", " 끝")]
@@ -0,0 +1,103 @@
+"""PrefixKVCache - 가장 긴 접두사 선택, 마지막 토큰 프리필, 항목 대체, 바이트 상한 LRU"""
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("langchain_core")
+
+from src.local_llm import PrefixKVCache
+
+
+class FakeTensor:
+    def __init__(self, tokens: int):
+        self.tokens = tokens
+
+    def numel(self) -> int:
+        return self.tokens
+
+    def element_size(self) -> int:
+        return 1
+
+
+class FakeLayer:
+    def __init__(self, tokens: int):
+        self.keys = FakeTensor(tokens)
+        self.values = FakeTensor(tokens)
+
+
+class FakeCache:
+    """DynamicCache 대역: 토큰 하나당 layer마다 key/value 1바이트씩"""
+
+    def __init__(self, tokens: int, num_layers: int = 1):
+        self.layers = [FakeLayer(tokens) for _ in range(num_layers)]
+
+    @property
+    def tokens(self) -> int:
+        return self.layers[0].keys.tokens
+
+    def crop(self, length: int):
+        for layer in self.layers:
+            layer.keys.tokens = layer.values.tokens = min(length, layer.keys.tokens)
+
+
+def _store(cache: PrefixKVCache, input_ids):
+    # generate가 끝난 캐시는 생성된 토큰까지 들어 있음
+    cache.store(list(input_ids), FakeCache(len(input_ids) + 5))
+
+
+def test_lookup_picks_the_longest_prefix_and_crops_a_copy():
+    cache = PrefixKVCache(max_bytes=10_000, min_tokens=4)
+    _store(cache, range(10))
+    _store(cache, list(range(6)) + [99, 98])
+
+    hit, reused = cache.lookup(list(range(8)) + [50, 51])
+    assert reused == 8
+    assert hit.tokens == 8
+    # 저장된 항목은 잘리지 않음
+    assert cache.lookup(list(range(10)) + [7])[1] == 10
+
+
+def test_lookup_always_leaves_the_last_token_to_prefill():
+    cache = PrefixKVCache(max_bytes=10_000, min_tokens=4)
+    _store(cache, range(10))
+    hit, reused = cache.lookup(list(range(10)))
+    assert reused == 9
+    assert hit.tokens == 9
+
+
+def test_short_prefix_is_a_miss():
+    cache = PrefixKVCache(max_bytes=10_000, min_tokens=4)
+    assert cache.lookup([1, 2, 3]) == (None, 0)
+    _store(cache, range(10))
+    assert cache.lookup([0, 1, 2, 50, 51]) == (None, 0)
+
+
+def test_store_replaces_entries_that_prefix_the_new_prompt():
+    cache = PrefixKVCache(max_bytes=10_000, min_tokens=4)
+    _store(cache, range(6))
+    _store(cache, [7] * 6)
+    _store(cache, range(10))
+
+    assert list(cache._entries) == [tuple([7] * 6), tuple(range(10))]
+    # 저장 시 프롬프트 길이로 잘라서 바이트 계산 (layer당 key+value)
+    assert cache._bytes == 2 * 6 + 2 * 10
+
+
+def test_lru_eviction_by_bytes():
+    cache = PrefixKVCache(max_bytes=50, min_tokens=4)
+    _store(cache, range(10))  # 20바이트
+    _store(cache, range(100, 110))  # 20바이트
+    cache.lookup(list(range(10)) + [1])  # 첫 항목을 최근 사용으로
+    _store(cache, range(200, 210))
+
+    assert list(cache._entries) == [tuple(range(10)), tuple(range(200, 210))]
+    assert cache._bytes == 40
+
+
+def test_oversized_entry_keeps_the_previous_turn():
+    cache = PrefixKVCache(max_bytes=30, min_tokens=4)
+    _store(cache, range(10))
+    _store(cache, range(40))  # 80바이트 > 상한: 저장하지 않고 이전 턴 항목도 유지
+
+    assert list(cache._entries) == [tuple(range(10))]
+    assert cache.lookup(list(range(12)))[1] == 10
@@ -0,0 +1,133 @@
+"""TurnScheduler - 세션별 FIFO, 레인 동시 실행 제한, 거절"""
+
+import asyncio
+
+import pytest
+
+from api.scheduler import HEAVY_LANE, TEXT_LANE, AdmissionRejected, TurnScheduler, classify_turn
+
+
+def _scheduler(**kwargs) -> TurnScheduler:
+    options = dict(
+        text_concurrency=2, text_queue=2, heavy_concurrency=1, heavy_queue=1,
+        session_queue=2, queue_timeout=1,
+    )
+    options.update(kwargs)
+    return TurnScheduler(**options)
+
+
+def test_classify_turn():
+    assert classify_turn("김치찌개 레시피 알려줘") == TEXT_LANE
+    assert classify_turn("강남역 맛집 추천해줘") == HEAVY_LANE
+    assert classify_turn("이거 뭐야?", has_images=True) == HEAVY_LANE
+
+
+def test_same_session_runs_in_arrival_order():
+    async def main():
+        scheduler = _scheduler()
+        order = []
+
+        async def turn(name: str, delay: float):
+            async with scheduler.slot("s1"):
+                order.append(f"{name} start")
+                await asyncio.sleep(delay)
+                order.append(f"{name} end")
+
+        await asyncio.gather(turn("a", 0.05), turn("b", 0), turn("c", 0))
+        return order
+
+    assert asyncio.run(main()) == ["a start", "a end", "b start", "b end", "c start", "c end"]
+
+
+def test_session_queue_overflow_is_rejected_with_429():
+    async def main():
+        scheduler = _scheduler(session_queue=1)
+        running = await scheduler.admit("s1")
+        waiting = asyncio.ensure_future(scheduler.admit("s1"))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as exc:
+            await scheduler.admit("s1")
+        running.release()
+        (await waiting).release()
+        return exc.value
+
+    rejected = asyncio.run(main())
+    assert rejected.status_code == 429
+    assert rejected.retry_after >= 1
+
+
+def test_lane_queue_overflow_is_rejected_with_503():
+    async def main():
+        scheduler = _scheduler()
+        running = await scheduler.admit("s1", HEAVY_LANE)
+        waiting = asyncio.ensure_future(scheduler.admit("s2", HEAVY_LANE))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as exc:
+            await scheduler.admit("s3", HEAVY_LANE)
+        # 다른 레인은 영향 없음
+        text = await scheduler.admit("s4", TEXT_LANE)
+        text.release()
+        running.release()
+        (await waiting).release()
+        return scheduler, exc.value
+
+    scheduler, rejected = asyncio.run(main())
+    assert rejected.status_code == 503
+    stats = scheduler.stats()
+    assert stats["lanes"][HEAVY_LANE]["rejected"] == 1
+    assert stats["lanes"][HEAVY_LANE]["running"] == 0
+    assert stats["active_sessions"] == 0
+
+
+def test_lane_wait_timeout_is_rejected_with_503():
+    async def main():
+        scheduler = _scheduler(queue_timeout=0.05)
+        running = await scheduler.admit("s1", HEAVY_LANE)
+        with pytest.raises(AdmissionRejected) as exc:
+            await scheduler.admit("s2", HEAVY_LANE)
+        running.release()
+        return scheduler, exc.value
+
+    scheduler, rejected = asyncio.run(main())
+    assert rejected.status_code == 503
+    # 거절된 요청의 세션 잠금은 남지 않음
+    assert not scheduler.is_active("s2")
+
+
+def test_release_is_idempotent_and_frees_the_session():
+    async def main():
+        scheduler = _scheduler()
+        admission = await scheduler.admit("s1")
+        assert scheduler.is_active("s1")
+        admission.release()
+        admission.release()
+        # 두 번 반환해도 슬롯이 늘어나지 않음: 동시 실행 수만큼만 바로 승인됨
+        first = await scheduler.admit("a")
+        second = await scheduler.admit("b")
+        third = asyncio.ensure_future(scheduler.admit("c"))
+        await asyncio.sleep(0.01)
+        assert not third.done()
+        first.release()
+        (await third).release()
+        second.release()
+        return scheduler
+
+    scheduler = asyncio.run(main())
+    assert not scheduler.is_active("s1")
+    assert scheduler.stats()["lanes"][TEXT_LANE]["running"] == 0
+
+
+def test_cancelled_wait_releases_the_session_slot():
+    async def main():
+        scheduler = _scheduler()
+        running = await scheduler.admit("s1")
+        waiting = asyncio.ensure_future(scheduler.admit("s1"))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        running.release()
+        return scheduler
+
+    scheduler = asyncio.run(main())
+    assert not scheduler.is_active("s1")
@@ -0,0 +1,103 @@
+"""SSE 스트리밍 유틸리티 - 프레임 인코딩, 텍스트 병합, MAP/IMAGE 태그 증분 파싱"""
+
+import json
+
+from api.streaming import MediaTagParser, TextCoalescer, sse_frame
+
+
+def _payload(frame: bytes) -> dict:
+    assert frame.startswith(b"data: ") and frame.endswith(b"\n\n")
+    return json.loads(frame[len(b"data: "):-2].decode("utf-8"))
+
+
+def test_sse_frame_keeps_korean_text():
+    frame = sse_frame({"type": "text", "content": "비빔밥 칼로리"})
+    assert _payload(frame) == {"type": "text", "content": "비빔밥 칼로리"}
+    assert "비빔밥".encode("utf-8") in frame
+
+
+def test_coalescer_flushes_at_char_threshold():
+    coalescer = TextCoalescer(flush_ms=10_000, flush_chars=5)
+    assert coalescer.push("김치") is None
+    assert coalescer.push("") is None
+    frame = coalescer.push("찌개 레시피")
+    assert _payload(frame) == {"type": "text", "content": "김치찌개 레시피"}
+    assert coalescer.flush() is None
+    assert coalescer.timeout() is None
+
+
+def test_coalescer_time_window(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("api.streaming.time.monotonic", lambda: now[0])
+    coalescer = TextCoalescer(flush_ms=500, flush_chars=0)
+
+    assert coalescer.push("안녕") is None
+    now[0] += 0.25
+    assert coalescer.timeout() == 0.25
+    now[0] += 0.25
+    assert coalescer.timeout() == 0
+    assert _payload(coalescer.push("하세요")) == {"type": "text", "content": "안녕하세요"}
+
+
+def test_coalescer_disabled_flushes_every_delta():
+    coalescer = TextCoalescer(flush_ms=0, flush_chars=0)
+    assert not coalescer.enabled
+    assert _payload(coalescer.push("a")) == {"type": "text", "content": "a"}
+    assert _payload(coalescer.push("b")) == {"type": "text", "content": "b"}
+
+
+def _parse(chunks) -> list:
+    """청크를 차례로 넣고 이벤트를 모음 (인접한 text 이벤트는 합침)"""
+    parser = MediaTagParser()
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    events.extend(parser.finish())
+    merged = []
+    for kind, value in events:
+        if kind == "text" and merged and merged[-1][0] == "text":
+            merged[-1] = ("text", merged[-1][1] + value)
+        else:
+            merged.append((kind, value))
+    return merged
+
+
+def test_tags_split_across_chunks():
+    text = "추천 맛집입니다. [MAP:37.49,127.02] 사진: [IMAGE:https://example.com/a.jpg] 끝"
+    expected = [
+        ("text", "추천 맛집입니다. "),
+        ("map", "37.49,127.02"),
+        ("text", " 사진: "),
+        ("image", "https://example.com/a.jpg"),
+        ("text", " 끝"),
+    ]
+    assert _parse([text]) == expected
+    # 한 글자씩 들어와도 같은 결과
+    assert _parse(list(text)) == expected
+
+
+def test_plain_text_is_not_held():
+    parser = MediaTagParser()
+    assert parser.feed("김치찌개 [1] 레시피") == [("text", "김치찌개 [1] 레시피")]
+    # 태그 시작일 수 있는 부분만 보류
+    assert parser.feed(" 위치 [MA") == [("text", " 위치 ")]
+    assert parser.feed("P:강남역]") == [("map", "강남역")]
+
+
+def test_image_tag_requires_http_url():
+    assert _parse(["[IMAGE:local.png] 설명"]) == [("text", "[IMAGE:local.png] 설명")]
+
+
+def test_search_image_label_is_dropped():
+    assert _parse(["[검색 결과 ", "이미지]\n[IMAGE:https://e.com/x.png]"]) == [
+        ("text", "\n"),
+        ("image", "https://e.com/x.png"),
+    ]
+
+
+def test_unclosed_tag_is_released_as_text():
+    assert _parse(["지도 [MAP:37.5"]) == [("text", "지도 [MAP:37.5")]
+    long_tag = "[MAP:" + "x" * (MediaTagParser.MAX_TAG_LENGTH + 10)
+    parser = MediaTagParser()
+    events = parser.feed(long_tag)
+    assert events and events[0][0] == "text"